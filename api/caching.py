@@ -0,0 +1,79 @@
+import hashlib
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+
+
+class ConditionalGetMixin:
+    """
+    Viewset mixin answering ``If-None-Match`` / ``If-Modified-Since`` on list
+    and retrieve before anything is serialized.
+
+    The validators come from one cheap query: an ETag over ``MAX(updated_at)``
+    and ``COUNT(*)`` of the filtered queryset for lists (the count catches
+    deletions, which ``Last-Modified`` cannot, so lists send none), the
+    row's ``updated_at`` for details. The ETag also covers the
+    query string and the negotiated media type, since those change the
+    representation (page, zoom, format). ``update()`` and ``bulk_create``
+    leave ``updated_at`` alone, so callers using them must touch the rows.
+
+    ``cache_control`` holds the ``Cache-Control`` directives of the viewset,
+    as keyword arguments of ``patch_cache_control``.
+    """
+    modified_field = 'updated_at'
+    cache_control = {'public': True, 'max_age': 0, 'must_revalidate': True}
+
+    def _etag(self, *parts):
+        request = self.request
+        key = '|'.join(str(part) for part in (
+            type(self).__name__, request.get_full_path(), request.accepted_media_type, *parts,
+        ))
+        return f'"{hashlib.md5(key.encode()).hexdigest()}"'
+
+    def list_validators(self):
+        queryset = self.filter_queryset(self.get_queryset()).order_by()
+        stats = queryset.aggregate(modified=Max(self.modified_field), count=Count('pk'))
+        return self._etag(stats['modified'], stats['count']), None
+
+    def detail_validators(self):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        queryset = self.filter_queryset(self.get_queryset()).filter(
+            **{self.lookup_field: self.kwargs[lookup_url_kwarg]}
+        )
+        try:
+            modified = queryset.values_list(self.modified_field, flat=True).first()
+        except (TypeError, ValueError, DjangoValidationError):
+            # Malformed lookup value: let get_object answer the 404.
+            return None, None
+        if modified is None:
+            return None, None
+        return self._etag(self.kwargs[lookup_url_kwarg], modified), modified
+
+    def _set_cache_headers(self, response, etag, modified):
+        if etag:
+            response['ETag'] = etag
+        if modified:
+            response['Last-Modified'] = http_date(modified.timestamp())
+        patch_cache_control(response, **self.cache_control)
+        patch_vary_headers(response, ['Accept'])
+        return response
+
+    def _conditional(self, validators, view, request, *args, **kwargs):
+        etag, modified = validators()
+        if etag is None:
+            return view(request, *args, **kwargs)
+        last_modified = int(modified.timestamp()) if modified else None
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = view(request, *args, **kwargs)
+            if not 200 <= response.status_code < 300:
+                return response
+        return self._set_cache_headers(response, etag, modified)
+
+    def list(self, request, *args, **kwargs):
+        return self._conditional(self.list_validators, super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._conditional(self.detail_validators, super().retrieve, request, *args, **kwargs)
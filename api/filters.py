@@ -0,0 +1,131 @@
+import math
+
+from django.contrib.gis.gdal.error import GDALException
+from django.contrib.gis.geos import GEOSException, GEOSGeometry, Point, Polygon
+from django.contrib.gis.measure import D
+from django.db.models import Subquery
+from django.utils.dateparse import parse_date
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend
+
+METERS_PER_DEGREE = 111320.0
+MAX_DISTANCE = 1000000  # metres
+
+
+class SpatialFilter(BaseFilterBackend):
+    """
+    Spatial query parameters, all resolved through the spatial index of the
+    view's ``geometry_field`` (default ``geometry``), in WGS84:
+
+    * ``bbox=min_lon,min_lat,max_lon,max_lat``: intersects the box;
+    * ``within=<GeoJSON or WKT>``: lies within the geometry;
+    * ``intersects=<GeoJSON or WKT>``: intersects the geometry;
+    * ``dwithin=lon,lat&distance=<metres>``: within that distance of the point.
+    """
+    parameters = ('bbox', 'within', 'intersects', 'dwithin')
+
+    def _geometry(self, name, value):
+        try:
+            geometry = GEOSGeometry(value)
+        except (ValueError, GEOSException, GDALException):
+            raise ValidationError({name: 'Expected a GeoJSON or WKT geometry.'})
+        if geometry.srid is None:
+            geometry.srid = 4326
+        return geometry
+
+    def _numbers(self, name, value, count):
+        try:
+            numbers = [float(part) for part in value.split(',')]
+        except ValueError:
+            numbers = []
+        if len(numbers) != count or not all(math.isfinite(n) for n in numbers):
+            raise ValidationError({name: f'Expected {count} comma-separated numbers.'})
+        return numbers
+
+    def filter_queryset(self, request, queryset, view):
+        field = getattr(view, 'geometry_field', 'geometry')
+        params = request.query_params
+
+        if params.get('bbox'):
+            min_lon, min_lat, max_lon, max_lat = self._numbers('bbox', params['bbox'], 4)
+            if min_lon > max_lon or min_lat > max_lat:
+                raise ValidationError({'bbox': 'Expected min_lon,min_lat,max_lon,max_lat.'})
+            box = Polygon.from_bbox((min_lon, min_lat, max_lon, max_lat))
+            box.srid = 4326
+            queryset = queryset.filter(**{f'{field}__intersects': box})
+        if params.get('within'):
+            queryset = queryset.filter(**{f'{field}__within': self._geometry('within', params['within'])})
+        if params.get('intersects'):
+            queryset = queryset.filter(**{f'{field}__intersects': self._geometry('intersects', params['intersects'])})
+        if params.get('dwithin'):
+            lon, lat = self._numbers('dwithin', params['dwithin'], 2)
+            try:
+                distance = float(params.get('distance', ''))
+            except ValueError:
+                raise ValidationError({'distance': 'dwithin needs a distance in metres.'})
+            if not 0 <= distance <= MAX_DISTANCE:
+                raise ValidationError({'distance': f'Must be between 0 and {MAX_DISTANCE} metres.'})
+            center = Point(lon, lat, srid=4326)
+            # Index-backed prefilter in degrees (widened for the latitude),
+            # then the exact spheroid distance on the few remaining rows.
+            degrees = distance / (METERS_PER_DEGREE * max(math.cos(math.radians(min(abs(lat), 89.0))), 0.01))
+            queryset = queryset.filter(**{
+                f'{field}__dwithin': (center, degrees),
+                f'{field}__distance_lte': (center, D(m=distance)),
+            })
+        return queryset
+
+
+class SceneFilter(SpatialFilter):
+    """
+    Scene lookup on ``SatelliteImage``, through the spatial index of
+    ``valid_data`` (the pixels actually holding data):
+
+    * ``zone=<UserZone id>``: intersects the zone;
+    * ``alert=<IoTAlert id>``: covers the location of the alerting reading;
+    * ``covers=<GeoJSON or WKT>``: covers the whole geometry;
+    * ``from``/``to`` (ISO dates): acquisition date range;
+    * ``max_cloud_cover``: percentage;
+
+    plus the ``SpatialFilter`` parameters. Zone and alert geometries are
+    read in a subquery, so each lookup is a single statement.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        from geoapp.models import IoTAlert, IoTData, UserZone
+
+        queryset = super().filter_queryset(request, queryset, view)
+        field = getattr(view, 'geometry_field', 'valid_data')
+        params = request.query_params
+
+        if params.get('zone'):
+            if not params['zone'].isdigit():
+                raise ValidationError({'zone': 'Expected a zone id.'})
+            zone = UserZone.objects.filter(pk=params['zone']).values('geometry')[:1]
+            queryset = queryset.filter(**{f'{field}__intersects': Subquery(zone)})
+        if params.get('alert'):
+            if not params['alert'].isdigit():
+                raise ValidationError({'alert': 'Expected an alert id.'})
+            alert = IoTAlert.objects.filter(pk=params['alert'])
+            location = IoTData.objects.filter(
+                id=Subquery(alert.values('reading_id')[:1]),
+                timestamp=Subquery(alert.values('reading_timestamp')[:1]),
+            ).values('location')[:1]
+            queryset = queryset.filter(**{f'{field}__covers': Subquery(location)})
+        if params.get('covers'):
+            queryset = queryset.filter(**{f'{field}__covers': self._geometry('covers', params['covers'])})
+        for name, lookup in (('from', 'gte'), ('to', 'lte')):
+            if params.get(name):
+                try:
+                    value = parse_date(params[name])
+                except ValueError:
+                    value = None
+                if value is None:
+                    raise ValidationError({name: 'Expected a date (YYYY-MM-DD).'})
+                queryset = queryset.filter(**{f'acquisition_date__{lookup}': value})
+        if params.get('max_cloud_cover'):
+            try:
+                queryset = queryset.filter(cloud_cover__lte=float(params['max_cloud_cover']))
+            except ValueError:
+                raise ValidationError({'max_cloud_cover': 'Expected a number.'})
+        return queryset
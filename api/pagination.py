@@ -0,0 +1,30 @@
+from rest_framework.pagination import CursorPagination
+
+
+class IdCursorPagination(CursorPagination):
+    """
+    Keyset pagination on the primary key: each page is an index range scan
+    from the previous cursor, whatever the depth, and stays consistent while
+    rows are inserted.
+    """
+    ordering = 'id'
+    page_size = 500
+    page_size_query_param = 'page_size'
+    max_page_size = 5000
+
+
+class OptionalCursorPaginationMixin:
+    """
+    Viewset mixin: ``?pagination=cursor`` (first page) or ``?cursor=`` (next
+    pages) switch to ``IdCursorPagination``; other requests keep the default
+    pagination.
+    """
+    cursor_pagination_class = IdCursorPagination
+
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator') and self.request is not None:
+            params = self.request.query_params
+            if params.get('pagination') == 'cursor' or 'cursor' in params:
+                self._paginator = self.cursor_pagination_class()
+        return super().paginator
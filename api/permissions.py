@@ -19,13 +19,15 @@ class IsOwnerOrReadOnly(permissions.BasePermission):
             return True
 
         # Les permissions d'écriture ne sont accordées qu'au propriétaire de l'objet
-        # ou si l'utilisateur est un administrateur
-        if hasattr(obj, 'user'):
-            return obj.user == request.user or request.user.is_staff
-        elif hasattr(obj, 'created_by'):
-            return obj.created_by == request.user or request.user.is_staff
-        elif hasattr(obj, 'user_zone'):
-            return obj.user_zone.user == request.user or request.user.is_staff
+        # ou si l'utilisateur est un administrateur.
+        # On compare les clés étrangères (user_id...) pour ne pas charger les objets liés.
+        if hasattr(obj, 'user_id'):
+            return obj.user_id == request.user.pk or request.user.is_staff
+        elif hasattr(obj, 'created_by_id'):
+            return obj.created_by_id == request.user.pk or request.user.is_staff
+        elif hasattr(obj, 'user_zone_id'):
+            # Sans requête si la vue charge la zone avec select_related('user_zone').
+            return obj.user_zone.user_id == request.user.pk or request.user.is_staff
         
         # Par défaut, refuser la permission
         return False
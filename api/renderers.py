@@ -0,0 +1,21 @@
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from rest_framework.renderers import BaseRenderer
+
+
+class GeoJSONRenderer(BaseRenderer):
+    """
+    Registers ``?format=geojson`` / ``Accept: application/geo+json``. List
+    views stream their FeatureCollection themselves (see
+    ``GeoJSONListMixin``); anything else reaching this renderer (a detail
+    response, an error) is written as plain JSON.
+    """
+    media_type = 'application/geo+json'
+    format = 'geojson'
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return json.dumps(data, cls=DjangoJSONEncoder).encode('utf-8')
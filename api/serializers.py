@@ -1,13 +1,29 @@
+from django.db import connection
 from rest_framework import serializers
 from django.contrib.auth.models import User
-from geoapp.models import Region, Point, DataLayer, UserZone, RealTime, Satellite, SatelliteImage, EOData, IoTData, IndexAnalysis, Cartographical
+from geoapp.models import Region, Point, DataLayer, UserZone, RealTime, Satellite, SatelliteImage, EOData, IoTData, IoTAlert, IndexAnalysis, Cartographical
 
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ['id', 'username', 'email', 'first_name', 'last_name', 'is_active']
 
-class RegionSerializer(serializers.ModelSerializer):
+class SimplifiedGeometryMixin:
+    """
+    Serializes ``geometry`` from the precomputed ``geometry_<level>`` column
+    when the view put a ``geometry_level`` in the context (see
+    ``geoapp.simplify``).
+    """
+
+    def to_representation(self, instance):
+        level = self.context.get('geometry_level')
+        simplified = getattr(instance, f'geometry_{level}', None) if level else None
+        if simplified is not None:
+            # Read-only responses only: the instance is not saved afterwards.
+            instance.geometry = simplified
+        return super().to_representation(instance)
+
+class RegionSerializer(SimplifiedGeometryMixin, serializers.ModelSerializer):
     class Meta:
         model = Region
         fields = ['id', 'name', 'code', 'geometry', 'population', 'area', 'created_at', 'updated_at']
@@ -22,10 +38,11 @@ class DataLayerSerializer(serializers.ModelSerializer):
         model = DataLayer
         fields = ['id', 'name', 'description', 'created_at', 'updated_at']
 
-class UserZoneSerializer(serializers.ModelSerializer):
+class UserZoneSerializer(SimplifiedGeometryMixin, serializers.ModelSerializer):
     class Meta:
         model = UserZone
         fields = ['id', 'name', 'user', 'geometry']
+        read_only_fields = ['user']
 
 class RealTimeSerializer(serializers.ModelSerializer):
     class Meta:
@@ -50,15 +67,66 @@ class EODataSerializer(serializers.ModelSerializer):
 class CartographicalSerializer(serializers.ModelSerializer):
     class Meta:
         model = Cartographical
-        fields = '__all__'
+        exclude = ['shape']
+
+TIMESERIES_LENGTH = 100
+
+
+class IoTDataListSerializer(serializers.ListSerializer):
+    """
+    Loads the history behind a whole page of readings in one query, so that
+    ``IoTDataSerializer.get_timeseries`` reads it from memory instead of
+    querying once per row. Each reading's history is that of its own device.
+    """
+
+    def to_representation(self, data):
+        items = list(data.all() if hasattr(data, 'all') else data)
+        if items and 'timeseries' in self.child.fields:
+            self._context['iot_timeseries'] = self.load_timeseries(items)
+        return super().to_representation(items)
+
+    @staticmethod
+    def load_timeseries(items):
+        """
+        ``{(device_id, timestamp): [(timestamp, value), ...]}``: for each
+        reading of the page, the TIMESERIES_LENGTH readings of its device
+        before it. One LATERAL query, each side an index range scan on
+        (device_id, timestamp), so at most TIMESERIES_LENGTH rows per row of
+        the page are read however far apart the page's readings are.
+        """
+        keys = list(dict.fromkeys((item.device_id, item.timestamp) for item in items))
+        qn = connection.ops.quote_name
+        sql = f"""
+            SELECT page.device_id, page.ts, history.ts, history.value
+            FROM unnest(%s::text[], %s::timestamptz[]) AS page(device_id, ts)
+            CROSS JOIN LATERAL (
+                SELECT r.{qn('timestamp')} AS ts, r.{qn('bme_temp')} AS value
+                FROM {qn(IoTData._meta.db_table)} r
+                WHERE r.{qn('device_id')} = page.device_id AND r.{qn('timestamp')} < page.ts
+                ORDER BY r.{qn('timestamp')} DESC
+                LIMIT %s
+            ) AS history
+            ORDER BY page.device_id, page.ts, history.ts
+        """
+        series = {key: [] for key in keys}
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [[device_id for device_id, _ in keys], [timestamp for _, timestamp in keys], TIMESERIES_LENGTH])
+            for device_id, timestamp, history_timestamp, value in cursor.fetchall():
+                series[(device_id, timestamp)].append((history_timestamp, value))
+        return series
+
 
 class IoTDataSerializer(serializers.ModelSerializer):
     timeseries = serializers.SerializerMethodField()
     class Meta:
         model = IoTData
+        list_serializer_class = IoTDataListSerializer
         fields = [
             'id',
             'timestamp',
+            'device_id',
+            'location',
+            'region',
             'amg_avg_temp',
             'amg_max_temp',
             'amg_min_temp',
@@ -71,18 +139,41 @@ class IoTDataSerializer(serializers.ModelSerializer):
             'timeseries'
         ]
 
+    def get_fields(self):
+        fields = super().get_fields()
+        request = self.context.get('request')
+        # ?timeseries=none drops the per-row history, e.g. for clients that
+        # fetch it once from the iot-data/timeseries/ endpoint.
+        if self.context.get('timeseries') is False or (
+            request is not None and request.query_params.get('timeseries') == 'none'
+        ):
+            fields.pop('timeseries')
+        return fields
+
     def get_timeseries(self, obj):
-        historical_data = IoTData.objects.filter(timestamp__lt=obj.timestamp).order_by('-timestamp')[:100]
+        preloaded = self.context.get('iot_timeseries')
+        if preloaded is not None:
+            series = preloaded.get((obj.device_id, obj.timestamp), [])
+            return [{'timestamp': timestamp, 'value': value} for timestamp, value in series]
+        historical_data = IoTData.objects.filter(device_id=obj.device_id, timestamp__lt=obj.timestamp).order_by('-timestamp')[:TIMESERIES_LENGTH]
         return [{'timestamp': point.timestamp, 'value': point.bme_temp} for point in reversed(historical_data)]
 
+class IoTAlertSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = IoTAlert
+        fields = ['id', 'kind', 'device_id', 'metric', 'value', 'score', 'message', 'reading_id', 'reading_timestamp', 'acknowledged', 'created_at']
+        read_only_fields = ['kind', 'device_id', 'metric', 'value', 'score', 'message', 'reading_id', 'reading_timestamp', 'created_at']
+
 class IndexAnalysisSerializer(serializers.ModelSerializer):
     class Meta:
         model = IndexAnalysis
         fields = '__all__'
 
-class UserZoneWithAnalysisSerializer(serializers.ModelSerializer):
-    analysis = IndexAnalysisSerializer(many=True, read_only=True)
+class UserZoneWithAnalysisSerializer(SimplifiedGeometryMixin, serializers.ModelSerializer):
+    # Reads the prefetched analyses (see UserZoneViewSet.get_queryset).
+    analysis = IndexAnalysisSerializer(source='index_analyses', many=True, read_only=True)
     
     class Meta:
         model = UserZone
         fields = ['id', 'name', 'user', 'geometry', 'analysis']
+        read_only_fields = ['user']
@@ -0,0 +1,23 @@
+from contextlib import contextmanager
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test.utils import CaptureQueriesContext
+
+
+class QueryBudgetMixin:
+    """
+    TestCase mixin: ``assertMaxQueries(budget)`` fails when the block runs
+    more than ``budget`` queries and lists them, so an N+1 regression shows
+    up as a failed budget with the repeated statement in the report.
+    Budgets should not depend on the number of rows: create several rows in
+    the test so that a per-row query would exceed the budget.
+    """
+
+    @contextmanager
+    def assertMaxQueries(self, budget, using=DEFAULT_DB_ALIAS):
+        with CaptureQueriesContext(connections[using]) as context:
+            yield context
+        executed = len(context.captured_queries)
+        if executed > budget:
+            queries = '\n'.join(f"{i}. {query['sql']}" for i, query in enumerate(context.captured_queries, start=1))
+            self.fail(f"{executed} queries executed, budget is {budget}:\n{queries}")
@@ -0,0 +1,59 @@
+from unittest import mock
+from django.contrib.gis.geos import MultiPolygon, Polygon
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from api.serializers import RegionSerializer
+from geoapp.models import Region
+
+
+def square(x):
+    return MultiPolygon(Polygon(((x, 0), (x + 1, 0), (x + 1, 1), (x, 1), (x, 0))), srid=4326)
+
+
+class ConditionalGetTests(APITestCase):
+    def setUp(self):
+        self.region = Region.objects.create(name='North', code='N', geometry=square(0))
+        Region.objects.create(name='South', code='S', geometry=square(2))
+
+    def test_unchanged_list_answers_304_without_serializing(self):
+        url = reverse('region-list')
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response['ETag']
+        self.assertIn('max-age=300', response['Cache-Control'])
+        with mock.patch.object(RegionSerializer, 'to_representation', side_effect=AssertionError):
+            not_modified = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(not_modified.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(not_modified.content, b'')
+        self.assertEqual(not_modified['ETag'], etag)
+        # Other parameters are another representation.
+        self.assertEqual(self.client.get(url, {'zoom': 3}, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_200_OK)
+
+    def test_changes_and_deletions_change_the_list_etag(self):
+        url = reverse('region-list')
+        etag = self.client.get(url)['ETag']
+        self.region.name = 'Far North'
+        self.region.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response['ETag']
+        Region.objects.filter(code='S').delete()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_200_OK)
+        # MAX(updated_at) misses deletions: lists are validated by ETag only.
+        self.assertNotIn('Last-Modified', response)
+        self.assertEqual(
+            self.client.get(url, HTTP_IF_MODIFIED_SINCE='Fri, 01 Jan 2100 00:00:00 GMT').status_code,
+            status.HTTP_200_OK,
+        )
+
+    def test_detail_validators(self):
+        url = reverse('region-detail', args=[self.region.pk])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(
+            self.client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']).status_code,
+            status.HTTP_304_NOT_MODIFIED,
+        )
+        self.assertEqual(self.client.get(reverse('region-detail', args=[0])).status_code, status.HTTP_404_NOT_FOUND)
@@ -0,0 +1,222 @@
+import json
+import math
+from django.contrib.auth.models import User
+from django.contrib.gis.geos import MultiPolygon, Polygon
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from geoapp.models import Region, UserZone
+
+
+def detailed_polygon(vertices=2000, radius=1.0):
+    ring = [(radius * math.cos(2 * math.pi * i / vertices), radius * math.sin(2 * math.pi * i / vertices)) for i in range(vertices)]
+    return MultiPolygon(Polygon(ring + ring[:1]), srid=4326)
+
+
+class SimplifiedGeometryTests(APITestCase):
+    def setUp(self):
+        self.region = Region.objects.create(name='Coast', code='CST', geometry=detailed_polygon())
+
+    def test_levels_are_computed_on_save(self):
+        self.region.refresh_from_db()
+        self.assertLess(self.region.geometry_low.num_coords, 100)
+        self.assertLess(self.region.geometry_low.num_coords, self.region.geometry_high.num_coords)
+        self.assertEqual(self.region.geometry_high.geom_type, 'MultiPolygon')
+
+    def test_zoom_serves_smaller_geometry(self):
+        url = reverse('region-detail', args=[self.region.pk])
+        full = self.client.get(url)
+        coarse = self.client.get(url, {'zoom': 3})
+        self.assertEqual(coarse.status_code, status.HTTP_200_OK)
+        self.assertLess(len(json.dumps(coarse.data, default=str)) * 10, len(json.dumps(full.data, default=str)))
+        self.assertEqual(self.client.get(url, {'zoom': 'far'}).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_user_zone_owner_is_read_only(self):
+        owner = User.objects.create_user(username='zone_owner', password='pass')
+        other = User.objects.create_user(username='zone_other', password='pass')
+        self.client.login(username='zone_owner', password='pass')
+        response = self.client.post(reverse('userzone-list'), {
+            'name': 'Plot', 'user': other.pk, 'geometry': detailed_polygon(16).wkt,
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(UserZone.objects.get(pk=response.data['id']).user, owner)
+        self.assertNotIn('geometry_low', response.data)
+
+
+class VectorTileTests(APITestCase):
+    def setUp(self):
+        self.region = Region.objects.create(name='Coast', code='CST', geometry=detailed_polygon())
+
+    def test_tile_is_cached_until_the_layer_changes(self):
+        url = reverse('mvt-tile', args=['regions', 0, 0, 0])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'application/vnd.mapbox-vector-tile')
+        self.assertTrue(response.content)
+        etag = response['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_304_NOT_MODIFIED)
+
+        self.region.name = 'Renamed'
+        self.region.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_200_OK)
+
+    def test_empty_and_invalid_tiles(self):
+        # Tile z=4 x=0 y=0 covers the far north-west, away from the region.
+        self.assertEqual(self.client.get(reverse('mvt-tile', args=['regions', 4, 0, 0])).status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(self.client.get(reverse('mvt-tile', args=['regions', 1, 2, 0])).status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.client.get(reverse('mvt-tile', args=['rivers', 0, 0, 0])).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_malformed_cartographical_is_skipped(self):
+        from geoapp.models import Cartographical
+        Cartographical.objects.create(region=self.region, name='Broken', geometry={'type': 'Polygon', 'coordinates': [[1]]})
+        Cartographical.objects.create(region=self.region, name='Plot', geometry={
+            'type': 'Feature', 'properties': {},
+            'geometry': {'type': 'Polygon', 'coordinates': [[[0, 0], [0.5, 0], [0.5, 0.5], [0, 0.5], [0, 0]]]},
+        })
+        self.assertEqual(list(Cartographical.objects.filter(shape__isnull=True).values_list('name', flat=True)), ['Broken'])
+        response = self.client.get(reverse('mvt-tile', args=['cartographicals', 0, 0, 0]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.content)
+
+
+class SpatialFilterTests(APITestCase):
+    def setUp(self):
+        from geoapp.models import Point as MapPoint
+        from django.contrib.gis.geos import Point
+        region = Region.objects.create(name='Grid', code='GRD', geometry=detailed_polygon(64, radius=5.0))
+        MapPoint.objects.bulk_create([
+            MapPoint(name=f'p{x}_{y}', region=region, location=Point(x * 0.1, y * 0.1, srid=4326))
+            for x in range(10) for y in range(10)
+        ])
+
+    def rows(self, response):
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data['results'] if isinstance(response.data, dict) else response.data
+
+    def test_bbox_and_intersects(self):
+        rows = self.rows(self.client.get(reverse('point-list'), {'bbox': '-0.01,-0.01,0.15,0.25'}))
+        self.assertEqual(sorted(r['name'] for r in rows), ['p0_0', 'p0_1', 'p0_2', 'p1_0', 'p1_1', 'p1_2'])
+        area = json.dumps({'type': 'Polygon', 'coordinates': [[[0.85, 0.85], [1, 0.85], [1, 1], [0.85, 1], [0.85, 0.85]]]})
+        rows = self.rows(self.client.get(reverse('point-list'), {'intersects': area}))
+        self.assertEqual([r['name'] for r in rows], ['p9_9'])
+        self.assertEqual(self.client.get(reverse('point-list'), {'bbox': '1,2,3'}).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_dwithin_uses_metres(self):
+        # 0.1 degree is about 11 km at the equator.
+        rows = self.rows(self.client.get(reverse('point-list'), {'dwithin': '0,0', 'distance': 12000}))
+        self.assertEqual(sorted(r['name'] for r in rows), ['p0_0', 'p0_1', 'p1_0'])
+
+    def test_regions_within(self):
+        box = 'POLYGON((-6 -6, 6 -6, 6 6, -6 6, -6 -6))'
+        self.assertEqual(len(self.rows(self.client.get(reverse('region-list'), {'within': box}))), 1)
+
+    def test_cursor_pagination_is_opt_in(self):
+        response = self.client.get(reverse('point-list'), {'pagination': 'cursor', 'page_size': 40})
+        first = response.data
+        self.assertEqual(len(first['results']), 40)
+        second = self.client.get(first['next']).data
+        self.assertEqual(len(second['results']), 40)
+        self.assertLess(first['results'][-1]['id'], second['results'][0]['id'])
+
+
+class GeoJSONRendererTests(APITestCase):
+    def setUp(self):
+        from geoapp.models import Cartographical
+        self.region = Region.objects.create(name='Coast', code='CST', geometry=detailed_polygon(), population=1200)
+        Cartographical.objects.create(name='Clearing', region=self.region, geometry={
+            'type': 'Feature', 'properties': {}, 'geometry': {'type': 'Point', 'coordinates': [1.5, 2.5]},
+        })
+
+    def collection(self, response):
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/geo+json')
+        data = json.loads(b''.join(response.streaming_content))
+        self.assertEqual(data['type'], 'FeatureCollection')
+        return data['features']
+
+    def test_format_query_parameter(self):
+        features = self.collection(self.client.get(reverse('region-list'), {'format': 'geojson'}))
+        self.assertEqual(len(features), 1)
+        self.assertEqual(features[0]['id'], self.region.pk)
+        self.assertEqual(features[0]['geometry']['type'], 'MultiPolygon')
+        self.assertEqual(features[0]['properties']['population'], 1200)
+        coarse = self.collection(self.client.get(reverse('region-list'), {'format': 'geojson', 'zoom': 3}))
+        self.assertLess(len(coarse[0]['geometry']['coordinates'][0][0]), len(features[0]['geometry']['coordinates'][0][0]))
+
+    def test_accept_header_and_json_geometry(self):
+        features = self.collection(self.client.get(reverse('cartographical-list'), HTTP_ACCEPT='application/geo+json'))
+        self.assertEqual(features[0]['geometry'], {'type': 'Point', 'coordinates': [1.5, 2.5]})
+        self.assertEqual(features[0]['properties']['region'], self.region.pk)
+
+    def test_non_geometry_json_is_emitted_as_null(self):
+        from geoapp.models import Cartographical
+        for value in ([1, 2], 'POINT (1 2)', {'type': 'FeatureCollection', 'features': []}):
+            Cartographical.objects.create(name='Odd', region=self.region, geometry=value)
+        features = self.collection(self.client.get(reverse('cartographical-list'), {'format': 'geojson'}))
+        self.assertEqual(len(features), 4)
+        self.assertEqual([f['geometry'] for f in features if f['properties']['name'] == 'Odd'], [None, None, None])
+
+
+class BulkExportTests(APITestCase):
+    def setUp(self):
+        from geoapp.models import Point as MapPoint
+        from django.contrib.gis.geos import Point
+        user = User.objects.create_user(username='exporter', password='pass')
+        self.client.login(username='exporter', password='pass')
+        region = Region.objects.create(name='Grid', code='GRD', geometry=detailed_polygon(64, radius=5.0))
+        MapPoint.objects.bulk_create([
+            MapPoint(name=f'p{x}', region=region, location=Point(x, 0, srid=4326)) for x in range(4)
+        ])
+        UserZone.objects.create(user=user, name='Plot', geometry=detailed_polygon(16, radius=0.5))
+
+    def test_geojson_streams_several_layers(self):
+        response = self.client.get(reverse('bulk-export'), {'layers': 'regions,points,user-zones', 'bbox': '-0.5,-0.5,1.5,0.5'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        features = json.loads(b''.join(response.streaming_content))['features']
+        layers = [f['properties']['layer'] for f in features]
+        self.assertEqual(layers, ['regions', 'points', 'points', 'user-zones'])
+        self.assertEqual(features[1]['geometry'], {'type': 'Point', 'coordinates': [0, 0]})
+
+    def test_date_filter_and_errors(self):
+        response = self.client.get(reverse('bulk-export'), {'layers': 'points', 'from': '2999-01-01'})
+        self.assertEqual(json.loads(b''.join(response.streaming_content))['features'], [])
+        self.assertEqual(self.client.get(reverse('bulk-export'), {'layers': 'rivers'}).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get(reverse('bulk-export'), {'format': 'shp'}).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            self.client.get(reverse('bulk-export'), {'layers': 'regions,points', 'format': 'fgb'}).status_code,
+            status.HTTP_400_BAD_REQUEST,
+        )
+
+    def test_alerts_are_located_by_their_reading(self):
+        from django.contrib.gis.geos import Point
+        from geoapp.models import IoTAlert, IoTData
+        readings = IoTData.objects.bulk_create([
+            IoTData(device_id=f's{x}', location=Point(x, 0, srid=4326), bme_temp=20.0) for x in (0, 3)
+        ])
+        IoTAlert.objects.bulk_create([
+            IoTAlert(kind='fire', device_id=r.device_id, reading_id=r.pk, reading_timestamp=r.timestamp) for r in readings
+        ])
+        response = self.client.get(reverse('bulk-export'), {'layers': 'alerts', 'bbox': '-0.5,-0.5,1.5,0.5'})
+        features = json.loads(b''.join(response.streaming_content))['features']
+        self.assertEqual([f['properties']['device_id'] for f in features], ['s0'])
+        self.assertEqual(features[0]['geometry'], {'type': 'Point', 'coordinates': [0, 0]})
+        response = self.client.get(reverse('bulk-export'), {'layers': 'alerts', 'to': 'tomorrow'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('to', response.json())
+
+    def test_geopackage(self):
+        try:
+            from osgeo import ogr
+        except ImportError:
+            self.skipTest('GDAL Python bindings are not installed')
+        import tempfile
+        response = self.client.get(reverse('bulk-export'), {'layers': 'regions,points', 'format': 'gpkg'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        with tempfile.NamedTemporaryFile(suffix='.gpkg') as f:
+            f.write(b''.join(response.streaming_content))
+            f.flush()
+            dataset = ogr.Open(f.name)
+            self.assertEqual(dataset.GetLayerByName('points').GetFeatureCount(), 4)
+            self.assertEqual(dataset.GetLayerByName('regions').GetFeatureCount(), 1)
@@ -0,0 +1,107 @@
+import importlib.util
+import tempfile
+from datetime import date
+from unittest import mock
+from django.contrib.auth.models import User
+from django.contrib.gis.geos import MultiPolygon, Polygon
+from django.core.files.base import ContentFile
+from django.test import TestCase, override_settings
+from geoapp import analysis
+from geoapp.models import EOData, IndexAnalysis, Region, UserZone
+
+
+def square(x0, y0, size):
+    return MultiPolygon(Polygon(((x0, y0), (x0 + size, y0), (x0 + size, y0 + size), (x0, y0 + size), (x0, y0))), srid=4326)
+
+
+def geotiff(west, north, size=10, resolution=0.01, value=0.5):
+    import numpy as np
+    from rasterio.io import MemoryFile
+    from rasterio.transform import from_origin
+    data = np.full((size, size), value, dtype='float32')
+    data[:, size // 2:] = value + 0.2  # eastern half
+    with MemoryFile() as memory:
+        with memory.open(driver='GTiff', height=size, width=size, count=1, dtype='float32',
+                         crs='EPSG:4326', transform=from_origin(west, north, resolution, resolution)) as dst:
+            dst.write(data, 1)
+        return memory.read()
+
+
+class IndexAnalysisEngineTests(TestCase):
+    def setUp(self):
+        if importlib.util.find_spec('rasterio') is None:
+            self.skipTest("rasterio is not installed")
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings_override = override_settings(MEDIA_ROOT=directory.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.user = User.objects.create_user(username='analyst', password='pass')
+        self.region = Region.objects.create(name='Forest', code='FOR', geometry=square(0, 0, 0.1))
+        Region.objects.create(name='Elsewhere', code='ELS', geometry=square(10, 10, 0.1))
+        self.west = UserZone.objects.create(user=self.user, name='West', geometry=square(0.01, 0.01, 0.03))
+        self.east = UserZone.objects.create(user=self.user, name='East', geometry=square(0.06, 0.01, 0.03))
+        self.far = UserZone.objects.create(user=self.user, name='Far', geometry=square(10.01, 10.01, 0.03))
+        self.eo_data = EOData(region=self.region, index_type='NDVI', acquisition_date=date(2024, 5, 1))
+        self.eo_data.raster_file.save('ndvi.tif', ContentFile(geotiff(0, 0.1)), save=False)
+        self.eo_data.save()
+
+    def test_only_overlapping_pairs_are_matched(self):
+        self.assertEqual(set(analysis.zones_for(self.eo_data)), {self.west, self.east})
+        self.assertEqual(list(analysis.rasters_for(self.far)), [])
+        self.assertEqual(list(analysis.rasters_for(self.west)), [self.eo_data])
+
+    def test_compute_upserts_per_raster(self):
+        self.assertEqual(analysis.compute(self.eo_data, analysis.zones_for(self.eo_data)), 2)
+        self.assertAlmostEqual(IndexAnalysis.objects.get(user_zone=self.west).mean_value, 0.5, places=5)
+        self.assertAlmostEqual(IndexAnalysis.objects.get(user_zone=self.east).mean_value, 0.7, places=5)
+        analysis.compute(self.eo_data, [self.west])
+        self.assertEqual(IndexAnalysis.objects.count(), 2)
+
+    def test_events_queue_only_affected_pairs(self):
+        with mock.patch('geoapp.tasks.compute_index_analyses.delay') as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                zone = UserZone.objects.create(user=self.user, name='New', geometry=square(0.02, 0.02, 0.02))
+            delay.assert_called_once_with(str(self.eo_data.pk), [zone.pk])
+            delay.reset_mock()
+            with self.captureOnCommitCallbacks(execute=True):
+                zone.name = 'Renamed'
+                zone.save()
+                UserZone.objects.create(user=self.user, name='Far too', geometry=square(10.02, 10.02, 0.02))
+            delay.assert_not_called()
+
+    def test_summary_edits_do_not_requeue(self):
+        with mock.patch('geoapp.tasks.compute_index_analyses.delay') as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.eo_data.mean_value = 0.4
+                self.eo_data.save()
+            delay.assert_not_called()
+            with self.captureOnCommitCallbacks(execute=True):
+                self.eo_data.raster_file.save('ndvi2.tif', ContentFile(geotiff(0, 0.1)), save=True)
+            delay.assert_called_once_with(str(self.eo_data.pk))
+
+    def test_stale_analyses_are_removed(self):
+        analysis.compute(self.eo_data, analysis.zones_for(self.eo_data))
+        # The west zone moves away from the raster.
+        with mock.patch('geoapp.tasks.compute_index_analyses.delay'):
+            self.west.geometry = square(10.05, 10.05, 0.02)
+            self.west.save()
+        self.assertFalse(IndexAnalysis.objects.filter(user_zone=self.west).exists())
+        # A zone the raster holds no data for loses its analysis.
+        with mock.patch('geoapp.analysis.zone_statistics', return_value=None):
+            analysis.compute(self.eo_data, [self.east])
+        self.assertFalse(IndexAnalysis.objects.filter(user_zone=self.east).exists())
+
+    def test_integer_raster_with_nodata(self):
+        import numpy as np
+        from rasterio.io import MemoryFile
+        from rasterio.transform import from_origin
+        data = np.full((10, 10), 5000, dtype='int16')
+        data[:, :2] = -9999
+        with MemoryFile() as memory:
+            with memory.open(driver='GTiff', height=10, width=10, count=1, dtype='int16', nodata=-9999,
+                             crs='EPSG:4326', transform=from_origin(0, 0.1, 0.01, 0.01)) as dst:
+                dst.write(data, 1)
+            with memory.open() as src:
+                minimum, maximum, mean, pixels = analysis.zone_statistics(src, square(0, 0, 0.1))
+        self.assertEqual((minimum, maximum, mean, pixels), (5000.0, 5000.0, 5000.0, 80))
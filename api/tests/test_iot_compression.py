@@ -0,0 +1,76 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from geoapp.compression import DEFAULTS, DEVICES_KEY, Compressor, _state_key, compress, flush_pending, reconstruct
+from geoapp.models import IoTData
+
+
+class IngestCompressionTests(SimpleTestCase):
+    def setUp(self):
+        self.start = datetime(2025, 7, 1, 12, 0, tzinfo=dt_timezone.utc)
+
+    def run_series(self, mode, values, tolerance=0.5):
+        compressor = Compressor(options={**DEFAULTS, 'MODE': mode, 'DEFAULT_TOLERANCE': tolerance})
+        stored = []
+        for second, value in enumerate(values):
+            reading = IoTData(timestamp=self.start + timedelta(seconds=10 * second), bme_temp=value)
+            stored.extend(compressor.process(reading))
+        return [r.bme_temp for r in stored]
+
+    def test_deadband_drops_small_changes(self):
+        values = [20.0, 20.1, 20.2, 19.9, 20.6, 20.7, 20.0]
+        self.assertEqual(self.run_series('deadband', values), [20.0, 20.6, 20.0])
+
+    def test_swinging_door_keeps_turning_points(self):
+        ramp_up = [20.0 + i for i in range(10)]
+        ramp_down = [29.0 - i for i in range(1, 10)]
+        stored = self.run_series('swinging_door', ramp_up + ramp_down)
+        # the start and the peak; the end of the ramp is still held back
+        self.assertEqual(stored, [20.0, 29.0])
+
+    def test_heartbeat_forces_a_row(self):
+        compressor = Compressor(options={**DEFAULTS, 'MODE': 'deadband', 'DEFAULT_TOLERANCE': 1.0, 'HEARTBEAT': 60})
+        kept = [
+            compressor.process(IoTData(timestamp=self.start + timedelta(seconds=10 * i), bme_temp=20.0))
+            for i in range(8)
+        ]
+        self.assertEqual([i for i, rows in enumerate(kept) if rows], [0, 6])
+
+    def test_reconstruction(self):
+        points = [(self.start, 0.0), (self.start + timedelta(seconds=100), 10.0)]
+        end = self.start + timedelta(seconds=100)
+        step = reconstruct(points, self.start, end, 50, 'step')
+        linear = reconstruct(points, self.start, end, 50, 'linear')
+        self.assertEqual([p['value'] for p in step], [0.0, 0.0, 10.0])
+        self.assertEqual([p['value'] for p in linear], [0.0, 5.0, 10.0])
+
+
+@override_settings(IOT_COMPRESSION={'MODE': 'swinging_door', 'DEFAULT_TOLERANCE': 0.5})
+class SharedStateTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        start = datetime(2025, 7, 1, 12, 0, tzinfo=dt_timezone.utc)
+        self.readings = [
+            IoTData(device_id='station-1', timestamp=start + timedelta(seconds=10 * i), bme_temp=20.0 + i)
+            for i in range(2)
+        ]
+
+    def test_state_is_published_on_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.assertEqual(compress(self.readings), self.readings[:1])
+        self.assertIsNone(cache.get(_state_key('station-1')))
+        for callback in callbacks:
+            callback()
+        pending = cache.get(_state_key('station-1'))['pending']
+        self.assertNotIsInstance(pending, IoTData)
+        self.assertEqual(pending['values'], {'bme_temp': 21.0})
+        self.assertEqual(cache.get(DEVICES_KEY), {'station-1'})
+
+    def test_held_back_reading_is_flushed(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            compress(self.readings)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(flush_pending(), 1)
+        reading = IoTData.objects.get()
+        self.assertEqual((reading.device_id, reading.timestamp, reading.bme_temp), ('station-1', self.readings[1].timestamp, 21.0))
+        self.assertIsNone(cache.get(_state_key('station-1'))['pending'])
@@ -0,0 +1,84 @@
+import threading
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.core.cache import cache
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+from geoapp.anomaly import DEFAULTS, Detector, _state_key, detect, lock_keys
+from geoapp.locks import cache_locks
+from geoapp.models import IoTData
+
+
+class StreamingDetectorTests(SimpleTestCase):
+    def setUp(self):
+        self.start = datetime(2025, 7, 1, 12, 0, tzinfo=dt_timezone.utc)
+        self.detector = Detector(options=DEFAULTS)
+
+    def feed(self, minute, **values):
+        reading = IoTData(timestamp=self.start + timedelta(minutes=minute), **values)
+        return self.detector.process(reading)
+
+    def test_stable_readings_raise_nothing(self):
+        for minute in range(50):
+            self.assertEqual(self.feed(minute, amg_max_temp=25 + (minute % 3) * 0.5, bme_temp=22), [])
+
+    def test_fast_thermal_rise_is_fire(self):
+        for minute in range(30):
+            self.feed(minute, amg_max_temp=25 + (minute % 2) * 0.5)
+        alerts = self.feed(30, amg_max_temp=45)
+        self.assertEqual([a.kind for a in alerts], ['fire'])
+        self.assertEqual(alerts[0].metric, 'amg_max_temp')
+
+    def test_absolute_temperature_and_cooldown(self):
+        self.assertEqual([a.kind for a in self.feed(0, amg_max_temp=70)], ['fire'])
+        self.assertEqual(self.feed(1, amg_max_temp=72), [])
+        self.assertEqual([a.kind for a in self.feed(11, amg_max_temp=72)], ['fire'])
+
+    def test_drought(self):
+        alerts = self.feed(0, soil_moisture=10, bme_humidity=20, bme_temp=35)
+        self.assertEqual([a.kind for a in alerts], ['drought'])
+
+    def test_state_is_constant_size(self):
+        for minute in range(500):
+            self.feed(minute, amg_max_temp=25, soil_moisture=40)
+        self.assertEqual(set(self.detector.state['metrics']), {'amg_max_temp', 'soil_moisture'})
+
+
+class SharedStateTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.start = datetime(2025, 7, 1, 12, 0, tzinfo=dt_timezone.utc)
+
+    def batch(self, offset):
+        return [
+            IoTData(device_id='station-1', timestamp=self.start + timedelta(seconds=offset + i), bme_temp=20.0)
+            for i in range(20)
+        ]
+
+    def ingest(self, batch):
+        # Each thread runs in autocommit, so the state is published at once.
+        try:
+            with cache_locks(lock_keys(batch)):
+                detect(batch)
+        finally:
+            connection.close()
+
+    def test_concurrent_batches_are_all_counted(self):
+        threads = [threading.Thread(target=self.ingest, args=(self.batch(i * 100),)) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(cache.get(_state_key('station-1'))['metrics']['bme_temp']['n'], 160)
+
+    def test_state_is_published_on_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            detect(self.batch(0))
+        self.assertIsNone(cache.get(_state_key('station-1')))
+        for callback in callbacks:
+            callback()
+        self.assertEqual(cache.get(_state_key('station-1'))['metrics']['bme_temp']['n'], 20)
+
+    def test_held_lock_times_out(self):
+        with cache_locks([f"{_state_key('station-1')}_lock"]):
+            with self.assertRaises(TimeoutError), cache_locks([f"{_state_key('station-1')}_lock"], timeout=0.05):
+                pass
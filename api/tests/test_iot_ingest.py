@@ -0,0 +1,306 @@
+import json
+from datetime import timedelta
+from unittest import mock
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APITestCase
+from rest_framework import status
+from django.contrib.auth.models import User
+from geoapp.ingest_buffer import DEFAULTS, MemoryBuffer
+from geoapp.models import IoTData
+
+
+class GatewayTestCase(APITestCase):
+    """
+    Ingest endpoints need an authenticated client.
+    """
+
+    def setUp(self):
+        self.client.force_authenticate(User.objects.create_user(username='gateway', password='pass'))
+
+
+class IoTBulkIngestTests(GatewayTestCase):
+    def test_ingest_needs_authentication(self):
+        self.client.force_authenticate(None)
+        for name in ('iot-receive', 'iot-bulk'):
+            response = self.client.post(reverse(name), json.dumps([{'bme_temp': 20}]), content_type='application/json')
+            self.assertIn(response.status_code, (status.HTTP_401_UNAUTHORIZED, status.HTTP_403_FORBIDDEN))
+        self.assertFalse(IoTData.objects.exists())
+
+    def test_receive_rejects_batches(self):
+        response = self.client.post(reverse('iot-receive'), json.dumps([{'bme_temp': 20}, {'bme_temp': 21}]), content_type='application/json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn(reverse('iot-bulk'), response.json()['error'])
+        self.assertFalse(IoTData.objects.exists())
+
+    def test_receive_single_reading(self):
+        url = reverse('iot-receive')
+        response = self.client.post(url, json.dumps({'bme_temp': 21.5, 'bme_humidity': 40}), content_type='application/json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(IoTData.objects.get().bme_temp, 21.5)
+
+    def test_bulk_json_array(self):
+        url = reverse('iot-bulk')
+        readings = [
+            {'bme_temp': 20 + i, 'soil_moisture': 30, 'timestamp': f'2025-06-01T10:0{i}:00Z'}
+            for i in range(5)
+        ]
+        response = self.client.post(url, json.dumps(readings), content_type='application/json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.json()['created'], 5)
+        self.assertEqual(IoTData.objects.count(), 5)
+        self.assertEqual(IoTData.objects.order_by('timestamp').first().timestamp.minute, 0)
+
+    def test_bulk_ndjson_stream(self):
+        url = reverse('iot-bulk')
+        body = '\n'.join(json.dumps({'luminosity': i}) for i in range(3)) + '\n\n'
+        response = self.client.post(url, body, content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(IoTData.objects.count(), 3)
+
+    def test_invalid_reading_rejects_whole_batch(self):
+        url = reverse('iot-bulk')
+        readings = [{'bme_temp': 20}, {'bme_temp': 'hot'}, {'timestamp': 'yesterday', 'bme_gas': 1}]
+        response = self.client.post(url, json.dumps(readings), content_type='application/json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        fields = [(e['index'], e['field']) for e in response.json()['errors']]
+        self.assertEqual(fields, [(1, 'bme_temp'), (2, 'timestamp')])
+        self.assertEqual(IoTData.objects.count(), 0)
+
+    def test_non_scalar_and_boolean_values_are_rejected(self):
+        url = reverse('iot-bulk')
+        readings = [{'bme_temp': [20]}, {'bme_temp': 20, 'lon': {'x': 1}, 'lat': 2}, {'bme_temp': True}, {'bme_temp': 20, 'region': [1]}]
+        response = self.client.post(url, json.dumps(readings), content_type='application/json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        fields = [(e['index'], e['field']) for e in response.json()['errors']]
+        self.assertEqual(fields, [(0, 'bme_temp'), (1, 'lon'), (2, 'bme_temp'), (3, 'region')])
+
+    def test_epoch_timestamps_are_seconds(self):
+        url = reverse('iot-bulk')
+        response = self.client.post(url, json.dumps([{'bme_temp': 20, 'timestamp': 1748772000}]), content_type='application/json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(IoTData.objects.get().timestamp.isoformat(), '2025-06-01T10:00:00+00:00')
+
+
+class WriteBehindBufferTests(APITestCase):
+    def setUp(self):
+        self.buffer = MemoryBuffer({**DEFAULTS, 'MAX_RETRIES': 2})
+        self.buffer._ensure_thread = lambda: None
+        self.rows = [{'device_id': 'dev-1', 'timestamp': '2024-01-01T00:00:00Z', 'bme_temp': 20.0}]
+
+    def test_failed_batch_is_retried_then_dropped(self):
+        self.buffer.append(self.rows)
+        with mock.patch('geoapp.ingest_buffer.bulk_insert', side_effect=RuntimeError):
+            self.assertEqual(self.buffer.flush(), 0)
+            self.assertEqual(self.buffer.pending, 1)
+            self.assertEqual(self.buffer.flush(), 0)
+        self.assertEqual(self.buffer.pending, 0)
+
+    def test_flush_stops_at_its_time_budget(self):
+        self.buffer.flush_seconds = 0
+        self.buffer.append(self.rows)
+        self.assertEqual(self.buffer.flush(), 0)
+        self.assertEqual(self.buffer.pending, 1)
+
+
+class IoTTimeseriesTests(APITestCase):
+    def setUp(self):
+        from datetime import timedelta
+        from django.utils import timezone
+        start = timezone.now() - timedelta(hours=1)
+        IoTData.objects.bulk_create([
+            IoTData(timestamp=start + timedelta(seconds=i), bme_temp=float(i)) for i in range(150)
+        ])
+
+    def test_list_history_uses_a_single_query(self):
+        url = reverse('iotdata-list')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        # page (+ count when paginated) and one history query, whatever the page size
+        self.assertLessEqual(len(queries), 3)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        rows = response.data['results'] if isinstance(response.data, dict) else response.data
+        latest = max(rows, key=lambda row: row['timestamp'])
+        self.assertEqual(len(latest['timeseries']), 100)
+        self.assertEqual(latest['timeseries'][-1]['value'], 148.0)
+
+    def test_timeseries_can_be_omitted(self):
+        url = reverse('iotdata-list')
+        response = self.client.get(url, {'timeseries': 'none'})
+        rows = response.data['results'] if isinstance(response.data, dict) else response.data
+        self.assertNotIn('timeseries', rows[0])
+
+    def test_timeseries_action(self):
+        url = reverse('iotdata-timeseries')
+        response = self.client.get(url, {'limit': 10})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([p['value'] for p in response.data['timeseries']], [float(i) for i in range(140, 150)])
+        for limit in (-1, 0):
+            response = self.client.get(url, {'limit': limit})
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(len(response.data['timeseries']), 1)
+
+    def test_sparse_page_reads_bounded_history(self):
+        # Two rows of one device a year apart: each gets only its own history.
+        latest = IoTData.objects.order_by('-timestamp').first()
+        IoTData.objects.create(timestamp=latest.timestamp - timedelta(days=365), bme_temp=-1.0)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('iotdata-list'), {'bme_temp': -1.0})
+        rows = response.data['results'] if isinstance(response.data, dict) else response.data
+        self.assertEqual([row['timeseries'] for row in rows], [[]])
+        self.assertLessEqual(len(queries), 3)
+
+    def test_fill_needs_a_device(self):
+        url = reverse('iotdata-timeseries')
+        self.assertEqual(self.client.get(url, {'fill': 'step'}).status_code, status.HTTP_400_BAD_REQUEST)
+        latest = IoTData.objects.order_by('-timestamp').first().timestamp
+        IoTData.objects.create(device_id='station-1', timestamp=latest, bme_temp=1.0)
+        IoTData.objects.create(device_id='station-1', timestamp=latest + timedelta(minutes=2), bme_temp=3.0)
+        response = self.client.get(url, {'fill': 'step', 'device_id': 'station-1', 'interval': 60})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([p['value'] for p in response.data['timeseries']], [1.0, 1.0, 3.0])
+
+
+class IoTRollupTests(GatewayTestCase):
+    def test_granularity_follows_point_budget(self):
+        from datetime import datetime, timedelta, timezone as dt_timezone
+        from geoapp.rollups import choose_granularity
+        end = datetime(2025, 1, 1, tzinfo=dt_timezone.utc)
+        self.assertEqual(choose_granularity(end - timedelta(hours=2), end, 500), 'minute')
+        self.assertEqual(choose_granularity(end - timedelta(days=7), end, 500), 'hour')
+        self.assertEqual(choose_granularity(end - timedelta(days=365), end, 500), 'day')
+
+    def test_bulk_ingest_maintains_rollups(self):
+        from geoapp.models import IoTRollup
+        readings = [
+            {'bme_temp': value, 'timestamp': f'2025-06-01T10:{minute:02d}:00Z'}
+            for minute, value in [(0, 10.0), (0, 20.0), (30, 30.0)]
+        ]
+        self.client.post(reverse('iot-bulk'), json.dumps(readings), content_type='application/json')
+        self.client.post(reverse('iot-bulk'), json.dumps([{'bme_temp': 0.0, 'timestamp': '2025-06-01T11:00:00Z'}]), content_type='application/json')
+        hour = IoTRollup.objects.get(granularity='hour', metric='bme_temp', bucket__hour=10)
+        self.assertEqual((hour.count, hour.total, hour.min_value, hour.max_value), (3, 60.0, 10.0, 30.0))
+        day = IoTRollup.objects.get(granularity='day', metric='bme_temp')
+        self.assertEqual((day.count, day.min_value), (4, 0.0))
+
+        response = self.client.get(reverse('iotdata-rollup'), {
+            'metric': 'bme_temp', 'from': '2025-06-01T00:00:00Z', 'to': '2025-06-02T00:00:00Z', 'points': 48,
+        })
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['granularity'], 'hour')
+        self.assertEqual([b['avg'] for b in response.data['buckets']], [20.0, 0.0])
+
+
+class IoTExportTests(APITestCase):
+    def setUp(self):
+        IoTData.objects.bulk_create([IoTData(bme_temp=float(i)) for i in range(3)])
+
+    def test_csv_export_is_streamed(self):
+        response = self.client.get(reverse('iot-export'), {'format': 'csv'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0].split(',')[:3], ['id', 'timestamp', 'amg_avg_temp'])
+        self.assertEqual(len(lines), 4)
+
+    def test_geojson_export_gzipped(self):
+        import gzip
+        response = self.client.get(reverse('iot-export'), {'format': 'geojson'}, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        collection = json.loads(gzip.decompress(b''.join(response.streaming_content)))
+        self.assertEqual(collection['type'], 'FeatureCollection')
+        self.assertEqual(len(collection['features']), 3)
+
+    def test_gzip_sends_the_first_chunk_right_away(self):
+        import zlib
+        from api.views_api import _gzip_chunks
+        first = next(_gzip_chunks(iter(['{"type":"FeatureCollection"', ']}'])))
+        self.assertEqual(zlib.decompressobj(31).decompress(first), b'{"type":"FeatureCollection"')
+
+
+class IoTDeviceTests(GatewayTestCase):
+    def setUp(self):
+        super().setUp()
+        readings = [
+            {'device_id': device, 'bme_temp': float(i), 'lon': 10.1, 'lat': 36.8, 'timestamp': f'2025-06-01T10:0{i}:00Z'}
+            for device in ('station-a', 'station-b')
+            for i in range(5)
+        ]
+        self.client.post(reverse('iot-bulk'), json.dumps(readings), content_type='application/json')
+
+    def test_ingest_keeps_device_and_location(self):
+        reading = IoTData.objects.filter(device_id='station-a').latest('timestamp')
+        self.assertEqual((reading.location.x, reading.location.y), (10.1, 36.8))
+        self.assertEqual(IoTData.objects.filter(device_id='station-b').count(), 5)
+
+    def test_invalid_location_is_rejected(self):
+        response = self.client.post(reverse('iot-bulk'), json.dumps([{'bme_temp': 1, 'lon': 200, 'lat': 0}]), content_type='application/json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.json()['errors'][0]['field'], 'lon')
+
+    def test_latest_per_device(self):
+        response = self.client.get(reverse('iotdata-devices'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([(r['device_id'], r['bme_temp']) for r in response.data], [('station-a', 4.0), ('station-b', 4.0)])
+
+        response = self.client.get(reverse('iotdata-device-latest', args=['station-b']))
+        self.assertEqual(response.data['timestamp'][:16], '2025-06-01T10:04')
+        response = self.client.get(reverse('iotdata-device-latest', args=['unknown']))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_device_range(self):
+        response = self.client.get(reverse('iotdata-device-range', args=['station-a']), {
+            'from': '2025-06-01T10:01:00Z', 'to': '2025-06-01T10:03:00Z',
+        })
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([r['bme_temp'] for r in response.data['readings']], [1.0, 2.0])
+        self.assertTrue(all(r['device_id'] == 'station-a' for r in response.data['readings']))
+
+
+class IoTArchiveTests(APITestCase):
+    def setUp(self):
+        import importlib.util
+        import tempfile
+        from django.test import override_settings
+        if importlib.util.find_spec('pyarrow') is None:
+            self.skipTest("pyarrow is not installed")
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings_override = override_settings(IOT_ARCHIVE={'PATH': directory.name, 'AFTER_DAYS': 30})
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def test_old_readings_move_to_archive_and_stay_queryable(self):
+        from datetime import timedelta
+        from django.utils import timezone
+        from geoapp import archive
+        now = timezone.now()
+        IoTData.objects.bulk_create(
+            [IoTData(device_id='station-a', timestamp=now - timedelta(days=60, minutes=i), bme_temp=float(i)) for i in range(3)]
+            + [IoTData(device_id='station-a', timestamp=now - timedelta(minutes=1), bme_temp=99.0)]
+        )
+        self.assertEqual(archive.archive_expired(), 3)
+        self.assertEqual(IoTData.objects.count(), 1)
+
+        response = self.client.get(reverse('iot-export'), {'format': 'ndjson', 'from': (now - timedelta(days=90)).isoformat()})
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([row['bme_temp'] for row in rows], [2.0, 1.0, 0.0, 99.0])
+
+        response = self.client.get(reverse('iotdata-device-range', args=['station-a']), {
+            'from': (now - timedelta(days=61)).isoformat(), 'to': now.isoformat(),
+        })
+        self.assertEqual(response.data['count'], 4)
+
+    def test_late_archive_files_are_merged_in_order(self):
+        from datetime import timedelta
+        from django.utils import timezone
+        from geoapp import archive
+        start = timezone.now() - timedelta(days=60)
+        IoTData.objects.bulk_create([IoTData(timestamp=start + timedelta(minutes=2 * i), bme_temp=float(2 * i)) for i in range(3)])
+        archive.archive_expired()
+        # A late reading lands in a second file of the same month.
+        IoTData.objects.create(timestamp=start + timedelta(minutes=3), bme_temp=3.0)
+        archive.archive_expired()
+        rows = archive.read_rows(start, start + timedelta(hours=1), fields=('bme_temp',))
+        self.assertEqual([value for value, in rows], [0.0, 2.0, 3.0, 4.0])
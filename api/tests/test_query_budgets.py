@@ -0,0 +1,70 @@
+from django.contrib.auth.models import User
+from django.contrib.gis.geos import MultiPolygon, Polygon
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from geoapp.models import IndexAnalysis, Region, UserZone
+from .query_budget import QueryBudgetMixin
+
+ZONES = 10
+ANALYSES_PER_ZONE = 3
+
+
+def square(x):
+    return MultiPolygon(Polygon(((x, 0), (x + 1, 0), (x + 1, 1), (x, 1), (x, 0))), srid=4326)
+
+
+class QueryBudgetTests(QueryBudgetMixin, APITestCase):
+    """
+    Listing budgets hold whatever the number of rows (conditional GET
+    aggregate, pagination count, rows, one prefetch).
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='budget', password='pass')
+        for i in range(ZONES):
+            zone = UserZone.objects.create(user=self.user, name=f'zone {i}', geometry=square(i))
+            IndexAnalysis.objects.bulk_create([
+                IndexAnalysis(user_zone=zone, mean_value=j / 10) for j in range(ANALYSES_PER_ZONE)
+            ])
+
+    def rows(self, response):
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data['results'] if isinstance(response.data, dict) else response.data
+
+    def test_zones_with_analyses(self):
+        with self.assertMaxQueries(3):
+            rows = self.rows(self.client.get(reverse('userzone-list'), {'include': 'analyses'}))
+        self.assertEqual(len(rows), ZONES)
+        self.assertEqual(len(rows[0]['analysis']), ANALYSES_PER_ZONE)
+
+    def test_analyses(self):
+        with self.assertMaxQueries(3):
+            rows = self.rows(self.client.get(reverse('indexanalysis-list')))
+        self.assertEqual(len(rows), ZONES * ANALYSES_PER_ZONE)
+
+    def test_map_layers(self):
+        Region.objects.bulk_create([Region(name=f'r{i}', code=f'R{i}', geometry=square(i)) for i in range(ZONES)])
+        for name in ('region-list', 'userzone-list'):
+            with self.subTest(name), self.assertMaxQueries(3):
+                self.rows(self.client.get(reverse(name)))
+
+    def test_zone_detail_with_analyses(self):
+        zone = UserZone.objects.first()
+        with self.assertMaxQueries(2):
+            response = self.client.get(reverse('userzone-detail', args=[zone.pk]), {'include': 'analyses'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['analysis']), ANALYSES_PER_ZONE)
+
+    def test_analysis_owner_check(self):
+        analysis = IndexAnalysis.objects.first()
+        url = reverse('indexanalysis-detail', args=[analysis.pk])
+        User.objects.create_user(username='other', password='pass')
+        self.client.login(username='other', password='pass')
+        self.assertEqual(self.client.patch(url, {'mean_value': 0.9}, format='json').status_code, status.HTTP_403_FORBIDDEN)
+        self.client.login(username='budget', password='pass')
+        with self.assertMaxQueries(6) as queries:
+            response = self.client.patch(url, {'mean_value': 0.9}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        # The zone comes with the analysis: the check itself costs no query.
+        self.assertFalse([q['sql'] for q in queries.captured_queries if 'FROM "geoapp_userzone"' in q['sql']])
@@ -0,0 +1,36 @@
+import uuid
+from datetime import timedelta
+from unittest import mock
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils import timezone
+from geoapp import realtime
+from geoapp.models import RealTime
+from geoapp.tasks import schedule_realtime_refresh
+
+
+class RealTimeScheduleTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.last_update = timezone.now() - timedelta(hours=1)
+        self.source = RealTime.objects.create(
+            id=uuid.uuid4(), source='sentinel', timestamp=self.last_update, update_interval=600, last_update=self.last_update,
+        )
+
+    def test_scheduling_leaves_last_update_alone(self):
+        with mock.patch('geoapp.tasks.refresh_realtime_region.delay') as delay:
+            schedule_realtime_refresh()
+            self.assertTrue(delay.called)
+            delay.reset_mock()
+            schedule_realtime_refresh()
+            delay.assert_not_called()
+        self.source.refresh_from_db()
+        self.assertEqual(self.source.last_update, self.last_update)
+
+    def test_stale_read_survives_a_broker_outage(self):
+        realtime.refresh_region(None)
+        entry = cache.get(realtime.realtime_cache_key(None))
+        cache.set(realtime.realtime_cache_key(None), {**entry, 'stale_at': 0}, None)
+        with mock.patch('geoapp.tasks.refresh_realtime_region.delay', side_effect=ConnectionError):
+            self.assertEqual(realtime.get_region_data(None), entry['data'])
+        self.assertIsNone(cache.get(realtime._refresh_lock_key(None)))
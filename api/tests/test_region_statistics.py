@@ -0,0 +1,203 @@
+from datetime import date
+from unittest import mock
+from django.contrib.auth.models import User
+from django.contrib.gis.geos import MultiPolygon, Point as GEOSPoint, Polygon
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from geoapp import region_stats
+from geoapp.models import Cartographical, EOData, Point, Region, RegionStatistics
+
+
+class RegionStatisticsTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        User.objects.create_user(username='stats_user', password='pass')
+        self.client.login(username='stats_user', password='pass')
+        self.region = Region.objects.create(
+            name='Forest', code='FOR', population=1000, area=10.0,
+            geometry=MultiPolygon(Polygon(((0, 0), (0.1, 0), (0.1, 0.1), (0, 0.1), (0, 0))), srid=4326),
+        )
+        for category in ('camp', 'camp', 'sawmill', None, ''):
+            Point.objects.create(name='p', region=self.region, category=category, location=GEOSPoint(0.05, 0.05, srid=4326))
+        EOData.objects.create(region=self.region, index_type='NDVI', mean_value=0.2, acquisition_date=date(2024, 1, 1))
+        EOData.objects.create(region=self.region, index_type='NDVI', mean_value=0.6, acquisition_date=date(2024, 6, 1))
+        # Half inside the region: only the overlap counts.
+        Cartographical.objects.create(region=self.region, name='Clearing', geometry={
+            'type': 'Polygon', 'coordinates': [[[0.05, 0], [0.15, 0], [0.15, 0.1], [0.05, 0.1], [0.05, 0]]],
+        })
+
+    def test_refresh_aggregates_in_the_database(self):
+        statistics = region_stats.refresh(self.region.pk)
+        self.assertEqual(statistics.total_points, 5)
+        self.assertEqual(statistics.points_by_category, {'camp': 2, 'sawmill': 1, region_stats.UNCATEGORIZED: 2})
+        self.assertEqual(statistics.index_means['NDVI']['mean_value'], 0.6)
+        # 0.05 x 0.1 degrees near the equator is about 6,150 ha.
+        self.assertAlmostEqual(statistics.deforested_area, 6150, delta=100)
+
+    def test_endpoint_is_a_single_read(self):
+        url = reverse('get_region_statistics', args=[self.region.pk])
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        geo_queries = [q['sql'] for q in queries.captured_queries if 'geoapp_' in q['sql']]
+        self.assertEqual(len(geo_queries), 1)
+        self.assertIn('geoapp_regionstatistics', geo_queries[0])
+        self.assertEqual(response.json()['categories']['camp'], 2)
+        self.assertEqual(self.client.get(reverse('get_region_statistics', args=[0])).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_changes_queue_one_refresh_per_region(self):
+        cache.clear()
+        with mock.patch('geoapp.tasks.refresh_region_statistics.delay') as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                Point.objects.create(name='q', region=self.region, category='camp', location=GEOSPoint(0.01, 0.01, srid=4326))
+                Point.objects.create(name='r', region=self.region, category='camp', location=GEOSPoint(0.02, 0.02, srid=4326))
+        delay.assert_called_once_with(self.region.pk)
+        self.assertFalse(RegionStatistics.objects.exists())
+
+    def test_rolled_back_or_failed_enqueue_holds_no_key(self):
+        cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    Point.objects.create(name='q', region=self.region, location=GEOSPoint(0.01, 0.01, srid=4326))
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+        self.assertIsNone(cache.get(region_stats._refresh_key(self.region.pk)))
+        with mock.patch('geoapp.tasks.refresh_region_statistics.delay', side_effect=ConnectionError):
+            with self.captureOnCommitCallbacks(execute=True):
+                Point.objects.create(name='q', region=self.region, location=GEOSPoint(0.01, 0.01, srid=4326))
+        self.assertIsNone(cache.get(region_stats._refresh_key(self.region.pk)))
+
+    def test_malformed_geojson_is_skipped(self):
+        Cartographical.objects.create(region=self.region, name='Broken', geometry={'type': 'Polygon', 'coordinates': [[1]]})
+        statistics = region_stats.refresh(self.region.pk)
+        self.assertAlmostEqual(statistics.deforested_area, 6150, delta=100)
+
+
+class RegionTimeseriesTests(APITestCase):
+    def setUp(self):
+        self.region = Region.objects.create(
+            name='Forest', code='FOR',
+            geometry=MultiPolygon(Polygon(((0, 0), (0.1, 0), (0.1, 0.1), (0, 0.1), (0, 0))), srid=4326),
+        )
+        for day, mean in ((date(2024, 1, 5), 0.5), (date(2024, 1, 5), 0.7), (date(2024, 1, 20), 0.4), (date(2024, 3, 1), 0.3)):
+            EOData.objects.create(region=self.region, index_type='NDVI', mean_value=mean, min_value=mean - 0.2, max_value=mean + 0.2, acquisition_date=day)
+        EOData.objects.create(region=self.region, index_type='NDWI', mean_value=0.1, acquisition_date=date(2024, 1, 5))
+        self.url = reverse('region-timeseries', args=[self.region.pk])
+
+    def test_series_in_one_query(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, {'index': 'NDVI'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        series = response.data['series']
+        self.assertEqual([row['date'] for row in series], [date(2024, 1, 5), date(2024, 1, 20), date(2024, 3, 1)])
+        self.assertAlmostEqual(series[0]['mean'], 0.6)
+        self.assertEqual(series[0]['count'], 2)
+
+    def test_buckets_and_range(self):
+        series = self.client.get(self.url, {'bucket': 'month', 'from': '2024-01-01', 'to': '2024-02-01'}).data['series']
+        self.assertEqual(len(series), 1)
+        self.assertEqual(series[0]['date'], date(2024, 1, 1))
+        self.assertEqual(series[0]['count'], 3)
+        self.assertAlmostEqual(series[0]['min'], 0.2)
+        self.assertEqual(self.client.get(self.url, {'bucket': 'hour'}).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get(reverse('region-timeseries', args=[0])).status_code, status.HTTP_404_NOT_FOUND)
+
+
+class PixelTimeseriesTests(APITestCase):
+    def setUp(self):
+        import importlib.util
+        import tempfile
+        from django.test import override_settings
+        if importlib.util.find_spec('zarr') is None or importlib.util.find_spec('rasterio') is None:
+            self.skipTest("zarr and rasterio are not installed")
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings_override = override_settings(
+            MEDIA_ROOT=directory.name,
+            EO_DATACUBE={'PATH': f'{directory.name}/cube', 'RESOLUTION': 0.01, 'TIME_CHUNK': 8, 'TILE': 4},
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.region = Region.objects.create(
+            name='Forest', code='FOR',
+            geometry=MultiPolygon(Polygon(((0, 0), (0.1, 0), (0.1, 0.1), (0, 0.1), (0, 0))), srid=4326),
+        )
+
+    def raster(self, value):
+        import numpy as np
+        from django.core.files.base import ContentFile
+        from rasterio.io import MemoryFile
+        from rasterio.transform import from_origin
+        data = np.full((10, 10), value, dtype='float32')
+        data[0, 0] = value + 1  # north-west pixel
+        with MemoryFile() as memory:
+            with memory.open(driver='GTiff', height=10, width=10, count=1, dtype='float32',
+                             crs='EPSG:4326', transform=from_origin(0, 0.1, 0.01, 0.01)) as dst:
+                dst.write(data, 1)
+            return ContentFile(memory.read())
+
+    def scene(self, day, value):
+        eo_data = EOData(region=self.region, index_type='NDVI', acquisition_date=day)
+        eo_data.raster_file.save(f'ndvi_{day}.tif', self.raster(value), save=False)
+        eo_data.save()
+        return eo_data
+
+    def test_scenes_append_and_pixel_reads_one_column(self):
+        from geoapp import datacube
+        scenes = [self.scene(date(2024, 3, 1), 0.3), self.scene(date(2024, 1, 1), 0.1), self.scene(date(2024, 2, 1), 0.2)]
+        for eo_data in scenes:
+            self.assertTrue(datacube.append(eo_data))
+        self.assertFalse(datacube.append(EOData(region=self.region, index_type='NDVI', acquisition_date=date(2024, 4, 1))))
+
+        url = reverse('region-pixel-timeseries', args=[self.region.pk])
+        response = self.client.get(url, {'lon': 0.005, 'lat': 0.095})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([row['date'] for row in response.data['series']], ['2024-01-01', '2024-02-01', '2024-03-01'])
+        self.assertEqual([round(row['value'], 3) for row in response.data['series']], [1.1, 1.2, 1.3])
+        self.assertAlmostEqual(self.client.get(url, {'lon': 0.055, 'lat': 0.055}).data['series'][0]['value'], 0.1, places=5)
+        self.assertEqual(self.client.get(url, {'lon': 5, 'lat': 5}).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get(url, {'lon': 0.05, 'lat': 0.05, 'index': 'NBR'}).status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.client.get(url, {'lon': 'inf', 'lat': 0.05}).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_step_left_by_a_failed_append_is_overwritten(self):
+        import zarr
+        from geoapp import datacube
+        self.assertTrue(datacube.append(self.scene(date(2024, 1, 1), 0.1)))
+        cube = zarr.open_array(datacube.cube_path(self.region.pk, 'NDVI'), mode='r+')
+        steps, height, width = cube.shape
+        cube.resize((steps + 1, height, width))  # crashed before recording its date
+        self.assertTrue(datacube.append(self.scene(date(2024, 2, 1), 0.2)))
+        series = datacube.pixel_series(self.region.pk, 'NDVI', 0.055, 0.055)
+        self.assertEqual([(day, round(value, 3)) for day, value in series], [('2024-01-01', 0.1), ('2024-02-01', 0.2)])
+
+    def test_replaced_raster_overwrites_its_step(self):
+        from geoapp import datacube
+        eo_data = self.scene(date(2024, 1, 1), 0.1)
+        self.assertTrue(datacube.append(eo_data))
+        eo_data.raster_file.save('ndvi_reprocessed.tif', self.raster(0.4))
+        self.assertTrue(datacube.append(eo_data))
+        series = datacube.pixel_series(self.region.pk, 'NDVI', 0.055, 0.055)
+        self.assertEqual([(day, round(value, 3)) for day, value in series], [('2024-01-01', 0.4)])
+
+    def test_moved_scene_leaves_its_old_cube(self):
+        from geoapp import datacube
+        eo_data = self.scene(date(2024, 1, 1), 0.1)
+        self.assertTrue(datacube.append(eo_data))
+        other = Region.objects.create(name='Coast', code='CST', geometry=self.region.geometry)
+        with mock.patch('geoapp.tasks.remove_eo_datacube_step.delay') as remove, \
+                mock.patch('geoapp.tasks.append_eo_datacube.delay') as append, \
+                mock.patch('geoapp.tasks.compute_index_analyses.delay'), \
+                self.captureOnCommitCallbacks(execute=True):
+            eo_data.region = other
+            eo_data.save()
+        remove.assert_called_once_with(str(eo_data.pk), self.region.pk, 'NDVI')
+        append.assert_called_once_with(str(eo_data.pk))
+        self.assertTrue(datacube.remove(self.region.pk, 'NDVI', eo_data.pk))
+        self.assertEqual(datacube.pixel_series(self.region.pk, 'NDVI', 0.055, 0.055), [])
@@ -0,0 +1,67 @@
+from datetime import date
+from django.contrib.auth.models import User
+from django.contrib.gis.geos import MultiPolygon, Polygon
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from geoapp import analysis, stac
+from geoapp.models import EOData, Region, Satellite, SatelliteImage, UserZone
+
+
+def square(x0, y0, size):
+    return MultiPolygon(Polygon(((x0, y0), (x0 + size, y0), (x0 + size, y0 + size), (x0, y0 + size), (x0, y0))), srid=4326)
+
+
+def item(item_id, bbox, geometry, day, cloud_cover=10):
+    return {
+        'type': 'Feature', 'id': item_id, 'bbox': bbox, 'geometry': geometry,
+        'properties': {'datetime': f'{day}T10:30:00Z', 'eo:cloud_cover': cloud_cover},
+    }
+
+
+class SceneFootprintTests(APITestCase):
+    def setUp(self):
+        self.satellite = Satellite.objects.create(name='Sentinel-2')
+        self.west = Region.objects.create(name='West', code='W', geometry=square(0, 0, 1))
+        self.east = Region.objects.create(name='East', code='E', geometry=square(1, 0, 1))
+        # Tile over both regions with data only on its western part.
+        edge = {'type': 'Polygon', 'coordinates': [[[0, 0], [0.9, 0], [0.9, 1], [0, 1], [0, 0]]]}
+        self.edge = stac.ingest_item(item('S2_EDGE', [0, 0, 2, 1], edge, '2024-05-01'), self.satellite)
+        full = {'type': 'Polygon', 'coordinates': [[[0, 0], [2, 0], [2, 1], [0, 1], [0, 0]]]}
+        self.full = stac.ingest_item(item('S2_FULL', [0, 0, 2, 1], full, '2024-06-01', cloud_cover=60), self.satellite)
+        self.user = User.objects.create_user(username='scenes', password='pass')
+        self.zone = UserZone.objects.create(user=self.user, name='Plot', geometry=square(1.2, 0.2, 0.1))
+
+    def ids(self, **params):
+        response = self.client.get(reverse('satelliteimage-list'), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        rows = response.data['results'] if isinstance(response.data, dict) else response.data
+        return [row['image_id'] for row in rows]
+
+    def test_item_geometries_and_region(self):
+        self.assertEqual(self.edge.region, self.west)
+        self.assertEqual(self.edge.acquisition_date, date(2024, 5, 1))
+        self.assertEqual(self.edge.footprint.extent, (0, 0, 2, 1))
+        self.assertEqual(self.edge.valid_data.extent, (0, 0, 0.9, 1))
+
+    def test_reingest_updates_the_scene(self):
+        edge = {'type': 'Polygon', 'coordinates': [[[0, 0], [0.9, 0], [0.9, 1], [0, 1], [0, 0]]]}
+        image = stac.ingest_item(item('S2_EDGE', [0, 0, 2, 1], edge, '2024-05-01'), self.satellite, region=self.east)
+        self.assertEqual(image.pk, self.edge.pk)
+        self.assertEqual(image.region, self.east)
+        self.assertEqual(SatelliteImage.objects.filter(image_id='S2_EDGE').count(), 1)
+
+    def test_scene_lookup(self):
+        self.assertEqual(self.ids(zone=self.zone.pk), ['S2_FULL'])
+        self.assertEqual(self.ids(covers='POINT(0.5 0.5)'), ['S2_FULL', 'S2_EDGE'])
+        self.assertEqual(self.ids(covers='POINT(0.5 0.5)', max_cloud_cover=30), ['S2_EDGE'])
+        self.assertEqual(self.ids(**{'from': '2024-05-15'}), ['S2_FULL'])
+        self.assertEqual(self.client.get(reverse('satelliteimage-list'), {'zone': 'x'}).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_analysis_engine_uses_the_footprint(self):
+        raster = EOData.objects.create(satellite_image=self.edge, region=self.west, index_type='NDVI', raster_file='eo_data/edge.tif')
+        # The zone lies in the tile but outside its valid data.
+        self.assertEqual(list(analysis.zones_for(raster)), [])
+        self.assertEqual(list(analysis.rasters_for(self.zone)), [])
+        other = EOData.objects.create(satellite_image=self.full, region=self.west, index_type='NDVI', raster_file='eo_data/full.tif')
+        self.assertEqual(list(analysis.rasters_for(self.zone)), [other])
@@ -2,7 +2,10 @@ from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from geoapp import views
 from geoapp import views_realtime
-from api.views_api import receive_data
+from geoapp.live import iot_live_stream
+from geoapp.tiles import vector_tile
+from geoapp.export import BulkExportView
+from api.views_api import receive_data, receive_bulk_data, export_iot
 from api.views_api import register_user, custom_obtain_auth_token, get_user_profile
 from api.views_activation import activate_account_api
 
@@ -15,6 +18,7 @@ router.register(r'satellite-images', views.SatelliteImageViewSet)
 router.register(r'eo-data', views.EODataViewSet)
 router.register(r'cartographicals', views.CartographicalViewSet)
 router.register(r'iot-data', views.IoTDataViewSet)
+router.register(r'iot-alerts', views.IoTAlertViewSet)
 router.register(r'realtime-data', views.RealTimeViewSet)
 router.register(r'realtime', views.RealTimeViewSet, basename='realtime-api')
 router.register(r'user-zones', views.UserZoneViewSet)
@@ -24,6 +28,12 @@ urlpatterns = [
     path('', include(router.urls)),
     path('export-region-geojson/<int:pk>/', views.export_region_geojson, name='export_region_geojson'),
     path('region-statistics/<int:pk>/', views.get_region_statistics, name='get_region_statistics'),
+    path('iot/receive/', receive_data, name='iot-receive'),
+    path('iot/bulk/', receive_bulk_data, name='iot-bulk'),
+    path('iot/export/', export_iot, name='iot-export'),
+    path('iot/live/', iot_live_stream, name='iot-live'),
+    path('mvt/<str:layer>/<int:z>/<int:x>/<int:y>.pbf', vector_tile, name='mvt-tile'),
+    path('export/', BulkExportView.as_view(), name='bulk-export'),
     path('register/', register_user, name='register'),
     path('activate/', activate_account_api, name='activate'),
     path('auth/token/', custom_obtain_auth_token, name='token'),
@@ -31,6 +41,8 @@ urlpatterns = [
     path('profile/', get_user_profile, name='profile'),
     path('satellites/', views_realtime.SatelliteListView.as_view(), name='satellite-list'),
     path('satellite-tasks/fetch-images/', views_realtime.TriggerFetchSatelliteImagesView.as_view(), name='fetch-satellite-images'),
+    path('satellite-tasks/<str:task_id>/progress/', views_realtime.TaskProgressView.as_view(), name='task-progress'),
+    path('satellite-tasks/<str:task_id>/stream/', views_realtime.task_progress_stream, name='task-progress-stream'),
     path('satellite-tasks/process-images/', views_realtime.TriggerProcessSatelliteImagesView.as_view(), name='process-satellite-images'),
     path('realtime-data/indices/', views_realtime.RealTimeIndexDataView.as_view(), name='realtime-index-data'),
   
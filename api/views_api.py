@@ -16,58 +16,216 @@ from django.core.mail import EmailMessage
 from datetime import timedelta
 
 from django.views.decorators.csrf import csrf_exempt
-from django.http import JsonResponse, HttpResponse
+from django.http import JsonResponse, StreamingHttpResponse
+from django.urls import reverse
+import io
 import json
 import csv
+import zlib
 from django.core.serializers import serialize
+from geoapp.views import parse_time_range
+from geoapp.ingest import IOT_FIELDS, IngestError, bulk_insert, parse_json, parse_ndjson, validate_readings
+from geoapp.ingest_buffer import get_write_behind_buffer
+from geoapp import archive
+from geoapp.archive import with_coordinates
 
 
-def export_iot_data(data, format):
-    """Helper function to export IoT data in different formats"""
-    if format == 'json':
-        return JsonResponse(data, safe=False)
+EXPORT_FIELDS = ('id', 'timestamp', *IOT_FIELDS, 'device_id', 'region', 'lon', 'lat')
+EXPORT_CHUNK_SIZE = 2000
+GZIP_FLUSH_EVERY = 5  # chunks between sync flushes of the gzip stream
+EXPORT_FORMATS = {
+    # format: (content type, file extension)
+    'json': ('application/json', 'json'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+    'geojson': ('application/geo+json', 'geojson'),
+    'csv': ('text/csv', 'csv'),
+}
+
+
+def _json_default(value):
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def _iter_rows(data, fields):
+    """Yield value tuples from a queryset (chunked, server-side) or a list of dicts."""
+    if hasattr(data, 'values_list'):
+        return with_coordinates(data).values_list(*fields).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    return (tuple(item.get(field) for field in fields) for item in data)
+
+
+def _batched(rows, size=EXPORT_CHUNK_SIZE):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _csv_chunks(rows, fields):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(fields)
+    for batch in _batched(rows):
+        writer.writerows(batch)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def _ndjson_chunks(rows, fields):
+    for batch in _batched(rows):
+        yield ''.join(json.dumps(dict(zip(fields, row)), default=_json_default) + '\n' for row in batch)
+
+
+def _json_array_chunks(items, head, tail):
+    yield head
+    separator = ''
+    for batch in _batched(items):
+        yield separator + ','.join(batch)
+        separator = ','
+    yield tail
+
+
+def _gzip_chunks(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31: gzip container
+    for index, chunk in enumerate(chunks):
+        compressed = compressor.compress(chunk.encode('utf-8'))
+        # zlib holds output back until its window fills; a sync flush on the
+        # first chunk and every few after sends bytes as they are produced.
+        if index % GZIP_FLUSH_EVERY == 0:
+            compressed += compressor.flush(zlib.Z_SYNC_FLUSH)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def export_iot_data(data, format, compress=False, archived=None):
+    """
+    Helper function to export IoT data in different formats.
+
+    ``data`` is an IoTData queryset (read in chunks with a server-side cursor)
+    or a list of dicts. The response is streamed and encoded incrementally, so
+    memory use does not grow with the export size; ``compress`` gzips on the fly.
+    ``archived`` rows (``EXPORT_FIELDS`` tuples from the archive tier) are
+    merged in by timestamp; ``data`` must then be ordered by (timestamp, id).
+    """
+    if format not in EXPORT_FORMATS:
+        return JsonResponse({'error': 'Invalid format'}, status=400)
+    fields = EXPORT_FIELDS
+    rows = _iter_rows(data, fields)
+    if archived is not None:
+        rows = archive.merge(rows, archived, archive.row_key(fields))
+    if format == 'csv':
+        chunks = _csv_chunks(rows, fields)
+    elif format == 'ndjson':
+        chunks = _ndjson_chunks(rows, fields)
     elif format == 'geojson':
-        features = []
-        for item in data:
-            feature = {
+        lon, lat = fields.index('lon'), fields.index('lat')
+        features = (
+            json.dumps({
                 "type": "Feature",
-                "properties": item,
-                "geometry": None  # Add geometry if available
-            }
-            features.append(feature)
-        geojson = {"type": "FeatureCollection", "features": features}
-        return JsonResponse(geojson)
-    elif format == 'csv':
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = 'attachment; filename="iot_data.csv"'
-        writer = csv.writer(response)
-        if data and len(data) > 0:
-            writer.writerow(data[0].keys())
-            for item in data:
-                writer.writerow(item.values())
-        return response
-    return JsonResponse({'error': 'Invalid format'}, status=400)
+                "properties": dict(zip(fields, row)),
+                "geometry": {"type": "Point", "coordinates": [row[lon], row[lat]]} if row[lon] is not None else None,
+            }, default=_json_default)
+            for row in rows
+        )
+        chunks = _json_array_chunks(features, '{"type": "FeatureCollection", "features": [', ']}')
+    else:
+        items = (json.dumps(dict(zip(fields, row)), default=_json_default) for row in rows)
+        chunks = _json_array_chunks(items, '[', ']')
 
+    content_type, extension = EXPORT_FORMATS[format]
+    if compress:
+        chunks = _gzip_chunks(chunks)
+    response = StreamingHttpResponse(chunks, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="iot_data.{extension}"'
+    if compress:
+        response['Content-Encoding'] = 'gzip'
+        response['Vary'] = 'Accept-Encoding'
+    return response
 
-@csrf_exempt
+
+def export_iot(request):
+    """
+    Stream IoT readings between ``from`` and ``to`` (default: last 30 days) as
+    ``format`` = json, ndjson, geojson or csv, optionally for one ``device_id``.
+    Archived readings in the range are included. Gzipped when the client
+    accepts it.
+    """
+    if request.method != 'GET':
+        return JsonResponse({'error': 'Only GET allowed'}, status=405)
+    try:
+        start, end = parse_time_range(request.GET, timedelta(days=30))
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    device_id = request.GET.get('device_id') or None
+    queryset = IoTData.objects.filter(timestamp__gte=start, timestamp__lt=end).order_by('timestamp', 'id')
+    if device_id:
+        queryset = queryset.filter(device_id=device_id)
+    archived = archive.read_rows(start, end, device_id, EXPORT_FIELDS)
+    compress = 'gzip' in request.headers.get('Accept-Encoding', '')
+    return export_iot_data(queryset, request.GET.get('format', 'json'), compress=compress, archived=archived)
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
 def receive_data(request):
-    if request.method == 'POST':
-        data = json.loads(request.body)
-
-        IoT.objects.create(
-            amg_avg_temp=data.get('amg_avg_temp'),
-            amg_max_temp=data.get('amg_max_temp'),
-            amg_min_temp=data.get('amg_min_temp'),
-            bme_temp=data.get('bme_temp'),
-            bme_humidity=data.get('bme_humidity'),
-            bme_pressure=data.get('bme_pressure'),
-            bme_gas=data.get('bme_gas'),
-            soil_moisture=data.get('soil_moisture'),
-            luminosity=data.get('luminosity'),
-        )
-        return JsonResponse({'status': 'success'})
+    """
+    Ingest one IoT reading; batches go to ``/api/iot/bulk/``.
+    """
+    try:
+        records = parse_json(request.body)
+        if len(records) != 1:
+            raise IngestError(f"One reading per request; post batches to {reverse('iot-bulk')}")
+        rows = validate_readings(records)
+    except IngestError as e:
+        return JsonResponse({'error': str(e), 'errors': e.errors}, status=400)
+
+    bulk_insert(rows)
+    return JsonResponse({'status': 'success'})
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def receive_bulk_data(request):
+    """
+    Ingest many IoT readings in one request.
+
+    Accepts a JSON array (or ``{"readings": [...]}``) or, with an
+    ``application/x-ndjson`` content type, one reading per line. The payload is
+    rejected as a whole if any reading is invalid. Gateways authenticate like
+    any API client (token or session).
+
+    With ``IOT_WRITE_BEHIND`` enabled the readings are only queued (202) and
+    written later by the flusher; a full queue answers 503 so gateways back off.
+    """
+    try:
+        if request.content_type in ('application/x-ndjson', 'application/jsonl'):
+            # Read line by line from the request stream instead of buffering the body.
+            records = parse_ndjson(request._request)
+        else:
+            records = parse_json(request.body)
+        rows = validate_readings(records)
+    except IngestError as e:
+        return JsonResponse({'error': str(e), 'errors': e.errors}, status=400)
+
+    buffer = get_write_behind_buffer()
+    if buffer is not None:
+        if not buffer.append(rows):
+            response = JsonResponse({'error': 'Ingest queue full, retry later'}, status=503)
+            response['Retry-After'] = '5'
+            return response
+        return JsonResponse({'status': 'queued', 'queued': len(rows)}, status=202)
 
-    return JsonResponse({'error': 'Only POST allowed'}, status=405)
+    created = bulk_insert(rows)
+    return JsonResponse({'status': 'success', 'created': created}, status=201)
 
 
 from geoapp.models import (
@@ -218,6 +376,6 @@ class IoTDataViewSet(viewsets.ModelViewSet):
     serializer_class = IoTDataSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
     filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
-    filterset_fields = ['region', 'timestamp'] # Add relevant fields for filtering
+    filterset_fields = ['device_id', 'region', 'timestamp'] # Add relevant fields for filtering
     ordering_fields = ['timestamp']
 
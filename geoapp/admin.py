@@ -4,7 +4,7 @@ from django.contrib.gis.geos import GEOSGeometry
 from django.utils.html import format_html
 from django.urls import reverse
 from .models import (
-    Region, Point, DataLayer, Satellite, SatelliteImage, EOData, UserZone, IndexAnalysis, IoTData, RealTime)
+    Region, Point, DataLayer, Satellite, SatelliteImage, EOData, UserZone, IndexAnalysis, IoTData, IoTAlert, RealTime)
 
 
 @admin.register(Region)
@@ -148,6 +148,14 @@ class IoTData(admin.ModelAdmin):
     #
 
  
+@admin.register(IoTAlert)
+class IoTAlertAdmin(admin.ModelAdmin):
+    list_display = ('reading_timestamp', 'kind', 'metric', 'value', 'score', 'acknowledged')
+    list_filter = ('kind', 'acknowledged', 'reading_timestamp')
+    list_editable = ('acknowledged',)
+    date_hierarchy = 'reading_timestamp'
+
+
 @admin.register(RealTime)
 class RealTimeAdmin(admin.ModelAdmin):
      list_display = ( 'source', 'region','timestamp')
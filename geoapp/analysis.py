@@ -0,0 +1,140 @@
+"""
+Event-driven computation of ``IndexAnalysis`` rows.
+
+An analysis is the min/max/mean of an ``EOData`` raster over a ``UserZone``.
+Only pairs that actually overlap are computed, and they are found through
+the spatial indexes rather than by crossing every zone with every scene:
+
+* a new or changed raster is matched against the zones intersecting its
+  footprint (``zones_for``);
+* a new or reshaped zone is matched against the rasters whose footprint
+  intersects it (``rasters_for``).
+
+The footprint of a raster is the valid-data outline of its scene
+(``SatelliteImage.valid_data``, from STAC), or its region's geometry for
+rasters without a located scene. Work is queued per raster
+(``compute_index_analyses``): the file is opened once and every affected
+zone is read from it, then the rows are upserted in bulk.
+"""
+import json
+
+from django.db import transaction
+from django.db.models import Q, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import EOData, IndexAnalysis, UserZone
+
+
+def footprint_expression():
+    """
+    Footprint of a raster, as an expression on ``EOData``.
+    """
+    return Coalesce('satellite_image__valid_data', 'region__geometry')
+
+
+def rasters():
+    return EOData.objects.exclude(raster_file='').exclude(raster_file__isnull=True)
+
+
+def zones_for(eo_data):
+    """
+    Zones intersecting the footprint of an ``EOData`` (zone spatial index).
+    """
+    footprint = EOData.objects.filter(pk=eo_data.pk).annotate(footprint=footprint_expression()).values('footprint')[:1]
+    return UserZone.objects.filter(geometry__intersects=Subquery(footprint))
+
+
+def rasters_for(zone):
+    """
+    Rasters whose footprint intersects a zone (scene and region spatial
+    indexes).
+    """
+    return rasters().filter(
+        Q(satellite_image__valid_data__intersects=zone.geometry)
+        | Q(satellite_image__valid_data__isnull=True, region__geometry__intersects=zone.geometry)
+    )
+
+
+def zone_statistics(src, geometry):
+    """
+    ``(min, max, mean, pixels)`` of the first band of an open rasterio
+    dataset over a GEOS geometry, or None when they do not overlap.
+    """
+    import numpy as np
+    from rasterio.mask import mask
+
+    epsg = src.crs.to_epsg() if src.crs else None
+    if epsg and geometry.srid and epsg != geometry.srid:
+        geometry = geometry.transform(epsg, clone=True)
+    try:
+        # Masked rather than NaN-filled: works for integer rasters (scaled
+        # int16 NDVI) and leaves out the raster's own nodata pixels.
+        data, _ = mask(src, [json.loads(geometry.geojson)], crop=True, filled=False, indexes=1)
+    except ValueError:  # no overlap with the raster
+        return None
+    valid = data.compressed()
+    valid = valid[np.isfinite(valid)]
+    if not valid.size:
+        return None
+    return float(valid.min()), float(valid.max()), float(valid.mean()), int(valid.size)
+
+
+def compute(eo_data, zones):
+    """
+    Compute and upsert the analyses of ``zones`` over one raster, opening it
+    once. Analyses of those zones the raster has no data for are deleted.
+    Returns the number of analyses written.
+    """
+    import rasterio
+
+    zones = list(zones)
+    if not zones or not eo_data.raster_file:
+        return 0
+    results = {}
+    with eo_data.raster_file.open('rb') as raster, rasterio.open(raster) as src:
+        for zone in zones:
+            statistics = zone_statistics(src, zone.geometry)
+            if statistics is not None:
+                results[zone.pk] = statistics
+
+    now = timezone.now()
+    analyses = [
+        IndexAnalysis(
+            user_zone_id=zone_id, eo_data=eo_data,
+            min_value=min_value, max_value=max_value, mean_value=mean_value,
+            analysis_result=json.dumps({'index_type': eo_data.index_type, 'pixels': pixels}),
+            # Conditional GETs rely on updated_at.
+            updated_at=now,
+        )
+        for zone_id, (min_value, max_value, mean_value, pixels) in results.items()
+    ]
+    # One upsert: the zone and raster tasks may run concurrently for a pair.
+    IndexAnalysis.objects.bulk_create(
+        analyses, update_conflicts=True, unique_fields=['user_zone', 'eo_data'],
+        update_fields=['min_value', 'max_value', 'mean_value', 'analysis_result', 'updated_at'],
+    )
+    IndexAnalysis.objects.filter(
+        eo_data=eo_data, user_zone_id__in=[zone.pk for zone in zones if zone.pk not in results],
+    ).delete()
+    return len(results)
+
+
+def schedule_for_raster(eo_data_id):
+    from .tasks import compute_index_analyses
+
+    transaction.on_commit(lambda: compute_index_analyses.delay(str(eo_data_id)))
+
+
+def schedule_for_zone(zone):
+    """
+    Queue one batch per raster overlapping ``zone``, restricted to that zone.
+    """
+    from .tasks import compute_index_analyses
+
+    overlapping = rasters_for(zone)
+    # A reshaped zone drops the analyses of rasters it no longer overlaps.
+    IndexAnalysis.objects.filter(user_zone=zone, eo_data__in=rasters()).exclude(eo_data__in=overlapping).delete()
+    raster_ids = [str(pk) for pk in overlapping.values_list('pk', flat=True)]
+    zone_id = zone.pk
+    transaction.on_commit(lambda: [compute_index_analyses.delay(pk, [zone_id]) for pk in raster_ids])
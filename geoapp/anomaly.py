@@ -0,0 +1,164 @@
+"""
+Streaming fire-risk and drought detection over IoT readings.
+
+Runs at ingest time on each batch. Every sensor (device) keeps, per metric, an
+exponentially weighted mean and variance plus its last value and time: O(1)
+state, stored in the Django cache so all ingest workers share it (updated
+under a per-sensor lock, see ``geoapp.locks``, and only once the batch is
+committed). From that
+state each reading gets a z-score and a rate of change, which the rules below
+turn into ``IoTAlert`` rows. Thresholds come from the ``IOT_DETECTOR`` setting
+(see ``DEFAULTS``).
+"""
+import math
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .ingest import IOT_FIELDS
+from .models import IoTAlert
+
+DEFAULTS = {
+    'ALPHA': 0.1,  # EWMA weight of the newest reading
+    'WARMUP': 20,  # readings before z-scores are trusted
+    'Z_THRESHOLD': 4.0,
+    'FIRE_TEMP': 60.0,  # amg_max_temp (°C) that is a fire on its own
+    'FIRE_RISE_PER_MIN': 5.0,  # amg_max_temp rise (°C/min) that, with a high z-score, is a fire
+    'DROUGHT_SOIL_MOISTURE': 15.0,
+    'DROUGHT_HUMIDITY': 30.0,
+    'DROUGHT_TEMP': 30.0,
+    'COOLDOWN': 600,  # seconds before the same alert kind is raised again for a sensor
+    'STATE_TIMEOUT': 7 * 24 * 3600,
+}
+DEFAULT_SENSOR = 'default'
+
+
+def _options():
+    return {**DEFAULTS, **getattr(settings, 'IOT_DETECTOR', {})}
+
+
+class Detector:
+    """
+    Online detector for one sensor; ``state`` is a plain dict so it can be
+    cached between batches.
+    """
+
+    def __init__(self, state=None, options=None):
+        self.state = state or {'metrics': {}, 'last_alert': {}}
+        self.options = options or _options()
+
+    def _update(self, metric, value, timestamp):
+        """
+        Fold ``value`` into the metric statistics; return its z-score and rate
+        of change per minute, both computed against the state before the update.
+        """
+        stats = self.state['metrics'].get(metric)
+        if stats is None:
+            self.state['metrics'][metric] = {'n': 1, 'mean': value, 'var': 0.0, 'last': value, 'ts': timestamp}
+            return 0.0, 0.0
+        std = math.sqrt(stats['var'])
+        z = (value - stats['mean']) / std if stats['n'] >= self.options['WARMUP'] and std > 1e-6 else 0.0
+        minutes = (timestamp - stats['ts']) / 60
+        rate = (value - stats['last']) / minutes if minutes > 0 else 0.0
+
+        alpha = self.options['ALPHA']
+        diff = value - stats['mean']
+        increment = alpha * diff
+        stats['mean'] += increment
+        stats['var'] = (1 - alpha) * (stats['var'] + diff * increment)
+        stats['n'] += 1
+        stats['last'] = value
+        stats['ts'] = timestamp
+        return z, rate
+
+    def _raise(self, alerts, reading, timestamp, kind, metric, value, score, message):
+        last = self.state['last_alert'].get(kind)
+        if last is not None and timestamp - last < self.options['COOLDOWN']:
+            return
+        self.state['last_alert'][kind] = timestamp
+        alerts.append(IoTAlert(
+            kind=kind, device_id=reading.device_id, metric=metric, value=value, score=score, message=message,
+            reading_id=reading.pk, reading_timestamp=reading.timestamp,
+        ))
+
+    def process(self, reading):
+        """
+        Update the statistics with one IoTData reading and return its alerts.
+        """
+        options = self.options
+        timestamp = reading.timestamp.timestamp()
+        scores = {}
+        for metric in IOT_FIELDS:
+            value = getattr(reading, metric)
+            if value is not None:
+                scores[metric] = self._update(metric, value, timestamp)
+
+        alerts = []
+        hottest = reading.amg_max_temp
+        if hottest is not None:
+            z, rate = scores['amg_max_temp']
+            if hottest >= options['FIRE_TEMP']:
+                self._raise(alerts, reading, timestamp, 'fire', 'amg_max_temp', hottest, z,
+                            f"Thermal camera max {hottest:.1f}°C above {options['FIRE_TEMP']}°C")
+            elif z >= options['Z_THRESHOLD'] and rate >= options['FIRE_RISE_PER_MIN']:
+                self._raise(alerts, reading, timestamp, 'fire', 'amg_max_temp', hottest, z,
+                            f"Thermal camera max rising {rate:.1f}°C/min (z={z:.1f})")
+
+        soil, humidity, temp = reading.soil_moisture, reading.bme_humidity, reading.bme_temp
+        if None not in (soil, humidity, temp) and (
+            soil <= options['DROUGHT_SOIL_MOISTURE']
+            and humidity <= options['DROUGHT_HUMIDITY']
+            and temp >= options['DROUGHT_TEMP']
+        ):
+            self._raise(alerts, reading, timestamp, 'drought', 'soil_moisture', soil, None,
+                        f"Soil moisture {soil:.1f}, humidity {humidity:.1f}%, temperature {temp:.1f}°C")
+
+        if not alerts:
+            metric, (z, _) = max(scores.items(), key=lambda item: abs(item[1][0]), default=(None, (0.0, 0.0)))
+            if abs(z) >= options['Z_THRESHOLD']:
+                self._raise(alerts, reading, timestamp, 'anomaly', metric, getattr(reading, metric), z,
+                            f"{metric} deviates from its recent mean (z={z:.1f})")
+        return alerts
+
+
+def _state_key(sensor):
+    return f"iot_detector_{sensor}"
+
+
+def _by_sensor(readings):
+    by_sensor = {}
+    for reading in readings:
+        by_sensor.setdefault(reading.device_id or DEFAULT_SENSOR, []).append(reading)
+    return by_sensor
+
+
+def lock_keys(readings):
+    """
+    Cache lock keys of the sensors of ``readings``, see ``detect``.
+    """
+    return [f'{_state_key(sensor)}_lock' for sensor in _by_sensor(readings)]
+
+
+def detect(readings):
+    """
+    Run a batch of IoTData readings through the detector of their device, in
+    time order, and return the unsaved alerts. Readings without a device share
+    the ``default`` sensor.
+
+    The new state is written to the cache when the current transaction
+    commits, so a rolled-back (and retried) batch is not counted twice.
+    Callers hold the ``lock_keys`` locks from before the transaction until it
+    has committed, so concurrent batches of a sensor run one at a time.
+    """
+    options = _options()
+    by_sensor = _by_sensor(readings)
+    states = cache.get_many([_state_key(sensor) for sensor in by_sensor])
+    alerts = []
+    for sensor, batch in by_sensor.items():
+        detector = Detector(states.get(_state_key(sensor)), options)
+        for reading in sorted(batch, key=lambda r: r.timestamp):
+            alerts.extend(detector.process(reading))
+        states[_state_key(sensor)] = detector.state
+    transaction.on_commit(lambda: cache.set_many(states, options['STATE_TIMEOUT']))
+    return alerts
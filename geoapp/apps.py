@@ -3,4 +3,7 @@ from django.apps import AppConfig
 
 class GeoappConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'geoapp'
\ No newline at end of file
+    name = 'geoapp'
+
+    def ready(self):
+        from . import signals  # noqa: F401
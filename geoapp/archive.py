@@ -0,0 +1,260 @@
+"""
+Columnar archive tier for old ``IoTData`` readings.
+
+Readings older than ``AFTER_DAYS`` are moved out of the hot table into
+compressed Parquet files, one directory per month
+(``<PATH>/month=2025-06/part-<first timestamp>-<first id>.parquet``), and
+deleted from the database; on a partitioned table the emptied monthly
+partitions are dropped. Rollups stay in the database, so charts are not
+affected.
+
+``read_rows`` / ``read_readings`` scan only the month directories overlapping
+the requested range and push the time (and device) predicate down to the
+Parquet row-group statistics; ``merge`` interleaves those rows with the hot
+table's so the export and device-range APIs return one continuous series.
+The IoT list and ``timeseries`` endpoints read the hot table only; older
+history is served by those two APIs and by the rollups.
+Requires ``pyarrow`` once archiving is enabled. Configured with::
+
+    IOT_ARCHIVE = {
+        'PATH': '/var/lib/geoapp/iot_archive',  # default: <BASE_DIR>/iot_archive
+        'AFTER_DAYS': 90,         # None disables archiving
+        'COMPRESSION': 'zstd',
+        'CHUNK_SIZE': 100000,     # rows moved (and written per file) at a time
+        'ROW_GROUP_SIZE': 10000,  # granularity of the time-range pushdown
+    }
+"""
+import heapq
+import os
+import shutil
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from itertools import groupby, islice
+from operator import itemgetter
+
+from django.conf import settings
+from django.contrib.gis.geos import Point
+from django.db import connection, transaction
+from django.db.models import FloatField, Func
+
+from . import partitions
+from .ingest import IOT_FIELDS
+from .models import IoTData
+
+ARCHIVE_FIELDS = ('id', 'timestamp', 'device_id', 'region', 'lon', 'lat', *IOT_FIELDS)
+DEFAULTS = {
+    'PATH': None,
+    'AFTER_DAYS': None,
+    'COMPRESSION': 'zstd',
+    'CHUNK_SIZE': 100000,
+    'ROW_GROUP_SIZE': 10000,
+}
+MONTH_PREFIX = 'month='
+READ_BATCH_SIZE = 10000
+
+
+def _options():
+    options = {**DEFAULTS, **getattr(settings, 'IOT_ARCHIVE', {})}
+    if options['PATH'] is None:
+        options['PATH'] = os.path.join(settings.BASE_DIR, 'iot_archive')
+    return options
+
+
+def _schema():
+    import pyarrow as pa
+
+    return pa.schema([
+        ('id', pa.int64()),
+        ('timestamp', pa.timestamp('us', tz='UTC')),
+        ('device_id', pa.string()),
+        ('region', pa.int64()),
+        ('lon', pa.float64()),
+        ('lat', pa.float64()),
+        *[(field, pa.float64()) for field in IOT_FIELDS],
+    ])
+
+
+def _month(timestamp):
+    return f"{timestamp.astimezone(dt_timezone.utc):%Y-%m}"
+
+
+def with_coordinates(queryset):
+    """
+    Annotate an IoTData queryset with ``lon``/``lat`` taken from ``location``.
+    """
+    return queryset.annotate(
+        lon=Func('location', function='ST_X', output_field=FloatField()),
+        lat=Func('location', function='ST_Y', output_field=FloatField()),
+    )
+
+
+def archived_months():
+    """
+    Months (``'YYYY-MM'``) present in the archive, oldest first.
+    """
+    root = _options()['PATH']
+    if not os.path.isdir(root):
+        return []
+    return sorted(name[len(MONTH_PREFIX):] for name in os.listdir(root) if name.startswith(MONTH_PREFIX))
+
+
+def _write_part(root, month, rows, options):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = _schema()
+    columns = list(zip(*rows))
+    table = pa.Table.from_arrays(
+        [pa.array(column, type=field.type) for column, field in zip(columns, schema)], schema=schema,
+    )
+    directory = os.path.join(root, MONTH_PREFIX + month)
+    os.makedirs(directory, exist_ok=True)
+    first_id, first_timestamp = rows[0][0], rows[0][1]
+    path = os.path.join(directory, f"part-{first_timestamp.astimezone(dt_timezone.utc):%Y%m%dT%H%M%S%f}-{first_id}.parquet")
+    # Dot-prefixed files are ignored by readers until renamed into place.
+    tmp = os.path.join(directory, f".{os.path.basename(path)}.tmp")
+    pq.write_table(table, tmp, compression=options['COMPRESSION'], row_group_size=options['ROW_GROUP_SIZE'])
+    os.replace(tmp, path)
+    return path
+
+
+def archive_expired(after_days=None):
+    """
+    Move readings older than ``after_days`` (default ``IOT_ARCHIVE['AFTER_DAYS']``)
+    to the archive, ``CHUNK_SIZE`` rows at a time. Each chunk's files are
+    written before its rows are deleted, in one transaction; if it fails the
+    files are removed again. Returns the number of archived readings.
+    """
+    options = _options()
+    after_days = after_days or options['AFTER_DAYS']
+    if not after_days:
+        return 0
+    cutoff = datetime.now(dt_timezone.utc) - timedelta(days=after_days)
+    root = options['PATH']
+    archived = 0
+    while True:
+        rows = list(
+            with_coordinates(IoTData.objects.filter(timestamp__lt=cutoff))
+            .order_by('timestamp', 'id')
+            .values_list(*ARCHIVE_FIELDS)[:options['CHUNK_SIZE']]
+        )
+        if not rows:
+            break
+        written = []
+        try:
+            with transaction.atomic():
+                for month, group in groupby(rows, key=lambda row: _month(row[1])):
+                    written.append(_write_part(root, month, list(group), options))
+                IoTData.objects.filter(id__in=[row[0] for row in rows]).delete()
+        except Exception:
+            for path in written:
+                os.remove(path)
+            raise
+        archived += len(rows)
+
+    if partitions.is_partitioned():
+        _drop_archived_partitions(cutoff)
+    return archived
+
+
+def _drop_archived_partitions(cutoff):
+    # Emptied partitions still hold their bloat and index pages; dropping them
+    # is what keeps the hot table's size bounded. A late reading may have
+    # arrived since the chunk loop, so emptiness is checked under lock.
+    qn = connection.ops.quote_name
+    for name, month in partitions.monthly_partitions():
+        if partitions._next_month(month) > cutoff.date():
+            continue
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f"LOCK TABLE {qn(name)} IN ACCESS EXCLUSIVE MODE")
+            cursor.execute(f"SELECT 1 FROM {qn(name)} LIMIT 1")
+            if cursor.fetchone() is None:
+                cursor.execute(f"DROP TABLE {qn(name)}")
+
+
+def drop_expired(retention_days=None):
+    """
+    Delete archived months that ended before ``IOT_RETENTION_DAYS``. Returns
+    the removed months.
+    """
+    if retention_days is None:
+        retention_days = getattr(settings, 'IOT_RETENTION_DAYS', None)
+    if not retention_days:
+        return []
+    cutoff = (datetime.now(dt_timezone.utc) - timedelta(days=retention_days)).date()
+    root = _options()['PATH']
+    dropped = []
+    for month in archived_months():
+        if partitions._next_month(date.fromisoformat(f"{month}-01")) <= cutoff:
+            shutil.rmtree(os.path.join(root, MONTH_PREFIX + month))
+            dropped.append(month)
+    return dropped
+
+
+def _file_rows(fragment, schema, columns, predicate):
+    for batch in fragment.to_batches(
+        schema=schema, columns=columns, filter=predicate, batch_size=READ_BATCH_SIZE, use_threads=False,
+    ):
+        yield from zip(*(column.to_pylist() for column in batch.columns))
+
+
+def read_rows(start, end, device_id=None, fields=ARCHIVE_FIELDS):
+    """
+    Archived readings in [start, end) as tuples of ``fields``, ordered by
+    (timestamp, id). Each file is written in that order, so the files of a
+    month are streamed and merged: one batch per file is held in memory.
+    """
+    months = [m for m in archived_months() if _month(start) <= m <= _month(end)]
+    if not months:
+        return
+    import pyarrow.dataset as ds
+
+    root = _options()['PATH']
+    schema = _schema()
+    columns = list(dict.fromkeys(['timestamp', 'id', *fields]))
+    positions = [columns.index(field) for field in fields]
+    predicate = (ds.field('timestamp') >= start) & (ds.field('timestamp') < end)
+    if device_id is not None:
+        predicate &= ds.field('device_id') == device_id
+    for month in months:
+        dataset = ds.dataset(os.path.join(root, MONTH_PREFIX + month), format='parquet', schema=schema)
+        files = [_file_rows(fragment, schema, columns, predicate) for fragment in dataset.get_fragments(filter=predicate)]
+        for row in heapq.merge(*files, key=itemgetter(0, 1)):
+            yield tuple(row[position] for position in positions)
+
+
+def _to_reading(row):
+    values = dict(zip(ARCHIVE_FIELDS, row))
+    lon, lat = values.pop('lon'), values.pop('lat')
+    values['region_id'] = values.pop('region')
+    if lon is not None:
+        values['location'] = Point(lon, lat, srid=4326)
+    return IoTData(**values)
+
+
+def read_readings(start, end, device_id=None, limit=None):
+    """
+    Archived readings in [start, end) as unsaved IoTData instances, oldest first.
+    """
+    return [_to_reading(row) for row in islice(read_rows(start, end, device_id), limit)]
+
+
+def merge(hot, archived, key):
+    """
+    Interleave two streams ordered by ``key`` (timestamp, id), yielding a
+    reading present in both only once: rows are briefly in both tiers while
+    a chunk is being archived.
+    """
+    last = None
+    for item in heapq.merge(hot, archived, key=key):
+        current = key(item)
+        if current != last:
+            yield item
+        last = current
+
+
+def row_key(fields):
+    return itemgetter(fields.index('timestamp'), fields.index('id'))
+
+
+def reading_key(reading):
+    return reading.timestamp, reading.pk
@@ -0,0 +1,286 @@
+"""
+Change-based compression of IoT readings at ingest.
+
+Stations report every few seconds whether or not anything changed. With
+``IOT_COMPRESSION`` enabled, ``compress`` decides per device which readings
+get a row:
+
+* ``deadband``: a reading is stored when any metric moved more than its
+  tolerance away from the last stored reading. A step reconstruction of the
+  stored rows is then within the tolerance of every original reading.
+* ``swinging_door``: a reading is stored when no straight line from the last
+  stored reading passes within the tolerance of every reading since. A
+  linear reconstruction is within the tolerance. The turning point is the
+  reading *before* the one that opened the door, so the latest reading is
+  held back as ``pending`` until it is superseded or stored.
+
+A reading is also stored when ``HEARTBEAT`` seconds have passed since the
+last stored one, or when a metric appears or disappears; ``flush_pending``
+stores readings held back for more than ``MAX_PENDING_AGE`` seconds, so a
+station that went quiet does not lag behind in "latest" reads and rollups.
+Rollups and the detector still see every reading, only the raw table is
+thinned (so ``rollups.rebuild`` recomputes from the stored readings only).
+The state is plain values, updated under a per-device lock
+(``geoapp.locks``) and published when the batch commits, so concurrent
+ingest workers cannot both keep or both drop a reading and a rolled-back
+batch leaves no trace. Configured with::
+
+    IOT_COMPRESSION = {
+        'MODE': 'deadband',        # or 'swinging_door'; None stores everything
+        'TOLERANCES': {'bme_temp': 0.2, 'bme_humidity': 1.0},
+        'DEFAULT_TOLERANCE': 0.0,  # metrics without their own tolerance
+        'HEARTBEAT': 300,          # seconds
+        'MAX_PENDING_AGE': 60,     # seconds a reading may be held back
+        'STATE_TIMEOUT': 7 * 24 * 3600,
+    }
+"""
+import math
+from bisect import bisect_right
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.contrib.gis.geos import Point
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from .ingest import IOT_FIELDS
+from .locks import cache_locks
+from .models import IoTData
+
+DEFAULTS = {
+    'MODE': None,
+    'TOLERANCES': {},
+    'DEFAULT_TOLERANCE': 0.0,
+    'HEARTBEAT': 300,
+    'MAX_PENDING_AGE': 60,
+    'STATE_TIMEOUT': 7 * 24 * 3600,
+}
+MODES = ('deadband', 'swinging_door')
+RECONSTRUCTIONS = ('step', 'linear')
+DEVICES_KEY = 'iot_compression_devices'
+DEFAULT_DEVICE = 'default'
+
+
+def _options():
+    options = {**DEFAULTS, **getattr(settings, 'IOT_COMPRESSION', {})}
+    if options['MODE'] not in (None, *MODES):
+        raise ValueError(f"Unknown IOT_COMPRESSION mode '{options['MODE']}'")
+    return options
+
+
+def _state_key(device):
+    return f"iot_compression_{device}"
+
+
+def _lock_key(key):
+    return f"{key}_lock"
+
+
+def _values(reading):
+    return {m: getattr(reading, m) for m in IOT_FIELDS if getattr(reading, m) is not None}
+
+
+def _snapshot(reading):
+    """
+    Plain-value copy of a held-back reading, for the cached state.
+    """
+    location = reading.location
+    return {
+        'ts': reading.timestamp.timestamp(),
+        'values': _values(reading),
+        'device_id': reading.device_id,
+        'region_id': reading.region_id,
+        'location': (location.x, location.y) if location is not None else None,
+    }
+
+
+def _restore(pending):
+    """
+    Unsaved IoTData for a ``_snapshot``.
+    """
+    location = pending['location']
+    return IoTData(
+        timestamp=datetime.fromtimestamp(pending['ts'], dt_timezone.utc),
+        device_id=pending['device_id'],
+        region_id=pending['region_id'],
+        location=Point(*location, srid=4326) if location is not None else None,
+        **pending['values'],
+    )
+
+
+class Compressor:
+    """
+    Compression state of one device; ``state`` is a plain dict so it can be
+    cached between batches.
+    """
+
+    def __init__(self, state=None, options=None):
+        self.state = state or {'stored': None, 'slopes': {}, 'pending': None}
+        self.options = options or _options()
+
+    def _tolerance(self, metric):
+        return self.options['TOLERANCES'].get(metric, self.options['DEFAULT_TOLERANCE'])
+
+    def _store(self, reading, timestamp, values):
+        self.state = {'stored': {'ts': timestamp, 'values': values}, 'slopes': {}, 'pending': None}
+        return [reading]
+
+    def _take_pending(self):
+        pending = self.state['pending']
+        self.state['pending'] = None
+        return [_restore(pending)] if pending is not None else []
+
+    def process(self, reading):
+        """
+        Feed one reading; return the readings to store now (none, this one, or
+        the held-back one, possibly followed by this one).
+        """
+        timestamp = reading.timestamp.timestamp()
+        values = _values(reading)
+        stored = self.state['stored']
+        if stored is not None and timestamp <= stored['ts']:
+            # Late or duplicate timestamp: keep it, leave the state alone.
+            return [reading]
+        if (
+            stored is None
+            or timestamp - stored['ts'] >= self.options['HEARTBEAT']
+            or values.keys() != stored['values'].keys()
+        ):
+            return self._take_pending() + self._store(reading, timestamp, values)
+
+        if self.options['MODE'] == 'deadband':
+            if any(abs(value - stored['values'][m]) > self._tolerance(m) for m, value in values.items()):
+                return self._store(reading, timestamp, values)
+            return []
+
+        # Swinging door: narrow, per metric, the range of slopes a line from
+        # the stored reading may take to stay within tolerance of every reading.
+        elapsed = timestamp - stored['ts']
+        slopes = {}
+        for metric, value in values.items():
+            origin, tolerance = stored['values'][metric], self._tolerance(metric)
+            low, high = self.state['slopes'].get(metric, (-math.inf, math.inf))
+            low = max(low, (value - tolerance - origin) / elapsed)
+            high = min(high, (value + tolerance - origin) / elapsed)
+            if low > high:
+                # Door opened: store the previous reading, then restart from it.
+                pending = self.state['pending']
+                if pending is None:
+                    return self._store(reading, timestamp, values)
+                return self._store(_restore(pending), pending['ts'], pending['values']) + self.process(reading)
+            slopes[metric] = (low, high)
+        self.state['slopes'] = slopes
+        self.state['pending'] = _snapshot(reading)
+        return []
+
+
+def _by_device(readings):
+    by_device = {}
+    for reading in readings:
+        by_device.setdefault(reading.device_id or DEFAULT_DEVICE, []).append(reading)
+    return by_device
+
+
+def lock_keys(readings):
+    """
+    Cache lock keys of the devices of ``readings``, see ``compress``.
+    """
+    if not _options()['MODE']:
+        return []
+    return [_lock_key(_state_key(device)) for device in _by_device(readings)]
+
+
+def _register_devices(devices, timeout):
+    known = cache.get(DEVICES_KEY, set())
+    if not known.issuperset(devices):
+        with cache_locks([_lock_key(DEVICES_KEY)]):
+            known = cache.get(DEVICES_KEY, set())
+            cache.set(DEVICES_KEY, known | set(devices), timeout)
+
+
+def compress(readings):
+    """
+    Return the subset of a batch of unsaved IoTData readings (plus readings
+    held back from earlier batches) that should be stored. Everything is
+    kept when compression is off.
+
+    As for the detector, the new state is written to the cache when the
+    current transaction commits; callers hold the ``lock_keys`` locks from
+    before the transaction until it has committed.
+    """
+    options = _options()
+    if not options['MODE']:
+        return list(readings)
+    by_device = _by_device(readings)
+    keys = {device: _state_key(device) for device in by_device}
+    states = cache.get_many(keys.values())
+    stored = []
+    for device, batch in by_device.items():
+        compressor = Compressor(states.get(keys[device]), options)
+        for reading in sorted(batch, key=lambda r: r.timestamp):
+            stored.extend(compressor.process(reading))
+        states[keys[device]] = compressor.state
+
+    def publish():
+        cache.set_many(states, options['STATE_TIMEOUT'])
+        _register_devices(by_device, options['STATE_TIMEOUT'])
+
+    transaction.on_commit(publish)
+    return stored
+
+
+def flush_pending(max_age=None):
+    """
+    Store readings held back (swinging door) for longer than ``max_age``
+    seconds (default: ``MAX_PENDING_AGE``), so quiet stations keep their
+    last value. Returns the number of readings written.
+    """
+    options = _options()
+    if options['MODE'] != 'swinging_door':
+        return 0
+    cutoff = (timezone.now() - timedelta(seconds=max_age or options['MAX_PENDING_AGE'])).timestamp()
+    keys = [_state_key(device) for device in cache.get(DEVICES_KEY, set())]
+    flushed = 0
+    for key in keys:
+        # One device at a time, so ingest only waits for its own device.
+        with cache_locks([_lock_key(key)]), transaction.atomic():
+            state = cache.get(key)
+            pending = state and state['pending']
+            if pending is None or pending['ts'] > cutoff:
+                continue
+            compressor = Compressor(state, options)
+            IoTData.objects.bulk_create(compressor._store(_restore(pending), pending['ts'], pending['values']))
+            transaction.on_commit(lambda key=key, state=compressor.state: cache.set(key, state, options['STATE_TIMEOUT']))
+            flushed += 1
+    return flushed
+
+
+def reconstruct(points, start, end, interval, method='step'):
+    """
+    Resample stored ``(timestamp, value)`` points (oldest first, None values
+    skipped) every ``interval`` seconds over [start, end].
+
+    ``step`` carries the last stored value forward (matches deadband),
+    ``linear`` interpolates between stored points (matches swinging door);
+    both give None before the first point.
+    """
+    if method not in RECONSTRUCTIONS:
+        raise ValueError(f"Unknown reconstruction '{method}'")
+    points = [(t, v) for t, v in points if v is not None]
+    times = [t for t, _ in points]
+    series = []
+    step = timedelta(seconds=interval)
+    current = start
+    while current <= end:
+        index = bisect_right(times, current) - 1
+        value = None
+        if index >= 0:
+            t0, v0 = points[index]
+            value = v0
+            if method == 'linear' and index + 1 < len(points) and current > t0:
+                t1, v1 = points[index + 1]
+                value = v0 + (v1 - v0) * (current - t0).total_seconds() / (t1 - t0).total_seconds()
+        series.append({'timestamp': current, 'value': value})
+        current += step
+    return series
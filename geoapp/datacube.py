@@ -0,0 +1,179 @@
+"""
+Per-region pixel time-series cubes of spectral indices.
+
+Each (region, index type) has a Zarr array ``<PATH>/region_<id>/<INDEX>.zarr``
+of shape (time, y, x) on a fixed WGS84 grid covering the region's extent at
+``RESOLUTION`` degrees. Every new ``EOData`` raster is resampled onto that
+grid and appended as one time step (``append``, queued from a signal).
+
+Chunks are time-major: ``TIME_CHUNK`` steps by ``TILE`` x ``TILE`` pixels.
+The history of one pixel is then one chunk column (``ceil(steps /
+TIME_CHUNK)`` small reads, usually one), whatever the number of scenes,
+instead of one GeoTIFF opened per date. The price is paid at ingest: each
+append rewrites the tiles of the last time chunk. Steps are stored in
+arrival order; their dates and ``EOData`` ids are kept in the array
+attributes, and reads sort by date. A replaced raster is written over its
+own step, and a raster moved to another region or index is blanked out of
+its old cube (``remove``).
+
+Requires ``zarr`` and ``rasterio``. Configured with::
+
+    EO_DATACUBE = {
+        'PATH': '/var/lib/geoapp/eo_datacube',  # default: <BASE_DIR>/eo_datacube
+        'RESOLUTION': 0.0001,  # degrees, about 10 m
+        'TIME_CHUNK': 256,
+        'TILE': 32,
+    }
+"""
+import math
+import os
+
+from django.conf import settings
+
+DEFAULTS = {
+    'PATH': None,
+    'RESOLUTION': 0.0001,
+    'TIME_CHUNK': 256,
+    'TILE': 32,
+}
+
+
+def _options():
+    options = {**DEFAULTS, **getattr(settings, 'EO_DATACUBE', {})}
+    if options['PATH'] is None:
+        options['PATH'] = os.path.join(settings.BASE_DIR, 'eo_datacube')
+    return options
+
+
+def cube_path(region_id, index_type, options=None):
+    options = options or _options()
+    return os.path.join(options['PATH'], f'region_{region_id}', f'{index_type.upper()}.zarr')
+
+
+def lock_key(region_id, index_type):
+    return f"eo_datacube_lock_{region_id}_{index_type.upper()}"
+
+
+def grid_for(region, resolution):
+    """
+    ``(west, north, resolution, height, width)`` of the region's grid.
+    """
+    west, south, east, north = region.geometry.extent
+    # Rounded first so that an extent of exactly n pixels is not n + 1.
+    width = max(1, math.ceil(round((east - west) / resolution, 6)))
+    height = max(1, math.ceil(round((north - south) / resolution, 6)))
+    return west, north, resolution, height, width
+
+
+def _open_cube(region, index_type, options):
+    import numpy as np
+    import zarr
+
+    path = cube_path(region.pk, index_type, options)
+    if os.path.exists(path):
+        return zarr.open_array(path, mode='r+')
+    west, north, resolution, height, width = grid_for(region, options['RESOLUTION'])
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    cube = zarr.open_array(
+        path, mode='w', shape=(0, height, width), dtype='f4', fill_value=np.nan,
+        chunks=(options['TIME_CHUNK'], options['TILE'], options['TILE']),
+    )
+    cube.attrs.update({'grid': [west, north, resolution], 'dates': [], 'eo_data': []})
+    return cube
+
+
+def _resample(raster, grid, height, width):
+    import numpy as np
+    import rasterio
+    from rasterio.transform import from_origin
+    from rasterio.warp import Resampling, reproject
+
+    west, north, resolution = grid
+    destination = np.full((height, width), np.nan, dtype='f4')
+    with rasterio.open(raster) as src:
+        reproject(
+            source=rasterio.band(src, 1),
+            destination=destination,
+            dst_transform=from_origin(west, north, resolution, resolution),
+            dst_crs='EPSG:4326',
+            dst_nodata=np.nan,
+            resampling=Resampling.bilinear,
+        )
+    return destination
+
+
+def append(eo_data):
+    """
+    Write the raster of an ``EOData`` to its region/index cube: as a new
+    step, or over its own step when it is already in the cube (the raster was
+    replaced). Returns False when there is nothing to write (no raster,
+    region, index or date). Callers serialize writes per cube (``lock_key``).
+    """
+    if not (eo_data.raster_file and eo_data.region_id and eo_data.index_type and eo_data.acquisition_date):
+        return False
+    options = _options()
+    cube = _open_cube(eo_data.region, eo_data.index_type, options)
+    attrs = cube.attrs.asdict()
+    dates, ids = list(attrs['dates']), list(attrs['eo_data'])
+    _, height, width = cube.shape
+    with eo_data.raster_file.open('rb') as raster:
+        values = _resample(raster, attrs['grid'], height, width)
+    if str(eo_data.pk) in ids:
+        step = ids.index(str(eo_data.pk))
+        dates[step] = eo_data.acquisition_date.isoformat()
+    else:
+        # The dates are the record of complete steps: a step left by an
+        # append that died before updating them is overwritten.
+        step = len(dates)
+        cube.resize((step + 1, height, width))
+        dates.append(eo_data.acquisition_date.isoformat())
+        ids.append(str(eo_data.pk))
+    cube[step] = values
+    cube.attrs.update({'dates': dates, 'eo_data': ids})
+    return True
+
+
+def remove(region_id, index_type, eo_data_id):
+    """
+    Blank out the step of an ``EOData`` that left this cube: its values
+    become missing (reads skip them) and its id is dropped, so the slot is
+    kept but no longer attributed. Returns False when the cube or the step
+    does not exist. Callers serialize writes per cube (``lock_key``).
+    """
+    import numpy as np
+    import zarr
+
+    path = cube_path(region_id, index_type)
+    if not os.path.exists(path):
+        return False
+    cube = zarr.open_array(path, mode='r+')
+    ids = list(cube.attrs['eo_data'])
+    if str(eo_data_id) not in ids:
+        return False
+    step = ids.index(str(eo_data_id))
+    cube[step] = np.nan
+    ids[step] = None
+    cube.attrs['eo_data'] = ids
+    return True
+
+
+def pixel_series(region_id, index_type, lon, lat):
+    """
+    ``[(date, value), ...]`` of the pixel containing (lon, lat), oldest first,
+    without missing values. Returns None when there is no cube, raises
+    ValueError when the point is outside the region's grid.
+    """
+    import zarr
+
+    path = cube_path(region_id, index_type)
+    if not os.path.exists(path):
+        return None
+    cube = zarr.open_array(path, mode='r')
+    west, north, resolution = cube.attrs['grid']
+    _, height, width = cube.shape
+    column, row = math.floor((lon - west) / resolution), math.floor((north - lat) / resolution)
+    if not (0 <= row < height and 0 <= column < width):
+        raise ValueError("Point outside the region")
+    values = cube[:, row, column]
+    series = sorted(zip(cube.attrs['dates'], values.tolist()))
+    return [(date, value) for date, value in series if not math.isnan(value)]
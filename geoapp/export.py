@@ -0,0 +1,243 @@
+"""
+Bulk export of whole map layers.
+
+``/api/export/?layers=regions,points&format=geojson`` streams every matching
+row of the requested layers. Rows are read with a server-side cursor and the
+geometry is encoded by PostGIS (GeoJSON text, or WKB handed to OGR), so
+memory use does not grow with the export size.
+
+* ``geojson``: one FeatureCollection, streamed; each feature carries its
+  ``layer`` name as a property.
+* ``gpkg``: one GeoPackage table per layer.
+* ``fgb``: FlatGeobuf, one layer per file.
+
+The OGR formats need the GDAL Python bindings (``osgeo``); they are written
+to a temporary file which is then streamed and removed. ``bbox``/``within``/
+``intersects``/``dwithin`` filter on the geometry as on the list endpoints,
+``from``/``to`` (ISO 8601) on each layer's date field.
+"""
+import os
+import shutil
+import tempfile
+from itertools import chain
+from types import SimpleNamespace
+
+from django.contrib.gis.db.models import PointField
+from django.contrib.gis.db.models.functions import AsWKB
+from django.db.models import Exists, F, OuterRef, Subquery, Value
+from django.http import FileResponse, StreamingHttpResponse
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.views import APIView
+
+from api.filters import SpatialFilter
+
+from . import geojson
+from .models import IoTAlert, IoTData, Point, Region, UserZone
+from .views import parse_instant
+
+CHUNK_SIZE = 2000
+
+
+def _filter_alerts(request, queryset):
+    """
+    Spatial filters on alerts select the readings through the spatial index
+    of their location, then the alerts they raised (a semi-join), instead of
+    filtering the per-alert location subquery, which no index can serve.
+    """
+    if not any(request.query_params.get(name) for name in SpatialFilter.parameters):
+        return queryset
+    readings = SpatialFilter().filter_queryset(request, IoTData.objects.all(), SimpleNamespace(geometry_field='location'))
+    return queryset.filter(Exists(readings.filter(id=OuterRef('reading_id'), timestamp=OuterRef('reading_timestamp'))))
+
+
+LAYERS = {
+    'regions': {
+        'model': Region,
+        'geometry': 'geometry',
+        'geometry_type': 'MultiPolygon',
+        'date': 'updated_at',
+        'properties': ('name', 'code', 'population', 'area', 'created_at', 'updated_at'),
+    },
+    'points': {
+        'model': Point,
+        'geometry': 'location',
+        'geometry_type': 'Point',
+        'date': 'created_at',
+        'properties': ('name', 'category', 'description', 'region', 'created_at', 'updated_at'),
+    },
+    'user-zones': {
+        'model': UserZone,
+        'geometry': 'geometry',
+        'geometry_type': 'MultiPolygon',
+        'date': 'created_at',
+        'properties': ('name', 'user', 'created_at', 'updated_at'),
+    },
+    'alerts': {
+        'model': IoTAlert,
+        # Alerts have no geometry of their own: use the location of the
+        # reading that raised them (None once it is archived).
+        'geometry': lambda: Subquery(
+            IoTData.objects.filter(id=OuterRef('reading_id'), timestamp=OuterRef('reading_timestamp')).values('location')[:1],
+            output_field=PointField(),
+        ),
+        'geometry_type': 'Point',
+        'spatial_filter': _filter_alerts,
+        'date': 'reading_timestamp',
+        'properties': ('kind', 'device_id', 'metric', 'value', 'score', 'message', 'acknowledged', 'reading_timestamp'),
+    },
+}
+
+FORMATS = {
+    # format: (content type, file extension, OGR driver)
+    'geojson': (geojson.CONTENT_TYPE, 'geojson', None),
+    'gpkg': ('application/geopackage+sqlite3', 'gpkg', 'GPKG'),
+    'fgb': ('application/flatgeobuf', 'fgb', 'FlatGeobuf'),
+}
+
+
+def layer_queryset(layer):
+    """
+    Rows of ``layer`` with their geometry annotated as ``export_geometry``.
+    """
+    options = LAYERS[layer]
+    geometry = options['geometry']
+    geometry = geometry() if callable(geometry) else F(geometry)
+    return options['model'].objects.annotate(export_geometry=geometry).order_by('pk')
+
+
+def _ogr_field_type(ogr, field):
+    internal_type = field.get_internal_type()
+    if internal_type in ('AutoField', 'BigAutoField', 'IntegerField', 'BigIntegerField', 'ForeignKey'):
+        return ogr.OFTInteger64
+    if internal_type == 'FloatField':
+        return ogr.OFTReal
+    if internal_type == 'DateTimeField':
+        return ogr.OFTDateTime
+    if internal_type == 'DateField':
+        return ogr.OFTDate
+    if internal_type == 'BooleanField':
+        return ogr.OFTInteger
+    return ogr.OFTString
+
+
+def write_ogr(querysets, driver_name, path):
+    """
+    Write ``(layer, queryset)`` pairs (see ``layer_queryset``) to ``path``
+    with an OGR driver, one OGR layer each.
+    """
+    from osgeo import ogr, osr
+
+    ogr.UseExceptions()
+    srs = osr.SpatialReference()
+    srs.ImportFromEPSG(4326)
+    srs.SetAxisMappingStrategy(osr.OAMS_TRADITIONAL_GIS_ORDER)
+    dataset = ogr.GetDriverByName(driver_name).CreateDataSource(path)
+    out = None
+    try:
+        for layer, queryset in querysets:
+            options = LAYERS[layer]
+            meta = options['model']._meta
+            properties = options['properties']
+            out = dataset.CreateLayer(
+                layer.replace('-', '_'), srs, getattr(ogr, f"wkb{options['geometry_type']}"),
+            )
+            out.CreateField(ogr.FieldDefn('id', ogr.OFTInteger64))
+            for name in properties:
+                out.CreateField(ogr.FieldDefn(name, _ogr_field_type(ogr, meta.get_field(name))))
+            definition = out.GetLayerDefn()
+            rows = (
+                queryset.annotate(export_wkb=AsWKB('export_geometry'))
+                .values_list('pk', 'export_wkb', *properties)
+                .iterator(chunk_size=CHUNK_SIZE)
+            )
+            out.StartTransaction()
+            for pk, wkb, *values in rows:
+                feature = ogr.Feature(definition)
+                feature.SetField('id', pk)
+                for name, value in zip(properties, values):
+                    if value is None:
+                        continue
+                    if hasattr(value, 'isoformat'):
+                        value = value.isoformat()
+                    elif isinstance(value, bool):
+                        value = int(value)
+                    feature.SetField(name, value)
+                if wkb is not None:
+                    feature.SetGeometry(ogr.CreateGeometryFromWkb(bytes(wkb)))
+                out.CreateFeature(feature)
+            out.CommitTransaction()
+    finally:
+        out = dataset = None  # closes and flushes the file
+
+
+class BulkExportView(APIView):
+    """
+    Export whole layers (``layers``: comma-separated names of ``LAYERS``) as
+    ``format`` = geojson, gpkg or fgb.
+    """
+    permission_classes = [IsAuthenticated]
+    geometry_field = 'export_geometry'  # for SpatialFilter
+
+    def perform_content_negotiation(self, request, force=False):
+        # ``format`` names the export format, not a renderer; errors are JSON.
+        return super().perform_content_negotiation(request, force=True)
+
+    def _querysets(self, request, layers):
+        bounds = {}
+        for name in ('from', 'to'):
+            try:
+                bounds[name] = parse_instant(name, request.query_params.get(name))
+            except ValueError as e:
+                raise ValidationError({name: str(e)})
+        start, end = bounds['from'], bounds['to']
+        for layer in layers:
+            spatial_filter = LAYERS[layer].get('spatial_filter')
+            if spatial_filter:
+                queryset = spatial_filter(request, layer_queryset(layer))
+            else:
+                queryset = SpatialFilter().filter_queryset(request, layer_queryset(layer), self)
+            date_field = LAYERS[layer]['date']
+            if start:
+                queryset = queryset.filter(**{f'{date_field}__gte': start})
+            if end:
+                queryset = queryset.filter(**{f'{date_field}__lt': end})
+            yield layer, queryset
+
+    def get(self, request):
+        params = request.query_params
+        layers = [name for name in params.get('layers', 'regions').split(',') if name]
+        unknown = [name for name in layers if name not in LAYERS]
+        if not layers or unknown:
+            raise ValidationError({'layers': f"Unknown layers: {', '.join(unknown)}. Choose from {', '.join(LAYERS)}."})
+        format = params.get('format', 'geojson')
+        if format not in FORMATS:
+            raise ValidationError({'format': f"Choose from {', '.join(FORMATS)}."})
+        if format == 'fgb' and len(layers) > 1:
+            raise ValidationError({'layers': 'FlatGeobuf holds a single layer.'})
+        content_type, extension, driver = FORMATS[format]
+        querysets = list(self._querysets(request, layers))
+        filename = f"{'_'.join(layers)}.{extension}"
+
+        if driver is None:
+            features = chain.from_iterable(
+                geojson.encode_features(
+                    queryset.annotate(layer=Value(layer)),
+                    (*LAYERS[layer]['properties'], 'layer'),
+                    geometry=geojson.geometry_expression('export_geometry'),
+                )
+                for layer, queryset in querysets
+            )
+            response = StreamingHttpResponse(geojson.collection_chunks(features), content_type=content_type)
+            response['Content-Disposition'] = f'attachment; filename="{filename}"'
+            return response
+
+        directory = tempfile.mkdtemp(prefix='export-')
+        try:
+            path = os.path.join(directory, filename)
+            write_ogr(querysets, driver, path)
+            # The open file outlives the directory; nothing is left on disk.
+            file = open(path, 'rb')
+        finally:
+            shutil.rmtree(directory)
+        return FileResponse(file, as_attachment=True, filename=filename, content_type=content_type)
@@ -0,0 +1,125 @@
+"""
+Streaming GeoJSON FeatureCollections straight from the database.
+
+The geometry is rendered to GeoJSON text by PostGIS (``AsGeoJSON``) and
+pasted into the output as is; only the few scalar properties go through a
+JSON encoder (``orjson`` when installed). Rows are read with a server-side
+cursor and written out in ~64 KB chunks, so neither the model instances nor
+the whole document are ever built in memory.
+"""
+import json
+from decimal import Decimal
+
+from django.contrib.gis.db.models.functions import AsGeoJSON
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models.functions import Coalesce
+from django.http import StreamingHttpResponse
+
+try:
+    import orjson
+except ImportError:  # optional, several times faster than json
+    orjson = None
+
+CONTENT_TYPE = 'application/geo+json'
+CHUNK_SIZE = 2000  # rows fetched per round trip
+CHUNK_BYTES = 64 * 1024
+PRECISION = 6  # decimal places, about 10 cm
+GEOMETRY_TYPES = frozenset((
+    'Point', 'MultiPoint', 'LineString', 'MultiLineString', 'Polygon', 'MultiPolygon', 'GeometryCollection',
+))
+
+
+def _default(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+if orjson is not None:
+    def dumps(value):
+        return orjson.dumps(value, default=_default)
+else:
+    def dumps(value):
+        return json.dumps(value, cls=DjangoJSONEncoder, separators=(',', ':')).encode('utf-8')
+
+
+def geometry_expression(field, level=None):
+    """
+    DB-side GeoJSON of ``field``, or of its simplified ``level`` when set
+    (falling back to the full geometry where it is missing).
+    """
+    source = Coalesce(f'{field}_{level}', field) if level else field
+    return AsGeoJSON(source, precision=PRECISION)
+
+
+def _json_geometry(value):
+    """
+    Geometry of GeoJSON kept in a JSONField, as a bare geometry or a Feature;
+    None for anything else (a FeatureCollection, a list, a string...).
+    """
+    if isinstance(value, dict) and value.get('type') == 'Feature':
+        value = value.get('geometry')
+    if isinstance(value, dict) and value.get('type') in GEOMETRY_TYPES:
+        return value
+    return None
+
+
+def _features(rows, properties, raw_geometry):
+    for pk, geometry, *values in rows:
+        if geometry is None:
+            geometry = b'null'
+        elif raw_geometry:
+            geometry = geometry.encode('utf-8')
+        else:
+            geometry = dumps(_json_geometry(geometry))
+        yield b''.join((
+            b'{"type":"Feature","id":', dumps(pk),
+            b',"geometry":', geometry,
+            b',"properties":', dumps(dict(zip(properties, values))), b'}',
+        ))
+
+
+def collection_chunks(features):
+    """
+    Wrap encoded features into a FeatureCollection, in ~64 KB chunks.
+    """
+    buffer = [b'{"type":"FeatureCollection","features":[']
+    size = 0
+    separator = b''
+    for feature in features:
+        buffer.append(separator)
+        buffer.append(feature)
+        separator = b','
+        size += len(feature)
+        if size >= CHUNK_BYTES:
+            yield b''.join(buffer)
+            buffer, size = [], 0
+    buffer.append(b']}')
+    yield b''.join(buffer)
+
+
+def encode_features(queryset, properties, geometry=None, json_geometry=None):
+    """
+    Encoded features of ``queryset``, read with a server-side cursor.
+
+    ``geometry`` is a DB expression returning GeoJSON text (see
+    ``geometry_expression``); for GeoJSON stored in a JSONField pass its name
+    as ``json_geometry`` instead. ``properties`` are the value fields copied
+    into each feature.
+    """
+    if geometry is not None:
+        queryset = queryset.annotate(feature_geometry=geometry)
+        geometry_field = 'feature_geometry'
+    else:
+        geometry_field = json_geometry
+    rows = queryset.values_list('pk', geometry_field, *properties).iterator(chunk_size=CHUNK_SIZE)
+    return _features(rows, properties, geometry is not None)
+
+
+def stream_feature_collection(queryset, properties, geometry=None, json_geometry=None):
+    """
+    StreamingHttpResponse with a FeatureCollection of ``queryset``; arguments
+    as for ``encode_features``.
+    """
+    features = encode_features(queryset, properties, geometry, json_geometry)
+    return StreamingHttpResponse(collection_chunks(features), content_type=CONTENT_TYPE)
@@ -0,0 +1,213 @@
+"""
+Batched ingestion of IoT sensor readings.
+
+Gateways post readings as a JSON array (or ``{"readings": [...]}``) or as an
+NDJSON stream. The whole payload is validated column by column, then written
+with ``bulk_create`` in bounded batches inside a single transaction.
+
+Besides the metrics, a reading may identify its station: ``device_id``, its
+position as ``lon``/``lat`` (WGS84) and ``region`` (a Region id, otherwise
+resolved from the position).
+"""
+import json
+
+import numpy as np
+import pandas as pd
+from django.contrib.gis.geos import Point
+from django.db import transaction
+
+from .locks import cache_locks
+from .models import IoTData, Region
+
+IOT_FIELDS = (
+    'amg_avg_temp',
+    'amg_max_temp',
+    'amg_min_temp',
+    'bme_temp',
+    'bme_humidity',
+    'bme_pressure',
+    'bme_gas',
+    'soil_moisture',
+    'luminosity',
+)
+INGEST_BATCH_SIZE = 1000
+MAX_READINGS_PER_REQUEST = 50000
+MAX_REPORTED_ERRORS = 50
+DEVICE_ID_MAX_LENGTH = IoTData._meta.get_field('device_id').max_length
+SCALAR_FIELDS = (*IOT_FIELDS, 'timestamp', 'lon', 'lat', 'region')
+
+
+class IngestError(ValueError):
+    """
+    Raised when a payload cannot be ingested; ``errors`` lists what was wrong.
+    """
+
+    def __init__(self, message, errors=None):
+        super().__init__(message)
+        self.errors = errors or []
+
+
+def parse_json(body):
+    try:
+        payload = json.loads(body)
+    except (TypeError, ValueError) as e:
+        raise IngestError(f"Invalid JSON: {e}")
+    if isinstance(payload, dict):
+        payload = payload.get('readings', [payload])
+    if not isinstance(payload, list):
+        raise IngestError("Expected a JSON object or an array of readings")
+    return payload
+
+
+def parse_ndjson(lines):
+    """
+    Parse an iterable of NDJSON lines (bytes or str), skipping blank lines.
+    """
+    readings = []
+    for lineno, line in enumerate(lines, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            readings.append(json.loads(line))
+        except ValueError as e:
+            raise IngestError(f"Invalid JSON on line {lineno}: {e}")
+        if len(readings) > MAX_READINGS_PER_REQUEST:
+            break
+    return readings
+
+
+def validate_readings(records):
+    """
+    Validate a list of reading dicts and return the rows to insert.
+
+    Checks are done per column on a DataFrame rather than per reading: metric
+    values must be finite numbers, ``timestamp`` (optional) must be a parseable
+    date or epoch seconds, and a reading must carry at least one metric. ``device_id``,
+    ``lon``/``lat`` and ``region`` are optional. Unknown keys are ignored.
+    Raises ``IngestError`` listing the offending readings.
+    """
+    if not records:
+        raise IngestError("No readings provided")
+    if len(records) > MAX_READINGS_PER_REQUEST:
+        raise IngestError(f"Too many readings (max {MAX_READINGS_PER_REQUEST} per request)")
+    if not all(isinstance(record, dict) for record in records):
+        raise IngestError("Every reading must be a JSON object")
+    # pandas coercion raises on lists and objects and reads booleans as 1/0.
+    errors = [
+        {'index': index, 'field': field, 'error': 'must be a number or a string'}
+        for index, record in enumerate(records)
+        for field in SCALAR_FIELDS
+        if isinstance(record.get(field), (bool, list, dict))
+    ]
+    if errors:
+        raise IngestError(f"{len(errors)} invalid value(s)", errors[:MAX_REPORTED_ERRORS])
+
+    frame = pd.DataFrame.from_records(records, columns=[*IOT_FIELDS, 'timestamp', 'device_id', 'lon', 'lat', 'region'])
+    raw = frame[list(IOT_FIELDS)]
+    values = raw.apply(pd.to_numeric, errors='coerce')
+    invalid = (values.isna() & raw.notna()) | np.isinf(values.astype(float))
+    empty = values.isna().all(axis=1)
+    # Numbers are epoch seconds (pandas would read them as nanoseconds).
+    epoch = frame['timestamp'].map(lambda t: isinstance(t, (int, float)), na_action='ignore').fillna(False).astype(bool)
+    timestamps = pd.to_datetime(frame['timestamp'].where(~epoch), errors='coerce', utc=True)
+    if epoch.any():
+        timestamps[epoch] = pd.to_datetime(frame['timestamp'][epoch].astype(float), unit='s', errors='coerce', utc=True)
+    bad_timestamps = timestamps.isna() & frame['timestamp'].notna()
+    devices = frame['device_id']
+    bad_devices = devices.notna() & ~devices.map(
+        lambda d: isinstance(d, str) and len(d) <= DEVICE_ID_MAX_LENGTH, na_action='ignore'
+    ).fillna(True).astype(bool)
+    lon = pd.to_numeric(frame['lon'], errors='coerce')
+    lat = pd.to_numeric(frame['lat'], errors='coerce')
+    bad_lon = (frame['lon'].notna() & ~lon.between(-180, 180)) | (lon.isna() != lat.isna())
+    bad_lat = frame['lat'].notna() & ~lat.between(-90, 90)
+    regions = pd.to_numeric(frame['region'], errors='coerce')
+    bad_regions = frame['region'].notna() & (regions.isna() | (regions % 1 != 0))
+    region_ids = {int(r) for r in regions[regions.notna() & ~bad_regions]}
+    if region_ids:
+        known = set(Region.objects.filter(pk__in=region_ids).values_list('pk', flat=True))
+        bad_regions |= regions.notna() & ~regions.isin(known)
+
+    errors = []
+    for index, field in zip(*np.nonzero(invalid.to_numpy())):
+        errors.append({'index': int(index), 'field': IOT_FIELDS[field], 'error': 'must be a finite number'})
+    for column, mask, message in (
+        ('timestamp', bad_timestamps, 'invalid date'),
+        ('device_id', bad_devices, f'must be a string of at most {DEVICE_ID_MAX_LENGTH} characters'),
+        ('lon', bad_lon, 'lon and lat must both be given, lon within [-180, 180]'),
+        ('lat', bad_lat, 'must be within [-90, 90]'),
+        ('region', bad_regions, 'must be a region id'),
+    ):
+        for index in np.flatnonzero(mask.to_numpy()):
+            errors.append({'index': int(index), 'field': column, 'error': message})
+    for index in np.flatnonzero(empty.to_numpy()):
+        errors.append({'index': int(index), 'field': None, 'error': 'no metric value'})
+    if errors:
+        errors.sort(key=lambda e: e['index'])
+        raise IngestError(f"{len(errors)} invalid value(s)", errors[:MAX_REPORTED_ERRORS])
+
+    values = values.astype(object).where(values.notna(), None)
+    rows = values.to_dict('records')
+    for row, timestamp, device, x, y, region in zip(rows, timestamps, devices, lon, lat, regions):
+        if not pd.isna(timestamp):
+            row['timestamp'] = timestamp.to_pydatetime()
+        if not pd.isna(device):
+            row['device_id'] = device
+        if not pd.isna(x):
+            row['lon'], row['lat'] = float(x), float(y)
+        if not pd.isna(region):
+            row['region_id'] = int(region)
+    return rows
+
+
+def build_readings(rows):
+    """
+    Turn validated rows into unsaved IoTData instances. Readings with a
+    position but no region get the region containing it, looked up once per
+    distinct position (stations rarely move).
+    """
+    regions = {}
+    readings = []
+    for row in rows:
+        row = dict(row)
+        lon, lat = row.pop('lon', None), row.pop('lat', None)
+        if lon is not None:
+            row['location'] = Point(lon, lat, srid=4326)
+            if row.get('region_id') is None:
+                if (lon, lat) not in regions:
+                    regions[(lon, lat)] = (
+                        Region.objects.filter(geometry__contains=row['location']).values_list('id', flat=True).first()
+                    )
+                row['region_id'] = regions[(lon, lat)]
+        readings.append(IoTData(**row))
+    return readings
+
+
+def bulk_insert(rows, batch_size=INGEST_BATCH_SIZE):
+    """
+    Insert validated rows in batches of ``batch_size`` within one transaction,
+    together with the matching rollup updates and detector alerts. With
+    ``IOT_COMPRESSION`` only the readings that carry new information are
+    written, while rollups and the detector still see all of them. Live
+    subscribers get the batch once it is committed. Returns the number of rows
+    written.
+
+    The per-device state locks are taken before the transaction opens and
+    released after it commits, when the new state is published.
+    """
+    from .anomaly import detect, lock_keys as detector_lock_keys
+    from .compression import compress, lock_keys as compression_lock_keys
+    from .models import IoTAlert
+    from .pubsub import publish_readings
+    from .rollups import apply_readings
+
+    objs = build_readings(rows)
+    locks = [*compression_lock_keys(objs), *detector_lock_keys(objs)]
+    with cache_locks(locks), transaction.atomic():
+        stored = compress(objs)
+        IoTData.objects.bulk_create(stored, batch_size=batch_size)
+        apply_readings(objs)
+        alerts = IoTAlert.objects.bulk_create(detect(objs))
+        transaction.on_commit(lambda: publish_readings(stored, alerts))
+    return len(stored)
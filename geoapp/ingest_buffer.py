@@ -0,0 +1,336 @@
+"""
+Optional write-behind buffer for IoT ingestion.
+
+With write-behind enabled, ingest requests only append validated readings to a
+fast queue and return; a flusher drains the queue into ``IoTData`` with
+``bulk_create``. Configured through the ``IOT_WRITE_BEHIND`` setting::
+
+    IOT_WRITE_BEHIND = {
+        'BACKEND': 'cache',      # 'cache', 'memory', or None to write synchronously
+        'MAX_PENDING': 100000,   # readings queued before producers get a 503
+        'FLUSH_BATCH': 5000,     # readings per bulk_create transaction
+        'FLUSH_SECONDS': 60,     # time budget of one flush run
+        'MAX_RETRIES': 5,        # failed flushes before a batch is dead-lettered
+        # memory backend only
+        'JOURNAL': '/var/lib/geoapp/iot.journal',  # None keeps readings in RAM only
+        'FSYNC': 'interval',     # 'always', 'interval' (each flush tick) or 'never'
+        'FLUSH_INTERVAL': 1.0,   # seconds between flusher thread ticks
+    }
+
+The ``cache`` backend keeps the queue in the Django cache (Redis in
+production), so it is shared between web workers and drained by the
+``flush_iot_buffer`` Celery task; its durability is the cache's. The ``memory``
+backend is a per-process ring buffer flushed by a thread of that process,
+optionally journaled to disk so a crash does not lose acknowledged readings.
+
+A batch whose insert keeps failing is retried ``MAX_RETRIES`` times, then
+logged in full at error level and dropped, so one bad batch cannot stall the
+queue behind it.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections
+
+from .ingest import INGEST_BATCH_SIZE, bulk_insert
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'BACKEND': None,
+    'MAX_PENDING': 100000,
+    'FLUSH_BATCH': 5000,
+    'FLUSH_SECONDS': 60,
+    'MAX_RETRIES': 5,
+    'JOURNAL': None,
+    'FSYNC': 'interval',
+    'FLUSH_INTERVAL': 1.0,
+}
+
+
+class WriteBehindBuffer:
+    """
+    Base class: subclasses implement ``append``, ``pending``, ``_take``,
+    ``_commit``, ``_rollback`` and ``_failed``.
+    """
+
+    def __init__(self, options):
+        self.max_pending = options['MAX_PENDING']
+        self.flush_batch = options['FLUSH_BATCH']
+        self.flush_seconds = options['FLUSH_SECONDS']
+        self.max_retries = options['MAX_RETRIES']
+
+    def flush(self, max_batches=None):
+        """
+        Drain the queue into the database, one transaction per batch.
+
+        Stops after ``FLUSH_SECONDS`` so a run ends well within the flush
+        lock it holds; the rest is left for the next run. Returns the number
+        of readings written.
+        """
+        deadline = time.monotonic() + self.flush_seconds
+        written = batches = 0
+        while (max_batches is None or batches < max_batches) and time.monotonic() < deadline:
+            rows = self._take(self.flush_batch)
+            if not rows:
+                break
+            try:
+                written += bulk_insert(rows, batch_size=min(self.flush_batch, INGEST_BATCH_SIZE))
+            except Exception:
+                attempts = self._failed(rows)
+                if attempts < self.max_retries:
+                    self._rollback(rows)
+                    logger.exception(
+                        "Write-behind flush failed (attempt %d of %d), %d readings kept for retry",
+                        attempts, self.max_retries, len(rows),
+                    )
+                    break
+                logger.exception(
+                    "Write-behind flush failed %d times, dropping %d readings: %s",
+                    attempts, len(rows), json.dumps(rows, default=_encode),
+                )
+            self._commit(rows)
+            batches += 1
+        return written
+
+
+class MemoryBuffer(WriteBehindBuffer):
+    """
+    In-process ring buffer with an optional append-only NDJSON journal.
+
+    The journal is rotated when a batch is taken, and the rotated segment is
+    only deleted once that batch is committed; both files are replayed on
+    start-up, so delivery after a crash is at-least-once. The buffer is per
+    process: use it for single-process ingest workers, and the cache backend
+    when several workers accept readings.
+    """
+
+    def __init__(self, options):
+        super().__init__(options)
+        self.journal_path = options['JOURNAL']
+        self.fsync = options['FSYNC']
+        self.flush_interval = options['FLUSH_INTERVAL']
+        self._queue = deque()
+        self._retry = []
+        self._failures = 0
+        self._lock = threading.Lock()
+        self._journal = None
+        self._thread = None
+        if self.journal_path:
+            self._replay()
+            self._journal = open(self.journal_path, 'a', encoding='utf-8')
+
+    @property
+    def pending(self):
+        return len(self._queue) + len(self._retry)
+
+    def append(self, rows):
+        with self._lock:
+            if self.pending + len(rows) > self.max_pending:
+                return False
+            if self._journal is not None:
+                self._journal.write(''.join(json.dumps(row, default=_encode) + '\n' for row in rows))
+                if self.fsync == 'always':
+                    self._journal.flush()
+                    os.fsync(self._journal.fileno())
+            self._queue.extend(rows)
+        self._ensure_thread()
+        return True
+
+    def _take(self, limit):
+        with self._lock:
+            if self._retry:
+                rows, self._retry = self._retry, []
+                return rows
+            rows = [self._queue.popleft() for _ in range(min(limit, len(self._queue)))]
+            if rows and self._journal is not None:
+                # Rotate the journal: the rotated segment covers this batch and
+                # is dropped on commit; readings still queued are rewritten to
+                # the fresh journal.
+                self._journal.close()
+                os.replace(self.journal_path, self._segment_path)
+                self._journal = open(self.journal_path, 'a', encoding='utf-8')
+                self._journal.write(''.join(json.dumps(row, default=_encode) + '\n' for row in self._queue))
+            return rows
+
+    def _commit(self, rows):
+        with self._lock:
+            self._failures = 0
+            if self._journal is not None and os.path.exists(self._segment_path):
+                os.remove(self._segment_path)
+
+    def _rollback(self, rows):
+        with self._lock:
+            self._retry = rows + self._retry
+
+    def _failed(self, rows):
+        # Only one batch is in flight, and a failed one is retried before
+        # anything else is taken.
+        with self._lock:
+            self._failures += 1
+            return self._failures
+
+    @property
+    def _segment_path(self):
+        return f"{self.journal_path}.flushing"
+
+    def _replay(self):
+        for path in (self._segment_path, self.journal_path):
+            if not os.path.exists(path):
+                continue
+            with open(path, encoding='utf-8') as journal:
+                for line in journal:
+                    if line.strip():
+                        self._queue.append(_decode(json.loads(line)))
+        if self._queue:
+            logger.info("Replayed %d journaled IoT readings", len(self._queue))
+        # Replayed readings are rewritten to the live journal until flushed.
+        with open(self.journal_path, 'w', encoding='utf-8') as journal:
+            journal.write(''.join(json.dumps(row, default=_encode) + '\n' for row in self._queue))
+        if os.path.exists(self._segment_path):
+            os.remove(self._segment_path)
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            with self._lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._run, name='iot-write-behind', daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        stop = threading.Event()
+        while not stop.wait(self.flush_interval):
+            if self._journal is not None and self.fsync == 'interval':
+                with self._lock:
+                    self._journal.flush()
+                    os.fsync(self._journal.fileno())
+            close_old_connections()
+            self.flush()
+
+
+class CacheBuffer(WriteBehindBuffer):
+    """
+    Queue kept in the Django cache as numbered slots, one per ingest request.
+
+    ``head`` is the last allocated slot and ``tail`` the last flushed one;
+    ``pending`` counts readings for backpressure. Only the flusher moves
+    ``tail``, and only after the slots are committed to the database.
+    """
+
+    prefix = 'iot_write_behind'
+    # A slot allocated but never written (its writer died) is skipped once it
+    # has been seen missing by this many flushes.
+    max_gap_misses = 3
+
+    def __init__(self, options):
+        super().__init__(options)
+        self._taken = None
+
+    def _key(self, name):
+        return f"{self.prefix}_{name}"
+
+    @property
+    def pending(self):
+        return cache.get(self._key('pending'), 0)
+
+    def append(self, rows):
+        cache.add(self._key('pending'), 0, None)
+        if cache.incr(self._key('pending'), len(rows)) > self.max_pending:
+            cache.decr(self._key('pending'), len(rows))
+            return False
+        cache.add(self._key('head'), 0, None)
+        slot = cache.incr(self._key('head'))
+        cache.set(self._key(slot), rows, None)
+        return True
+
+    def _take(self, limit):
+        tail = cache.get(self._key('tail'), 0)
+        head = cache.get(self._key('head'), 0)
+        slots = list(range(tail + 1, head + 1))
+        found = cache.get_many([self._key(slot) for slot in slots])
+        rows, taken = [], []
+        for slot in slots:
+            slot_rows = found.get(self._key(slot))
+            if slot_rows is None:
+                misses = cache.get(self._key(f'gap_{slot}'), 0) + 1
+                if misses < self.max_gap_misses:
+                    cache.set(self._key(f'gap_{slot}'), misses, 3600)
+                    break
+                logger.warning("Skipping write-behind slot %d that was never written", slot)
+                slot_rows = []
+            if rows and len(rows) + len(slot_rows) > limit:
+                break
+            rows.extend(slot_rows)
+            taken.append(slot)
+        self._taken = taken
+        if taken and not rows:
+            # Only abandoned slots: move past them right away.
+            self._commit(rows)
+        return rows
+
+    def _commit(self, rows):
+        if not self._taken:
+            return
+        cache.set(self._key('tail'), self._taken[-1], None)
+        cache.delete_many(
+            [self._key(slot) for slot in self._taken]
+            + [self._key(f'gap_{slot}') for slot in self._taken]
+            + [self._key(f'failures_{slot}') for slot in self._taken]
+        )
+        if rows:
+            cache.decr(self._key('pending'), len(rows))
+        self._taken = None
+
+    def _rollback(self, rows):
+        self._taken = None
+
+    def _failed(self, rows):
+        # A retry starts from the same tail, so the failure count is kept
+        # against the batch's first slot.
+        key = self._key(f'failures_{self._taken[0]}')
+        failures = cache.get(key, 0) + 1
+        cache.set(key, failures, None)
+        return failures
+
+
+def _encode(value):
+    if isinstance(value, datetime):
+        return {'__datetime__': value.isoformat()}
+    raise TypeError(f"Cannot journal {type(value).__name__}")
+
+
+def _decode(row):
+    timestamp = row.get('timestamp')
+    if isinstance(timestamp, dict) and '__datetime__' in timestamp:
+        row['timestamp'] = datetime.fromisoformat(timestamp['__datetime__'])
+    return row
+
+
+BACKENDS = {
+    'cache': CacheBuffer,
+    'memory': MemoryBuffer,
+}
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_write_behind_buffer():
+    """
+    Return the configured buffer, or None when write-behind is disabled.
+    """
+    global _buffer
+    options = {**DEFAULTS, **getattr(settings, 'IOT_WRITE_BEHIND', {})}
+    if not options['BACKEND']:
+        return None
+    if _buffer is None:
+        with _buffer_lock:
+            if _buffer is None:
+                _buffer = BACKENDS[options['BACKEND']](options)
+    return _buffer
@@ -0,0 +1,100 @@
+"""
+Live IoT readings over Server-Sent Events and WebSocket.
+
+Both transports subscribe to the ``iot.readings`` channel of
+``geoapp.pubsub`` and send every pending message as one frame, so a burst of
+ingest batches reaches a slow client as a single coalesced update.
+"""
+import asyncio
+import json
+import time
+
+from django.http import StreamingHttpResponse
+from django.views.decorators.http import require_GET
+
+from .pubsub import IOT_CHANNEL, get_broker
+
+HEARTBEAT = 15  # seconds between keep-alives on an idle connection
+MAX_DURATION = 60 * 60  # seconds before the server ends an SSE stream
+WEBSOCKET_PATH = '/ws/iot/'
+
+
+def _coalesce(batch, dropped):
+    readings, alerts = [], []
+    count = 0
+    for message in batch:
+        readings.extend(message.get('readings', []))
+        alerts.extend(message.get('alerts', []))
+        count += message.get('count', 0)
+    return {'type': 'readings', 'count': count, 'dropped': dropped, 'readings': readings, 'alerts': alerts}
+
+
+async def _sse_events(subscription):
+    started = time.monotonic()
+    reported = 0
+    try:
+        yield "retry: 3000\n\n"
+        while time.monotonic() - started < MAX_DURATION:
+            batch = await subscription.next_batch(HEARTBEAT)
+            if not batch:
+                yield ": keep-alive\n\n"
+                continue
+            payload = _coalesce(batch, subscription.dropped - reported)
+            reported = subscription.dropped
+            yield f"event: readings\ndata: {json.dumps(payload, default=str)}\n\n"
+    finally:
+        subscription.close()
+
+
+@require_GET
+async def iot_live_stream(request):
+    """
+    SSE stream of newly ingested IoT readings (requires an ASGI server).
+    """
+    subscription = get_broker().subscribe(IOT_CHANNEL)
+    response = StreamingHttpResponse(_sse_events(subscription), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+async def _wait_for_disconnect(receive):
+    while True:
+        message = await receive()
+        if message['type'] == 'websocket.disconnect':
+            return
+
+
+async def websocket_application(scope, receive, send):
+    """
+    Plain ASGI WebSocket endpoint at ``/ws/iot/``: pushes the same coalesced
+    frames as the SSE stream. Messages sent by the client are ignored.
+    """
+    message = await receive()
+    if message['type'] != 'websocket.connect':
+        return
+    if scope['path'] != WEBSOCKET_PATH:
+        await send({'type': 'websocket.close', 'code': 4404})
+        return
+    await send({'type': 'websocket.accept'})
+
+    subscription = get_broker().subscribe(IOT_CHANNEL)
+    disconnected = asyncio.ensure_future(_wait_for_disconnect(receive))
+    reported = 0
+    try:
+        while not disconnected.done():
+            next_batch = asyncio.ensure_future(subscription.next_batch(HEARTBEAT))
+            await asyncio.wait({next_batch, disconnected}, return_when=asyncio.FIRST_COMPLETED)
+            if disconnected.done():
+                next_batch.cancel()
+                break
+            batch = next_batch.result()
+            if batch:
+                payload = _coalesce(batch, subscription.dropped - reported)
+                reported = subscription.dropped
+            else:
+                payload = {'type': 'heartbeat'}
+            await send({'type': 'websocket.send', 'text': json.dumps(payload, default=str)})
+    finally:
+        subscription.close()
+        disconnected.cancel()
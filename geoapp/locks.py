@@ -0,0 +1,33 @@
+"""
+Cache locks serializing read-modify-write of per-device state shared by
+ingest workers (detector, compression). Like that state, they need a cache
+shared between processes (e.g. Redis) to be effective.
+"""
+import time
+from contextlib import contextmanager
+
+from django.core.cache import cache
+
+LOCK_TIMEOUT = 30  # seconds; the lock of a crashed holder expires after that
+POLL_INTERVAL = 0.01
+
+
+@contextmanager
+def cache_locks(keys, timeout=LOCK_TIMEOUT):
+    """
+    Hold the cache locks ``keys``, waiting for each at most ``timeout``
+    seconds (then TimeoutError). They are taken in sorted order, so callers
+    locking overlapping sets of devices cannot deadlock.
+    """
+    held = []
+    try:
+        for key in sorted(set(keys)):
+            deadline = time.monotonic() + timeout
+            while not cache.add(key, True, timeout):
+                if time.monotonic() >= deadline:
+                    raise TimeoutError(f"Lock {key} is still held")
+                time.sleep(POLL_INTERVAL)
+            held.append(key)
+        yield
+    finally:
+        cache.delete_many(held)
@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+
+from geoapp import archive, partitions
+
+
+class Command(BaseCommand):
+    help = "Manage monthly partitions, the archive tier and retention of IoT readings."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--convert', action='store_true', help="Convert the IoTData table to monthly partitions (run once, in a maintenance window).")
+        parser.add_argument('--ensure', action='store_true', help="Create the partitions of the current and upcoming months.")
+        parser.add_argument('--archive', action='store_true', help="Move readings older than IOT_ARCHIVE['AFTER_DAYS'] to Parquet files.")
+        parser.add_argument('--archive-after-days', type=int, help="Override IOT_ARCHIVE['AFTER_DAYS'] for --archive.")
+        parser.add_argument('--drop-expired', action='store_true', help="Apply IOT_RETENTION_DAYS.")
+        parser.add_argument('--retention-days', type=int, help="Override IOT_RETENTION_DAYS for --drop-expired.")
+
+    def handle(self, *args, **options):
+        if options['convert']:
+            if partitions.convert_to_partitioned():
+                self.stdout.write(self.style.SUCCESS("IoTData is now partitioned by month."))
+            else:
+                self.stdout.write("IoTData is already partitioned.")
+        if options['ensure']:
+            if not partitions.is_partitioned():
+                self.stderr.write("IoTData is not partitioned; run with --convert first.")
+            else:
+                for name in partitions.ensure_partitions():
+                    self.stdout.write(f"Partition ready: {name}")
+        if options['archive']:
+            count = archive.archive_expired(options['archive_after_days'])
+            self.stdout.write(f"Archived {count} readings.")
+        if options['drop_expired']:
+            result = partitions.drop_expired(options['retention_days'])
+            if isinstance(result, int):
+                self.stdout.write(f"Deleted {result} expired readings.")
+            else:
+                for name in result:
+                    self.stdout.write(f"Dropped partition: {name}")
+            for month in archive.drop_expired(options['retention_days']):
+                self.stdout.write(f"Dropped archived month: {month}")
+        if partitions.is_partitioned():
+            for name, month in partitions.monthly_partitions():
+                self.stdout.write(f"{name}: {month:%Y-%m}")
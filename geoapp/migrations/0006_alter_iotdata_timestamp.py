@@ -0,0 +1,19 @@
+# Generated by Django 5.2 on 2026-10-19 09:12
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('geoapp', '0005_remove_iotdata_data_type_remove_iotdata_device_id_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='iotdata',
+            name='timestamp',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
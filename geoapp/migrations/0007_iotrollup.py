@@ -0,0 +1,29 @@
+# Generated by Django 5.2 on 2026-10-19 10:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('geoapp', '0006_alter_iotdata_timestamp'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IoTRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('granularity', models.CharField(choices=[('minute', 'Minute'), ('hour', 'Hour'), ('day', 'Day')], max_length=10)),
+                ('metric', models.CharField(max_length=50)),
+                ('bucket', models.DateTimeField()),
+                ('count', models.IntegerField(default=0)),
+                ('total', models.FloatField(default=0)),
+                ('min_value', models.FloatField(blank=True, null=True)),
+                ('max_value', models.FloatField(blank=True, null=True)),
+            ],
+            options={
+                'unique_together': {('granularity', 'metric', 'bucket')},
+            },
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2 on 2026-10-19 11:20
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Built concurrently so existing IoT tables stay writable meanwhile.
+    atomic = False
+
+    dependencies = [
+        ('geoapp', '0007_iotrollup'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='iotdata',
+            index=models.Index(fields=['-timestamp'], name='iotdata_timestamp_desc_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='iotdata',
+            index=django.contrib.postgres.indexes.BrinIndex(autosummarize=True, fields=['timestamp'], name='iotdata_timestamp_brin'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2 on 2026-10-19 13:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('geoapp', '0008_iotdata_timestamp_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IoTAlert',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('fire', 'Fire risk'), ('drought', 'Drought'), ('anomaly', 'Anomaly')], max_length=20)),
+                ('metric', models.CharField(blank=True, max_length=50)),
+                ('value', models.FloatField(blank=True, null=True)),
+                ('score', models.FloatField(blank=True, null=True)),
+                ('message', models.TextField(blank=True)),
+                ('reading_id', models.BigIntegerField(blank=True, null=True)),
+                ('reading_timestamp', models.DateTimeField()),
+                ('acknowledged', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-reading_timestamp'], name='iotalert_timestamp_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2 on 2026-10-19 14:40
+
+import django.contrib.gis.db.models.fields
+import django.db.models.deletion
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # The composite index is built concurrently on the live IoT table.
+    atomic = False
+
+    dependencies = [
+        ('geoapp', '0009_iotalert'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='iotdata',
+            name='device_id',
+            field=models.CharField(blank=True, default='', max_length=100),
+        ),
+        migrations.AddField(
+            model_name='iotdata',
+            name='location',
+            field=django.contrib.gis.db.models.fields.PointField(blank=True, null=True, srid=4326),
+        ),
+        migrations.AddField(
+            model_name='iotdata',
+            name='region',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='iot_data', to='geoapp.region'),
+        ),
+        migrations.AddField(
+            model_name='iotalert',
+            name='device_id',
+            field=models.CharField(blank=True, default='', max_length=100),
+        ),
+        migrations.AddField(
+            model_name='iotrollup',
+            name='device_id',
+            field=models.CharField(blank=True, default='', max_length=100),
+        ),
+        migrations.AlterUniqueTogether(
+            name='iotrollup',
+            unique_together={('granularity', 'device_id', 'metric', 'bucket')},
+        ),
+        AddIndexConcurrently(
+            model_name='iotdata',
+            index=models.Index(fields=['device_id', '-timestamp'], name='iotdata_device_ts_idx'),
+        ),
+    ]
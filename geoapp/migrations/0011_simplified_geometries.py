@@ -0,0 +1,53 @@
+# Generated by Django 5.2 on 2026-10-19 16:05
+
+import django.contrib.gis.db.models.fields
+from django.db import migrations
+
+BACKFILL = """
+UPDATE {table} SET
+    geometry_low = ST_Multi(ST_SimplifyPreserveTopology(geometry, 0.05)),
+    geometry_medium = ST_Multi(ST_SimplifyPreserveTopology(geometry, 0.005)),
+    geometry_high = ST_Multi(ST_SimplifyPreserveTopology(geometry, 0.0005))
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('geoapp', '0010_iot_device_fields'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='region',
+            name='geometry_high',
+            field=django.contrib.gis.db.models.fields.MultiPolygonField(blank=True, editable=False, null=True, spatial_index=False, srid=4326),
+        ),
+        migrations.AddField(
+            model_name='region',
+            name='geometry_low',
+            field=django.contrib.gis.db.models.fields.MultiPolygonField(blank=True, editable=False, null=True, spatial_index=False, srid=4326),
+        ),
+        migrations.AddField(
+            model_name='region',
+            name='geometry_medium',
+            field=django.contrib.gis.db.models.fields.MultiPolygonField(blank=True, editable=False, null=True, spatial_index=False, srid=4326),
+        ),
+        migrations.AddField(
+            model_name='userzone',
+            name='geometry_high',
+            field=django.contrib.gis.db.models.fields.MultiPolygonField(blank=True, editable=False, null=True, spatial_index=False, srid=4326),
+        ),
+        migrations.AddField(
+            model_name='userzone',
+            name='geometry_low',
+            field=django.contrib.gis.db.models.fields.MultiPolygonField(blank=True, editable=False, null=True, spatial_index=False, srid=4326),
+        ),
+        migrations.AddField(
+            model_name='userzone',
+            name='geometry_medium',
+            field=django.contrib.gis.db.models.fields.MultiPolygonField(blank=True, editable=False, null=True, spatial_index=False, srid=4326),
+        ),
+        migrations.RunSQL(BACKFILL.format(table='geoapp_region'), migrations.RunSQL.noop),
+        migrations.RunSQL(BACKFILL.format(table='geoapp_userzone'), migrations.RunSQL.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2 on 2026-10-19 17:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('geoapp', '0011_simplified_geometries'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RegionStatistics',
+            fields=[
+                ('region', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='statistics', serialize=False, to='geoapp.region')),
+                ('total_points', models.IntegerField(default=0)),
+                ('points_by_category', models.JSONField(default=dict)),
+                ('index_means', models.JSONField(default=dict)),
+                ('deforested_area', models.FloatField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2 on 2026-10-19 18:05
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('geoapp', '0012_regionstatistics'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='eodata',
+            index=models.Index(fields=['region', 'index_type', 'acquisition_date'], name='eodata_region_index_date_idx'),
+        ),
+    ]
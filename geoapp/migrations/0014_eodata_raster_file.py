@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-19 18:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('geoapp', '0013_eodata_region_index_date_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='eodata',
+            name='raster_file',
+            field=models.FileField(blank=True, null=True, upload_to='eo_data/'),
+        ),
+    ]
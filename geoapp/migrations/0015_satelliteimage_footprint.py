@@ -0,0 +1,24 @@
+# Generated by Django 5.2 on 2026-10-19 19:30
+
+import django.contrib.gis.db.models.fields
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('geoapp', '0014_eodata_raster_file'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='satelliteimage',
+            name='footprint',
+            field=django.contrib.gis.db.models.fields.MultiPolygonField(blank=True, null=True, srid=4326),
+        ),
+        migrations.AddField(
+            model_name='satelliteimage',
+            name='valid_data',
+            field=django.contrib.gis.db.models.fields.MultiPolygonField(blank=True, null=True, srid=4326),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2 on 2026-10-19 21:10
+
+from django.db import migrations, models
+
+
+def delete_duplicates(apps, schema_editor):
+    # Keep the most recent analysis of each (zone, raster) pair.
+    IndexAnalysis = apps.get_model('geoapp', 'IndexAnalysis')
+    seen = set()
+    duplicates = []
+    rows = (
+        IndexAnalysis.objects.filter(eo_data__isnull=False)
+        .order_by('-updated_at', '-pk')
+        .values_list('pk', 'user_zone_id', 'eo_data_id')
+    )
+    for pk, zone_id, eo_data_id in rows.iterator():
+        if (zone_id, eo_data_id) in seen:
+            duplicates.append(pk)
+        seen.add((zone_id, eo_data_id))
+    IndexAnalysis.objects.filter(pk__in=duplicates).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('geoapp', '0015_satelliteimage_footprint'),
+    ]
+
+    operations = [
+        migrations.RunPython(delete_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='indexanalysis',
+            constraint=models.UniqueConstraint(fields=('user_zone', 'eo_data'), name='indexanalysis_zone_eo_data_unique'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2 on 2026-10-19 21:40
+
+from django.db import migrations
+
+# ST_GeomFromGeoJSON raises on malformed input, which would fail a whole
+# tile or statistics query because of one bad Cartographical row.
+CREATE_FUNCTION = """
+CREATE OR REPLACE FUNCTION geoapp_geojson_geometry(value jsonb) RETURNS geometry
+LANGUAGE plpgsql IMMUTABLE STRICT PARALLEL SAFE AS $$
+BEGIN
+    RETURN ST_SetSRID(ST_GeomFromGeoJSON((
+        CASE WHEN value->>'type' = 'Feature' THEN value->'geometry' ELSE value END
+    )::text), 4326);
+EXCEPTION WHEN OTHERS THEN
+    RETURN NULL;
+END;
+$$;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('geoapp', '0016_indexanalysis_zone_eo_data_unique'),
+    ]
+
+    operations = [
+        migrations.RunSQL(CREATE_FUNCTION, "DROP FUNCTION IF EXISTS geoapp_geojson_geometry(jsonb);"),
+    ]
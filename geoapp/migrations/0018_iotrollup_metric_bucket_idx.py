@@ -0,0 +1,20 @@
+# Generated by Django 5.2 on 2026-10-19 22:20
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('geoapp', '0017_geojson_geometry_function'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='iotrollup',
+            index=models.Index(fields=['granularity', 'metric', 'bucket'], name='iotrollup_metric_bucket_idx'),
+        ),
+    ]
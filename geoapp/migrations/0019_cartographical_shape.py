@@ -0,0 +1,33 @@
+# Generated by Django 5.2 on 2026-10-19 23:05
+
+import django.contrib.gis.db.models.fields
+import django.contrib.postgres.indexes
+import django.db.models.expressions
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('geoapp', '0018_iotrollup_metric_bucket_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cartographical',
+            name='shape',
+            field=models.GeneratedField(
+                db_persist=True,
+                expression=django.db.models.expressions.Func(
+                    models.F('geometry'),
+                    function='geoapp_geojson_geometry',
+                    output_field=django.contrib.gis.db.models.fields.GeometryField(srid=4326),
+                ),
+                output_field=django.contrib.gis.db.models.fields.GeometryField(null=True, srid=4326),
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='cartographical',
+            index=django.contrib.postgres.indexes.GistIndex(fields=['shape'], name='cartographical_shape_gist'),
+        ),
+    ]
@@ -1,7 +1,32 @@
 from django.contrib.gis.db import models
+from django.contrib.postgres.indexes import BrinIndex, GistIndex
 from django.contrib.auth.models import User
+from django.utils import timezone
 import uuid
-class Region(models.Model):
+from .simplify import SIMPLIFIED_FIELDS, simplify_levels
+
+
+class SimplifiedGeometryModel(models.Model):
+    """
+    Adds precomputed simplifications of ``geometry`` (see ``geoapp.simplify``).
+    """
+    geometry_low = models.MultiPolygonField(null=True, blank=True, editable=False, spatial_index=False)
+    geometry_medium = models.MultiPolygonField(null=True, blank=True, editable=False, spatial_index=False)
+    geometry_high = models.MultiPolygonField(null=True, blank=True, editable=False, spatial_index=False)
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'geometry' in update_fields:
+            simplify_levels(self)
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, *SIMPLIFIED_FIELDS}
+        super().save(*args, **kwargs)
+
+
+class Region(SimplifiedGeometryModel):
     name = models.CharField(max_length=100)
     code = models.CharField(max_length=20, unique=True)
     geometry = models.MultiPolygonField()
@@ -12,6 +37,20 @@ class Region(models.Model):
     def __str__(self):
         return self.name
 
+class RegionStatistics(models.Model):
+    """
+    Materialized statistics of a region, maintained by geoapp.region_stats.
+    deforested_area is in hectares.
+    """
+    region = models.OneToOneField(Region, on_delete=models.CASCADE, primary_key=True, related_name='statistics')
+    total_points = models.IntegerField(default=0)
+    points_by_category = models.JSONField(default=dict)
+    index_means = models.JSONField(default=dict)
+    deforested_area = models.FloatField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    def __str__(self):
+        return f"Statistics for {self.region_id}"
+
 class Point(models.Model):
     name = models.CharField(max_length=100)
     region = models.ForeignKey(Region, on_delete=models.CASCADE, related_name='points')
@@ -55,6 +94,10 @@ class SatelliteImage(models.Model):
     acquisition_date = models.DateField(blank=True, null=True)
     region = models.ForeignKey(Region, on_delete=models.CASCADE, related_name='satellite_images')
     cloud_cover = models.FloatField(blank=True, null=True)
+    # From the STAC item (geoapp.stac): the scene's tile and the part of it
+    # actually holding data.
+    footprint = models.MultiPolygonField(null=True, blank=True)
+    valid_data = models.MultiPolygonField(null=True, blank=True)
     processed = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True, null=True, blank=True)
     def __str__(self):
@@ -69,10 +112,15 @@ class EOData(models.Model):
     max_value = models.FloatField(null=True, blank=True)
     min_value = models.FloatField(null=True, blank=True)
     acquisition_date =models.DateField(null=True, blank=True)
+    raster_file = models.FileField(upload_to='eo_data/', null=True, blank=True)
     #created_at = models.DateTimeField(auto_now_add=True, null=True, blank=True)
     region = models.ForeignKey(Region, on_delete=models.CASCADE, related_name='eo_data', null=True, blank=True)
     class Meta:
         unique_together = ('satellite_image', 'index_type')
+        indexes = [
+            # Index time series of a region: one range scan per (region, index).
+            models.Index(fields=['region', 'index_type', 'acquisition_date'], name='eodata_region_index_date_idx'),
+        ]
     def __str__(self):
         return f"{self.index_type} for {self.satellite_image}"
 class Cartographical(models.Model):
@@ -82,12 +130,30 @@ class Cartographical(models.Model):
     geometry = models.JSONField(null=True, blank=True)
     acquisition_date = models.DateField(null=True, blank=True)
     region = models.ForeignKey(Region, on_delete=models.CASCADE, related_name='cartographicals', null=True, blank=True)
+    # ``geometry`` parsed by PostGIS (a bare geometry or a Feature; NULL when
+    # malformed, see migration 0017), so spatial filters can use an index.
+    shape = models.GeneratedField(
+        expression=models.Func(models.F('geometry'), function='geoapp_geojson_geometry', output_field=models.GeometryField(srid=4326)),
+        output_field=models.GeometryField(srid=4326, null=True),
+        db_persist=True,
+    )
+
+    class Meta:
+        indexes = [
+            GistIndex(fields=['shape'], name='cartographical_shape_gist'),
+        ]
+
     def __str__(self):
         return f"Cartographical: {self.name or self.id}"
 
 
 class IoTData(models.Model):
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # Defaults to the insertion time, but gateways sending buffered readings
+    # provide the time each reading was taken.
+    timestamp = models.DateTimeField(default=timezone.now)
+    device_id = models.CharField(max_length=100, blank=True, default='')
+    location = models.PointField(null=True, blank=True)
+    region = models.ForeignKey(Region, on_delete=models.SET_NULL, related_name='iot_data', null=True, blank=True)
     amg_avg_temp = models.FloatField(null=True, blank=True)
     amg_max_temp = models.FloatField(null=True, blank=True)
     amg_min_temp = models.FloatField(null=True, blank=True)
@@ -98,10 +164,79 @@ class IoTData(models.Model):
     soil_moisture = models.FloatField(null=True, blank=True)
     luminosity = models.FloatField(null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            # "Latest N" reads walk this index backwards.
+            models.Index(fields=['-timestamp'], name='iotdata_timestamp_desc_idx'),
+            # Readings arrive in time order, so a BRIN index covers range
+            # scans for a tiny fraction of a B-tree's size.
+            BrinIndex(fields=['timestamp'], name='iotdata_timestamp_brin', autosummarize=True),
+            # Per-station reads: latest reading and time ranges of one device.
+            models.Index(fields=['device_id', '-timestamp'], name='iotdata_device_ts_idx'),
+        ]
+
     def __str__(self):
+        if self.device_id:
+            return f"{self.device_id} @ {self.timestamp}"
         return f"Data @ {self.timestamp}"
 
 
+class IoTAlert(models.Model):
+    """
+    Alert raised at ingest time by the streaming detector (geoapp.anomaly).
+    The reading is referenced by id and timestamp rather than a foreign key,
+    so IoTData can be partitioned or archived.
+    """
+    KIND_CHOICES = [
+        ('fire', 'Fire risk'),
+        ('drought', 'Drought'),
+        ('anomaly', 'Anomaly'),
+    ]
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    device_id = models.CharField(max_length=100, blank=True, default='')
+    metric = models.CharField(max_length=50, blank=True)
+    value = models.FloatField(null=True, blank=True)
+    score = models.FloatField(null=True, blank=True)
+    message = models.TextField(blank=True)
+    reading_id = models.BigIntegerField(null=True, blank=True)
+    reading_timestamp = models.DateTimeField()
+    acknowledged = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+    class Meta:
+        indexes = [models.Index(fields=['-reading_timestamp'], name='iotalert_timestamp_idx')]
+    def __str__(self):
+        return f"{self.get_kind_display()} @ {self.reading_timestamp}"
+
+
+class IoTRollup(models.Model):
+    """
+    Per-bucket aggregate of one IoTData metric, maintained incrementally at
+    ingest (see geoapp.rollups). avg = total / count.
+    """
+    GRANULARITY_CHOICES = [
+        ('minute', 'Minute'),
+        ('hour', 'Hour'),
+        ('day', 'Day'),
+    ]
+    granularity = models.CharField(max_length=10, choices=GRANULARITY_CHOICES)
+    device_id = models.CharField(max_length=100, blank=True, default='')
+    metric = models.CharField(max_length=50)
+    bucket = models.DateTimeField()
+    count = models.IntegerField(default=0)
+    total = models.FloatField(default=0)
+    min_value = models.FloatField(null=True, blank=True)
+    max_value = models.FloatField(null=True, blank=True)
+    class Meta:
+        # Also the index behind range reads by (granularity, device, metric, bucket).
+        unique_together = ('granularity', 'device_id', 'metric', 'bucket')
+        indexes = [
+            # Range reads merged across devices (rollups.query without a device).
+            models.Index(fields=['granularity', 'metric', 'bucket'], name='iotrollup_metric_bucket_idx'),
+        ]
+    def __str__(self):
+        return f"{self.metric} {self.granularity} @ {self.bucket}"
+
+
 
 class RealTime(models.Model):
     id = models.UUIDField(primary_key=True)
@@ -115,7 +250,7 @@ class RealTime(models.Model):
     def __str__(self):
         return f"{self.source} at {self.timestamp}"
 
-class UserZone(models.Model):
+class UserZone(SimplifiedGeometryModel):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='zones')
     name = models.CharField(max_length=100)
     geometry = models.MultiPolygonField()
@@ -142,5 +277,11 @@ class IndexAnalysis(models.Model):
     created_at = models.DateTimeField(auto_now_add=True, null=True, blank=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        constraints = [
+            # Upsert target of geoapp.analysis.compute.
+            models.UniqueConstraint(fields=['user_zone', 'eo_data'], name='indexanalysis_zone_eo_data_unique'),
+        ]
+
     def __str__(self):
         return f"Analysis for {self.user_zone.name}"
\ No newline at end of file
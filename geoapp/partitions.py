@@ -0,0 +1,170 @@
+"""
+Optional monthly partitioning and retention for ``IoTData`` (PostgreSQL).
+
+The table starts as a plain table with timestamp indexes. ``convert_to_partitioned``
+turns it into a table range-partitioned by month on ``timestamp`` (run it once,
+in a maintenance window, through ``manage.py iot_partitions --convert``). From
+then on ``ensure_partitions`` creates the upcoming months ahead of time, and
+``drop_expired`` enforces ``IOT_RETENTION_DAYS`` by dropping whole partitions
+instead of deleting rows. Rollups (``IoTRollup``) are kept, so long-range
+charts survive raw-data expiry.
+"""
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from .models import IoTData
+
+TABLE = IoTData._meta.db_table
+DELETE_BATCH = 10000
+
+
+def _month_start(day):
+    return date(day.year, day.month, 1)
+
+
+def _next_month(day):
+    return date(day.year + day.month // 12, day.month % 12 + 1, 1)
+
+
+def partition_name(month):
+    return f"{TABLE}_p{month.year:04d}_{month.month:02d}"
+
+
+def is_partitioned():
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_partitioned_table WHERE partrelid = %s::regclass", [TABLE])
+        return cursor.fetchone() is not None
+
+
+def monthly_partitions():
+    """
+    ``(name, month)`` of the existing monthly partitions, oldest first.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = %s::regclass",
+            [TABLE],
+        )
+        names = [row[0] for row in cursor.fetchall()]
+    partitions = []
+    for name in names:
+        suffix = name[len(TABLE) + 2:]  # after "_p"
+        try:
+            partitions.append((name, datetime.strptime(suffix, '%Y_%m').date()))
+        except ValueError:
+            continue  # default partition
+    return sorted(partitions, key=lambda p: p[1])
+
+
+def create_partition(cursor, month):
+    qn = connection.ops.quote_name
+    cursor.execute(
+        f"CREATE TABLE IF NOT EXISTS {qn(partition_name(month))} PARTITION OF {qn(TABLE)} "
+        f"FOR VALUES FROM (%s) TO (%s)",
+        [month.isoformat(), _next_month(month).isoformat()],
+    )
+
+
+def ensure_partitions(months_ahead=None):
+    """
+    Create the partitions of the current month and the next ``months_ahead``.
+    """
+    if months_ahead is None:
+        months_ahead = getattr(settings, 'IOT_PARTITION_MONTHS_AHEAD', 2)
+    month = _month_start(datetime.now(dt_timezone.utc).date())
+    created = []
+    with transaction.atomic(), connection.cursor() as cursor:
+        for _ in range(months_ahead + 1):
+            create_partition(cursor, month)
+            created.append(partition_name(month))
+            month = _next_month(month)
+    return created
+
+
+def convert_to_partitioned():
+    """
+    Rebuild ``IoTData`` as a monthly range-partitioned table, copying existing
+    rows month by month, in a single transaction.
+
+    The primary key becomes ``(id, timestamp)`` as PostgreSQL requires, ids
+    keep coming from a sequence, and out-of-range rows (e.g. late readings for
+    a month with no partition) land in a default partition.
+    """
+    if is_partitioned():
+        return False
+    qn = connection.ops.quote_name
+    legacy = f"{TABLE}_legacy"
+    sequence = f"{TABLE}_id_part_seq"
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f"ALTER TABLE {qn(TABLE)} RENAME TO {qn(legacy)}")
+        # Identity columns cannot be declared on partitioned tables before
+        # PostgreSQL 17, hence the plain sequence.
+        cursor.execute(f"CREATE TABLE {qn(TABLE)} (LIKE {qn(legacy)} INCLUDING DEFAULTS) PARTITION BY RANGE (timestamp)")
+        cursor.execute(f"CREATE SEQUENCE {qn(sequence)} OWNED BY {qn(TABLE)}.id")
+        cursor.execute(f"ALTER TABLE {qn(TABLE)} ALTER COLUMN id SET DEFAULT nextval(%s)", [sequence])
+        cursor.execute(f"ALTER TABLE {qn(TABLE)} ADD PRIMARY KEY (id, timestamp)")
+        cursor.execute(f"CREATE TABLE {qn(TABLE + '_default')} PARTITION OF {qn(TABLE)} DEFAULT")
+
+        cursor.execute(f"SELECT MIN(timestamp), MAX(timestamp), MAX(id) FROM {qn(legacy)}")
+        oldest, newest, max_id = cursor.fetchone()
+        if oldest is not None:
+            month = _month_start(oldest.astimezone(dt_timezone.utc).date())
+            while month <= newest.astimezone(dt_timezone.utc).date():
+                create_partition(cursor, month)
+                cursor.execute(
+                    f"INSERT INTO {qn(TABLE)} SELECT * FROM {qn(legacy)} WHERE timestamp >= %s AND timestamp < %s",
+                    [month.isoformat(), _next_month(month).isoformat()],
+                )
+                month = _next_month(month)
+        if max_id:
+            cursor.execute("SELECT setval(%s, %s)", [sequence, max_id])
+        cursor.execute(f"DROP TABLE {qn(legacy)}")
+
+        # Recreate the model's indexes and constraints on the parent so they
+        # cascade to every partition and keep the names the migrations know
+        # (LIKE only copied the columns and their defaults).
+        schema_editor = connection.schema_editor(atomic=False)
+        statements = [index.create_sql(IoTData, schema_editor) for index in IoTData._meta.indexes]
+        for field in IoTData._meta.local_concrete_fields:
+            if field.remote_field and field.db_constraint:
+                statements.append(schema_editor._create_fk_sql(IoTData, field, '_fk_%(to_table)s_%(to_column)s'))
+            if getattr(field, 'spatial_index', False):
+                statements.append(schema_editor._create_spatial_index_sql(IoTData, field))
+            elif field.db_index and not field.unique:
+                statements.append(schema_editor._create_index_sql(IoTData, fields=[field]))
+        for statement in statements:
+            cursor.execute(str(statement))
+    ensure_partitions()
+    return True
+
+
+def drop_expired(retention_days=None):
+    """
+    Enforce ``IOT_RETENTION_DAYS``: drop monthly partitions that ended before
+    the cutoff or, on an unpartitioned table, delete expired rows in batches.
+    Returns the dropped partition names or the number of deleted rows.
+    """
+    if retention_days is None:
+        retention_days = getattr(settings, 'IOT_RETENTION_DAYS', None)
+    if not retention_days:
+        return []
+    cutoff = datetime.now(dt_timezone.utc) - timedelta(days=retention_days)
+
+    if not is_partitioned():
+        deleted = 0
+        while True:
+            ids = list(IoTData.objects.filter(timestamp__lt=cutoff).values_list('id', flat=True)[:DELETE_BATCH])
+            if not ids:
+                return deleted
+            deleted += IoTData.objects.filter(id__in=ids).delete()[0]
+
+    dropped = []
+    with transaction.atomic(), connection.cursor() as cursor:
+        for name, month in monthly_partitions():
+            if _next_month(month) <= cutoff.date():
+                cursor.execute(f"DROP TABLE {connection.ops.quote_name(name)}")
+                dropped.append(name)
+    return dropped
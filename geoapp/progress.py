@@ -0,0 +1,119 @@
+"""
+Progress reporting for long-running Celery jobs.
+
+Tasks call ``publish_progress`` at each pipeline stage. The latest state is kept
+in the Django cache, which the web workers share with Celery, so the polling
+and SSE endpoints can follow a job without querying the result backend on
+every tick.
+"""
+import time
+
+from celery.result import AsyncResult
+from celery.signals import task_postrun
+from django.core.cache import cache
+
+PROGRESS_TIMEOUT = 60 * 60  # seconds a finished job's progress stays readable
+TERMINAL_STATES = ('SUCCESS', 'FAILURE', 'REVOKED')
+
+
+def progress_cache_key(task_id):
+    return f"task_progress_{task_id}"
+
+
+def set_progress(task_id, state, stage=None, percent=0, **extra):
+    """
+    Store the current progress of ``task_id`` and return the stored payload.
+
+    ``seq`` increases on every update, so stream consumers can tell a new event
+    from one they have already sent.
+    """
+    key = progress_cache_key(task_id)
+    previous = cache.get(key) or {}
+    payload = {
+        'task_id': task_id,
+        'state': state,
+        'stage': stage,
+        'percent': max(0, min(100, int(percent))),
+        'seq': previous.get('seq', 0) + 1,
+        'updated_at': time.time(),
+    }
+    payload.update(extra)
+    cache.set(key, payload, PROGRESS_TIMEOUT)
+    return payload
+
+
+def mark_queued(task_id):
+    """
+    Record a freshly submitted task, unless its worker already reported in.
+    """
+    cache.add(progress_cache_key(task_id), {
+        'task_id': task_id,
+        'state': 'PENDING',
+        'stage': 'queued',
+        'percent': 0,
+        'seq': 1,
+        'updated_at': time.time(),
+    }, PROGRESS_TIMEOUT)
+
+
+def publish_progress(task, stage, percent, **extra):
+    """
+    Publish a stage/percentage update from inside a bound Celery task.
+
+    The payload is also mirrored into the result backend as a ``PROGRESS``
+    state. Calls made outside a worker (``task.request.id`` unset) are ignored.
+    """
+    task_id = task.request.id
+    if not task_id:
+        return None
+    payload = set_progress(task_id, 'PROGRESS', stage, percent, **extra)
+    task.update_state(state='PROGRESS', meta=payload)
+    return payload
+
+
+def get_progress(task_id, check_backend=True):
+    """
+    Return the latest progress payload for ``task_id``.
+
+    When ``check_backend`` is set, the Celery result backend is consulted for
+    jobs whose cached state is not terminal yet (e.g. a worker that died before
+    publishing its final state).
+    """
+    payload = cache.get(progress_cache_key(task_id))
+    if not check_backend:
+        return payload
+    if payload is not None and payload['state'] in TERMINAL_STATES:
+        return payload
+
+    result = AsyncResult(task_id)
+    if result.state in TERMINAL_STATES:
+        return _terminal_payload(task_id, result.state, result.result, payload)
+    if payload is None:
+        return {
+            'task_id': task_id,
+            'state': result.state,
+            'stage': None,
+            'percent': 0,
+            'seq': 0,
+            'updated_at': None,
+        }
+    return payload
+
+
+def _terminal_payload(task_id, state, retval, previous=None):
+    extra = {}
+    if state == 'SUCCESS':
+        extra['result'] = retval if isinstance(retval, (dict, list, str, int, float, bool)) else str(retval)
+    elif retval is not None:
+        extra['error'] = str(retval)
+    stage = previous.get('stage') if previous else None
+    percent = 100 if state == 'SUCCESS' else (previous or {}).get('percent', 0)
+    return set_progress(task_id, state, stage, percent, **extra)
+
+
+@task_postrun.connect
+def _record_final_state(sender=None, task_id=None, retval=None, state=None, **kwargs):
+    # Every task gets a terminal progress event, including ones that never
+    # call publish_progress themselves.
+    if task_id and state in TERMINAL_STATES:
+        _terminal_payload(task_id, state, retval, cache.get(progress_cache_key(task_id)))
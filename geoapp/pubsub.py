@@ -0,0 +1,199 @@
+"""
+Publish/subscribe layer used to push live IoT readings to connected clients.
+
+Publishers (ingest code, possibly running in worker threads or Celery) call
+``get_broker().publish(channel, message)``; ASGI consumers ``subscribe`` from
+their event loop. Configured with the ``IOT_PUBSUB`` setting::
+
+    IOT_PUBSUB = {
+        'BACKEND': 'memory',   # or 'redis' to fan out across processes
+        'URL': 'redis://localhost:6379/1',
+        'QUEUE_SIZE': 100,     # pending messages kept per connection
+    }
+
+Every subscription has its own bounded queue. A slow client loses its oldest
+messages (counted in ``dropped``) and never slows down publishers or the
+other clients.
+"""
+import asyncio
+import json
+import logging
+import threading
+from collections import deque
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+IOT_CHANNEL = 'iot.readings'
+DEFAULTS = {
+    'BACKEND': 'memory',
+    'URL': 'redis://localhost:6379/1',
+    'QUEUE_SIZE': 100,
+}
+
+
+class Subscription:
+    """
+    Bounded per-connection queue, bound to the event loop that created it.
+    """
+
+    def __init__(self, broker, channel, maxsize):
+        self.broker = broker
+        self.channel = channel
+        self.loop = asyncio.get_running_loop()
+        self.dropped = 0
+        self._queue = deque(maxlen=maxsize)
+        self._ready = asyncio.Event()
+
+    def put(self, message):
+        # Runs on self.loop (see InProcessBroker.publish).
+        if len(self._queue) == self._queue.maxlen:
+            self.dropped += 1
+        self._queue.append(message)
+        self._ready.set()
+
+    async def next_batch(self, timeout=None):
+        """
+        Wait for messages and return all pending ones at once (coalesced), or
+        an empty list after ``timeout`` seconds.
+        """
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            return []
+        self._ready.clear()
+        batch = list(self._queue)
+        self._queue.clear()
+        return batch
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class InProcessBroker:
+    """
+    Fans messages out to the subscriptions of this process.
+    """
+
+    def __init__(self, options):
+        self.queue_size = options['QUEUE_SIZE']
+        self._subscriptions = set()
+        self._lock = threading.Lock()
+
+    def subscribe(self, channel):
+        subscription = Subscription(self, channel, self.queue_size)
+        with self._lock:
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def publish(self, channel, message):
+        self._deliver(channel, message)
+
+    def _deliver(self, channel, message):
+        with self._lock:
+            targets = [s for s in self._subscriptions if s.channel == channel]
+        for subscription in targets:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.put, message)
+            except RuntimeError:
+                # Loop already closed: the connection is gone.
+                self.unsubscribe(subscription)
+
+
+class RedisBroker(InProcessBroker):
+    """
+    Publishes through Redis so every web process receives every message; each
+    process runs one Redis listener that feeds its local subscriptions.
+    """
+
+    prefix = 'geoapp:'
+
+    def __init__(self, options):
+        super().__init__(options)
+        import redis
+        self.url = options['URL']
+        self._client = redis.Redis.from_url(self.url)
+        self._listeners = {}
+
+    def publish(self, channel, message):
+        self._client.publish(self.prefix + channel, json.dumps(message, default=str))
+
+    def subscribe(self, channel):
+        subscription = super().subscribe(channel)
+        loop = subscription.loop
+        if loop not in self._listeners or self._listeners[loop].done():
+            self._listeners[loop] = loop.create_task(self._listen())
+        return subscription
+
+    async def _listen(self):
+        import redis.asyncio as aioredis
+        client = aioredis.Redis.from_url(self.url)
+        pubsub = client.pubsub()
+        await pubsub.psubscribe(self.prefix + '*')
+        try:
+            async for item in pubsub.listen():
+                if item['type'] != 'pmessage':
+                    continue
+                channel = item['channel'].decode()[len(self.prefix):]
+                self._deliver(channel, json.loads(item['data']))
+        except Exception:
+            logger.exception("Redis pub/sub listener stopped")
+        finally:
+            await pubsub.close()
+            await client.close()
+
+
+BACKENDS = {
+    'memory': InProcessBroker,
+    'redis': RedisBroker,
+}
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                options = {**DEFAULTS, **getattr(settings, 'IOT_PUBSUB', {})}
+                _broker = BACKENDS[options['BACKEND']](options)
+    return _broker
+
+
+def publish_readings(readings, alerts=(), limit=500):
+    """
+    Publish an ingest batch of IoTData rows, and the alerts it raised, as one
+    message. Very large batches only carry their latest ``limit`` readings,
+    plus the total count.
+    """
+    from .ingest import IOT_FIELDS
+
+    latest = sorted(readings, key=lambda r: r.timestamp)[-limit:]
+    message = {
+        'type': 'readings',
+        'count': len(readings),
+        'readings': [
+            {
+                'id': r.pk, 'device_id': r.device_id, 'region': r.region_id, 'timestamp': r.timestamp.isoformat(),
+                'location': [r.location.x, r.location.y] if r.location else None,
+                **{f: getattr(r, f) for f in IOT_FIELDS},
+            }
+            for r in latest
+        ],
+        'alerts': [
+            {'id': a.pk, 'kind': a.kind, 'device_id': a.device_id, 'metric': a.metric, 'value': a.value, 'message': a.message,
+             'reading_timestamp': a.reading_timestamp.isoformat()}
+            for a in alerts
+        ],
+    }
+    try:
+        get_broker().publish(IOT_CHANNEL, message)
+    except Exception:
+        # Live push is best effort; never fail an ingest because of it.
+        logger.exception("Could not publish %d IoT readings", len(readings))
@@ -0,0 +1,153 @@
+"""
+Precomputed real-time index payloads.
+
+``RealTimeIndexDataView`` reads ``realtime_data_{region_id}`` (or
+``realtime_data_global``) from the cache. The entries are written here, kept
+without expiry and refreshed in the background once they are older than the
+region's ``RealTime.update_interval``: readers always get the cached payload,
+stale or not, while a single refresh is queued (stale-while-revalidate).
+"""
+import logging
+import time
+
+from django.core.cache import cache
+from django.utils import timezone
+
+from .models import EOData, RealTime, Region
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_UPDATE_INTERVAL = 300  # seconds, for regions without a RealTime source
+REFRESH_LOCK_TIMEOUT = 120  # seconds a queued refresh blocks further ones
+
+
+def realtime_cache_key(region_id=None):
+    return f"realtime_data_{region_id}" if region_id else "realtime_data_global"
+
+
+def _refresh_lock_key(region_id=None):
+    return f"{realtime_cache_key(region_id)}_refreshing"
+
+
+def _scheduled_key(source_id):
+    return f"realtime_source_{source_id}_scheduled"
+
+
+def update_interval_for(region_id=None):
+    """
+    Shortest ``update_interval`` (seconds) of the sources feeding a region.
+    """
+    sources = RealTime.objects.filter(update_interval__isnull=False)
+    if region_id:
+        sources = sources.filter(region_id=region_id)
+    intervals = [i for i in sources.values_list('update_interval', flat=True) if i > 0]
+    return min(intervals) if intervals else DEFAULT_UPDATE_INTERVAL
+
+
+def build_payload(region_id=None):
+    """
+    Latest index statistics and source status for a region, or for every
+    region when ``region_id`` is None. Returns None for an unknown region.
+    """
+    eo_data = EOData.objects.filter(region__isnull=False)
+    sources = RealTime.objects.all()
+    if region_id:
+        if not Region.objects.filter(pk=region_id).exists():
+            return None
+        eo_data = eo_data.filter(region_id=region_id)
+        sources = sources.filter(region_id=region_id)
+
+    # One row per (region, index type): the most recent acquisition.
+    latest = (
+        eo_data.exclude(index_type__isnull=True)
+        .order_by('region_id', 'index_type', '-acquisition_date')
+        .distinct('region_id', 'index_type')
+        .values('region_id', 'index_type', 'mean_value', 'min_value', 'max_value', 'acquisition_date')
+    )
+    indices = [
+        {
+            'region': row['region_id'],
+            'index_type': row['index_type'],
+            'mean_value': row['mean_value'],
+            'min_value': row['min_value'],
+            'max_value': row['max_value'],
+            'acquisition_date': row['acquisition_date'].isoformat() if row['acquisition_date'] else None,
+        }
+        for row in latest
+    ]
+    return {
+        'region': int(region_id) if region_id else None,
+        'indices': indices,
+        'sources': [
+            {
+                'source': source['source'],
+                'region': source['region_id'],
+                'last_update': source['last_update'].isoformat() if source['last_update'] else None,
+                'update_interval': source['update_interval'],
+            }
+            for source in sources.values('source', 'region_id', 'last_update', 'update_interval')
+        ],
+    }
+
+
+def refresh_region(region_id=None):
+    """
+    Recompute and cache the payload of a region. Returns the cached entry.
+    """
+    payload = build_payload(region_id)
+    cache.delete(_refresh_lock_key(region_id))
+    if payload is None:
+        return None
+    now = time.time()
+    entry = {
+        'data': payload,
+        'refreshed_at': now,
+        'stale_at': now + update_interval_for(region_id),
+    }
+    cache.set(realtime_cache_key(region_id), entry, None)
+    return entry
+
+
+def get_region_data(region_id=None):
+    """
+    Return the cached payload of a region, queueing a background refresh when
+    it is stale. Only the very first read of a region computes synchronously.
+    """
+    entry = cache.get(realtime_cache_key(region_id))
+    if entry is None:
+        entry = refresh_region(region_id)
+        return entry['data'] if entry else None
+    if entry['stale_at'] <= time.time() and cache.add(_refresh_lock_key(region_id), True, REFRESH_LOCK_TIMEOUT):
+        from .tasks import refresh_realtime_region
+        try:
+            refresh_realtime_region.delay(region_id)
+        except Exception:
+            # Serve the stale payload; the next read tries again.
+            cache.delete(_refresh_lock_key(region_id))
+            logger.exception("Could not queue the real-time refresh of region %s", region_id)
+    return entry['data']
+
+
+def due_sources(now=None):
+    """
+    RealTime sources whose ``last_update + update_interval`` has passed and
+    that were not already scheduled within their interval.
+    """
+    now = now or timezone.now()
+    sources = list(RealTime.objects.filter(update_interval__gt=0).only('id', 'region_id', 'update_interval', 'last_update'))
+    scheduled = cache.get_many([_scheduled_key(source.pk) for source in sources])
+    return [
+        source for source in sources
+        if (source.last_update is None or (now - source.last_update).total_seconds() >= source.update_interval)
+        and _scheduled_key(source.pk) not in scheduled
+    ]
+
+
+def mark_scheduled(sources, now=None):
+    """
+    Record that ``sources`` were scheduled, for one ``update_interval`` each.
+    ``last_update`` stays the time of the source's last data update.
+    """
+    now = now or timezone.now()
+    for source in sources:
+        cache.set(_scheduled_key(source.pk), now.timestamp(), source.update_interval)
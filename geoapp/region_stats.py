@@ -0,0 +1,138 @@
+"""
+Materialized per-region statistics.
+
+``RegionStatistics`` holds, per region, the point counts by category, the
+latest mean of each spectral index and the deforested area, so the
+statistics endpoint is a single primary-key read. Saves and deletes of
+points, EO data, cartographical features and regions queue a refresh of the
+affected region (``schedule_refresh``, coalesced per region); a nightly task
+refreshes every region to catch bulk ``update()`` calls, which send no signal.
+"""
+import logging
+
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Count, F
+
+from .models import Cartographical, EOData, Point, Region, RegionStatistics
+from .tiles import LAYERS
+
+logger = logging.getLogger(__name__)
+
+UNCATEGORIZED = 'Non catégorisé'
+REFRESH_LOCK_TIMEOUT = 300  # seconds a queued refresh absorbs further changes
+
+
+def _refresh_key(region_id):
+    return f"region_statistics_refresh_{region_id}"
+
+
+def category_counts(region_id):
+    """
+    Points of a region by category, in one grouped aggregate. Points without
+    a category are counted under ``UNCATEGORIZED``.
+    """
+    rows = Point.objects.filter(region_id=region_id).values_list('category').annotate(count=Count('id')).order_by()
+    counts = {}
+    for category, count in rows:
+        category = category or UNCATEGORIZED
+        counts[category] = counts.get(category, 0) + count
+    return counts
+
+
+def latest_index_means(region_id):
+    """
+    Mean value and date of the most recent acquisition of each index type.
+    """
+    latest = (
+        EOData.objects.filter(region_id=region_id, index_type__isnull=False)
+        .order_by('index_type', F('acquisition_date').desc(nulls_last=True))
+        .distinct('index_type')
+        .values_list('index_type', 'mean_value', 'acquisition_date')
+    )
+    return {
+        index_type: {'mean_value': mean, 'acquisition_date': date.isoformat() if date else None}
+        for index_type, mean, date in latest
+    }
+
+
+def deforested_area(region_id):
+    """
+    Area in hectares of the region covered by its mapped (cartographical)
+    polygons, overlaps counted once.
+    """
+    layer = LAYERS['cartographicals']
+    qn = connection.ops.quote_name
+    sql = f"""
+        SELECT ST_Area(ST_Union(ST_Intersection(ST_MakeValid(features.geom), r.{qn('geometry')}))::geography) / 10000
+        FROM (
+            SELECT t.{qn('region_id')} AS region_id, t.{qn(layer['geometry'])} AS geom
+            FROM {qn(Cartographical._meta.db_table)} t
+            WHERE t.{qn('region_id')} = %s AND t.{qn(layer['geometry'])} IS NOT NULL
+        ) AS features
+        JOIN {qn(Region._meta.db_table)} r ON r.{qn('id')} = features.region_id
+        WHERE ST_Dimension(features.geom) = 2
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [region_id])
+        row = cursor.fetchone()
+    return row[0] or 0.0
+
+
+def refresh(region_id):
+    """
+    Recompute and store the statistics of one region. Returns the row, or
+    None when the region no longer exists.
+    """
+    cache.delete(_refresh_key(region_id))
+    if not Region.objects.filter(pk=region_id).exists():
+        RegionStatistics.objects.filter(region_id=region_id).delete()
+        return None
+    counts = category_counts(region_id)
+    statistics, _ = RegionStatistics.objects.update_or_create(region_id=region_id, defaults={
+        'total_points': sum(counts.values()),
+        'points_by_category': counts,
+        'index_means': latest_index_means(region_id),
+        'deforested_area': deforested_area(region_id),
+    })
+    return statistics
+
+
+def refresh_all():
+    region_ids = list(Region.objects.values_list('pk', flat=True))
+    for region_id in region_ids:
+        refresh(region_id)
+    RegionStatistics.objects.exclude(region_id__in=region_ids).delete()
+    return len(region_ids)
+
+
+def schedule_refresh(region_id):
+    """
+    Queue a refresh of ``region_id`` once the current transaction commits;
+    changes committed while one is already queued are folded into it.
+    """
+    if region_id is not None:
+        transaction.on_commit(lambda: _enqueue_refresh(region_id))
+
+
+def _enqueue_refresh(region_id):
+    # Taken after the commit, so a rolled-back change holds no key.
+    key = _refresh_key(region_id)
+    if not cache.add(key, True, REFRESH_LOCK_TIMEOUT):
+        return
+    from .tasks import refresh_region_statistics
+    try:
+        refresh_region_statistics.delay(region_id)
+    except Exception:
+        # The write has committed; the nightly refresh catches up.
+        cache.delete(key)
+        logger.exception("Could not queue the statistics refresh of region %s", region_id)
+
+
+def get_statistics(region_id):
+    """
+    Stored statistics of a region with the region itself (one query),
+    computed on the spot the first time. Returns None for an unknown region.
+    """
+    statistics = RegionStatistics.objects.select_related('region').filter(region_id=region_id).first()
+    return statistics or refresh(region_id)
@@ -0,0 +1,176 @@
+"""
+Time-bucketed rollups of IoT readings.
+
+Every ingested reading is folded into ``IoTRollup`` rows at minute, hour and
+day granularity (count, sum, min and max per device and metric), so charts
+over long ranges read one row per bucket instead of every raw reading.
+"""
+from datetime import timedelta, timezone as dt_timezone
+
+from django.db import connection, transaction
+from django.db.models import Count, Max, Min, Sum
+from django.db.models.functions import Trunc
+
+from .ingest import IOT_FIELDS
+from .models import IoTData, IoTRollup
+
+# Finest first, with the bucket length in seconds.
+GRANULARITIES = (
+    ('minute', 60),
+    ('hour', 3600),
+    ('day', 86400),
+)
+DEFAULT_MAX_POINTS = 1000
+
+
+def bucket_start(timestamp, granularity):
+    """
+    Start of the UTC bucket containing ``timestamp``.
+    """
+    timestamp = timestamp.astimezone(dt_timezone.utc)
+    if granularity == 'minute':
+        return timestamp.replace(second=0, microsecond=0)
+    if granularity == 'hour':
+        return timestamp.replace(minute=0, second=0, microsecond=0)
+    return timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def aggregate_readings(readings):
+    """
+    Fold IoTData instances into
+    ``{(granularity, device_id, metric, bucket): [count, total, min, max]}``.
+    """
+    aggregates = {}
+    for reading in readings:
+        buckets = [(name, bucket_start(reading.timestamp, name)) for name, _ in GRANULARITIES]
+        for metric in IOT_FIELDS:
+            value = getattr(reading, metric)
+            if value is None:
+                continue
+            for name, bucket in buckets:
+                key = (name, reading.device_id, metric, bucket)
+                entry = aggregates.get(key)
+                if entry is None:
+                    aggregates[key] = [1, value, value, value]
+                else:
+                    entry[0] += 1
+                    entry[1] += value
+                    entry[2] = min(entry[2], value)
+                    entry[3] = max(entry[3], value)
+    return aggregates
+
+
+def apply_readings(readings):
+    """
+    Add freshly inserted readings to their rollup buckets.
+
+    One upsert per touched bucket, merged in the database so concurrent
+    ingests add up instead of overwriting each other. Keys are applied in a
+    fixed order to keep lock acquisition consistent between transactions.
+    """
+    aggregates = aggregate_readings(readings)
+    if not aggregates:
+        return 0
+    table = connection.ops.quote_name(IoTRollup._meta.db_table)
+    sql = f"""
+        INSERT INTO {table} (granularity, device_id, metric, bucket, count, total, min_value, max_value)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+        ON CONFLICT (granularity, device_id, metric, bucket) DO UPDATE SET
+            count = {table}.count + EXCLUDED.count,
+            total = {table}.total + EXCLUDED.total,
+            min_value = LEAST({table}.min_value, EXCLUDED.min_value),
+            max_value = GREATEST({table}.max_value, EXCLUDED.max_value)
+    """
+    params = [(*key, *values) for key, values in sorted(aggregates.items())]
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.executemany(sql, params)
+    return len(params)
+
+
+def rebuild(start=None, end=None):
+    """
+    Recompute the rollups of whole days between ``start`` and ``end`` from the
+    raw readings (e.g. after deletes, or to backfill existing data).
+    """
+    readings = IoTData.objects.all()
+    rollups = IoTRollup.objects.all()
+    if start is not None:
+        start = bucket_start(start, 'day')
+        readings = readings.filter(timestamp__gte=start)
+        rollups = rollups.filter(bucket__gte=start)
+    if end is not None:
+        end = bucket_start(end, 'day') + timedelta(days=1)
+        readings = readings.filter(timestamp__lt=end)
+        rollups = rollups.filter(bucket__lt=end)
+
+    created = 0
+    with transaction.atomic():
+        rollups.delete()
+        for name, _ in GRANULARITIES:
+            for metric in IOT_FIELDS:
+                rows = (
+                    readings.filter(**{f'{metric}__isnull': False})
+                    .annotate(period=Trunc('timestamp', name, tzinfo=dt_timezone.utc))
+                    .values('device_id', 'period')
+                    .annotate(count=Count(metric), total=Sum(metric), low=Min(metric), high=Max(metric))
+                    .order_by()
+                )
+                objs = [
+                    IoTRollup(
+                        granularity=name, device_id=row['device_id'], metric=metric, bucket=row['period'], count=row['count'],
+                        total=row['total'], min_value=row['low'], max_value=row['high'],
+                    )
+                    for row in rows.iterator()
+                ]
+                IoTRollup.objects.bulk_create(objs, batch_size=1000)
+                created += len(objs)
+    return created
+
+
+def choose_granularity(start, end, max_points=DEFAULT_MAX_POINTS):
+    """
+    Finest granularity whose bucket count over [start, end) stays within
+    ``max_points``; falls back to days.
+    """
+    span = (end - start).total_seconds()
+    for name, seconds in GRANULARITIES:
+        if span / seconds <= max_points:
+            return name
+    return GRANULARITIES[-1][0]
+
+
+def query(metric, start, end, max_points=DEFAULT_MAX_POINTS, granularity=None, device_id=None):
+    """
+    Downsampled series of ``metric`` over [start, end), for one device or,
+    when ``device_id`` is None, merged across all devices.
+
+    Returns ``(granularity, buckets)``, with one dict per non-empty bucket.
+    """
+    if metric not in IOT_FIELDS:
+        raise ValueError(f"Unknown metric '{metric}'")
+    granularity = granularity or choose_granularity(start, end, max_points)
+    rows = IoTRollup.objects.filter(
+        granularity=granularity, metric=metric, bucket__gte=bucket_start(start, granularity), bucket__lt=end,
+    )
+    if device_id is not None:
+        rows = rows.filter(device_id=device_id).order_by('bucket').values_list(
+            'bucket', 'count', 'total', 'min_value', 'max_value',
+        )
+    else:
+        rows = (
+            rows.values('bucket')
+            .annotate(n=Sum('count'), sum=Sum('total'), low=Min('min_value'), high=Max('max_value'))
+            .order_by('bucket')
+            .values_list('bucket', 'n', 'sum', 'low', 'high')
+        )
+    buckets = [
+        {
+            'bucket': bucket,
+            'count': count,
+            'min': low,
+            'max': high,
+            'avg': total / count if count else None,
+        }
+        for bucket, count, total, low, high in rows
+    ]
+    return granularity, buckets
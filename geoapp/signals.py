@@ -0,0 +1,111 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .anomaly import detect, lock_keys as detector_lock_keys
+from .analysis import schedule_for_raster, schedule_for_zone
+from .locks import cache_locks
+from .models import Cartographical, EOData, IoTAlert, IoTData, Point, Region, UserZone
+from .region_stats import schedule_refresh
+from .tiles import LAYER_MODELS, bump_version
+from .pubsub import publish_readings
+from .rollups import apply_readings
+
+
+@receiver(post_save, sender=IoTData)
+def on_reading_created(sender, instance, created, **kwargs):
+    # Bulk ingestion does all this itself; this covers one-off saves
+    # (API create, admin). Edits of existing readings need rollups.rebuild().
+    if created and not kwargs.get('raw'):
+        apply_readings([instance])
+        # Outside an atomic block the detector state is published right away,
+        # while the lock is held.
+        with cache_locks(detector_lock_keys([instance])):
+            alerts = IoTAlert.objects.bulk_create(detect([instance]))
+        transaction.on_commit(lambda: publish_readings([instance], alerts))
+
+
+def on_layer_changed(sender, **kwargs):
+    # Cached vector tiles are keyed by layer version; see geoapp.tiles.
+    bump_version(LAYER_MODELS[sender])
+
+
+for model in LAYER_MODELS:
+    post_save.connect(on_layer_changed, sender=model, dispatch_uid=f'mvt_{model.__name__}_saved')
+    post_delete.connect(on_layer_changed, sender=model, dispatch_uid=f'mvt_{model.__name__}_deleted')
+
+
+STATISTICS_SOURCES = (Point, EOData, Cartographical)
+
+
+def on_statistics_source_moving(sender, instance, raw=False, **kwargs):
+    # A row moved to another region leaves stale statistics behind in the old one.
+    if not raw and instance.pk is not None and not instance._state.adding:
+        previous = sender.objects.filter(pk=instance.pk).values_list('region_id', flat=True).first()
+        if previous != instance.region_id:
+            schedule_refresh(previous)
+
+
+def on_statistics_source_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        schedule_refresh(instance.pk if sender is Region else instance.region_id)
+
+
+for model in STATISTICS_SOURCES:
+    pre_save.connect(on_statistics_source_moving, sender=model, dispatch_uid=f'stats_{model.__name__}_moving')
+for model in (*STATISTICS_SOURCES, Region):
+    post_save.connect(on_statistics_source_changed, sender=model, dispatch_uid=f'stats_{model.__name__}_saved')
+    post_delete.connect(on_statistics_source_changed, sender=model, dispatch_uid=f'stats_{model.__name__}_deleted')
+
+
+RASTER_FIELDS = ('raster_file', 'satellite_image_id', 'region_id')
+
+
+@receiver(pre_save, sender=EOData)
+def on_eo_data_saving(sender, instance, raw=False, **kwargs):
+    # Only a new raster or a moved footprint needs its analyses recomputed,
+    # not edits of the summary values.
+    previous = None if raw or instance._state.adding else (
+        sender.objects.filter(pk=instance.pk).values_list(*RASTER_FIELDS, 'index_type').first()
+    )
+    current = (instance.raster_file.name or '', instance.satellite_image_id, instance.region_id)
+    instance._raster_changed = previous is None or (previous[0] or '', *previous[1:3]) != current
+    # The pixel time-series cube it leaves, when it moves to another one.
+    instance._previous_cube = (
+        previous[2:] if previous is not None and previous[2:] != (instance.region_id, instance.index_type) else None
+    )
+
+
+@receiver(post_save, sender=EOData)
+def on_eo_data_saved(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    previous_cube = getattr(instance, '_previous_cube', None)
+    if previous_cube is not None and all(previous_cube):
+        from .tasks import remove_eo_datacube_step
+        transaction.on_commit(lambda: remove_eo_datacube_step.delay(str(instance.pk), *previous_cube))
+    raster_changed = getattr(instance, '_raster_changed', True)
+    if not instance.raster_file or not (raster_changed or previous_cube):
+        return
+    # Zones overlapping the raster get their analyses (re)computed.
+    if raster_changed:
+        schedule_for_raster(instance.pk)
+    # New and replaced rasters are written to the pixel time-series cube
+    # (geoapp.datacube).
+    if instance.region_id and instance.index_type and instance.acquisition_date:
+        from .tasks import append_eo_datacube
+        transaction.on_commit(lambda: append_eo_datacube.delay(str(instance.pk)))
+
+
+@receiver(pre_save, sender=UserZone)
+def on_zone_saving(sender, instance, raw=False, **kwargs):
+    # Only new zones and changed outlines need their analyses recomputed.
+    instance._geometry_changed = raw or instance._state.adding or not sender.objects.filter(
+        pk=instance.pk, geometry__equals=instance.geometry,
+    ).exists()
+
+
+@receiver(post_save, sender=UserZone)
+def on_zone_saved(sender, instance, raw=False, **kwargs):
+    if not raw and getattr(instance, '_geometry_changed', True):
+        schedule_for_zone(instance)
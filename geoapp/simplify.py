@@ -0,0 +1,81 @@
+"""
+Precomputed simplified geometries for map views.
+
+``Region`` and ``UserZone`` keep, next to the full-resolution ``geometry``,
+one topology-preserving simplification per level in ``LEVELS`` (columns
+``geometry_<level>``). They are computed on save and backfilled in SQL by
+``refresh``. The API serves a level from a web-map ``zoom`` or a
+``tolerance`` in degrees (see ``level_for``).
+"""
+from django.contrib.gis.db.models import MultiPolygonField
+from django.contrib.gis.geos import MultiPolygon, Polygon
+from django.db.models import F, Func, Value
+
+# (name, tolerance in degrees, highest web-map zoom it is served at). At zoom
+# z one 256 px tile pixel spans about 360 / (256 * 2**z) degrees, so each
+# tolerance stays below a pixel up to its zoom.
+LEVELS = (
+    ('low', 0.05, 5),
+    ('medium', 0.005, 9),
+    ('high', 0.0005, 13),
+)
+SIMPLIFIED_FIELDS = tuple(f'geometry_{name}' for name, _, _ in LEVELS)
+
+
+def simplify(geometry, tolerance):
+    """
+    Topology-preserving simplification of a (multi)polygon, always returned
+    as a MultiPolygon so it fits the ``geometry_<level>`` columns.
+    """
+    simplified = geometry.simplify(tolerance, preserve_topology=True)
+    if isinstance(simplified, Polygon):
+        simplified = MultiPolygon(simplified)
+    simplified.srid = geometry.srid
+    return simplified
+
+
+def simplify_levels(instance):
+    """
+    Set every ``geometry_<level>`` of a model instance from its ``geometry``.
+    """
+    for name, tolerance, _ in LEVELS:
+        value = simplify(instance.geometry, tolerance) if instance.geometry else None
+        setattr(instance, f'geometry_{name}', value)
+
+
+def level_for(zoom=None, tolerance=None):
+    """
+    Level to serve for a ``zoom`` or a ``tolerance`` (the coarsest level no
+    coarser than it), or None for the full geometry. Raises ValueError on
+    malformed values.
+    """
+    if zoom not in (None, ''):
+        zoom = float(zoom)
+        for name, _, max_zoom in LEVELS:
+            if zoom <= max_zoom:
+                return name
+        return None
+    if tolerance not in (None, ''):
+        tolerance = float(tolerance)
+        for name, level_tolerance, _ in LEVELS:
+            if level_tolerance <= tolerance:
+                return name
+    return None
+
+
+def simplified_expression(tolerance, field='geometry'):
+    return Func(
+        Func(F(field), Value(tolerance), function='ST_SimplifyPreserveTopology'),
+        function='ST_Multi',
+        output_field=MultiPolygonField(),
+    )
+
+
+def refresh(queryset):
+    """
+    Recompute the simplified levels of a queryset in the database, e.g.
+    after ``update()`` or ``bulk_create`` which bypass ``save``.
+    """
+    return queryset.update(**{
+        f'geometry_{name}': simplified_expression(tolerance) for name, tolerance, _ in LEVELS
+    })
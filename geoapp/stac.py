@@ -0,0 +1,90 @@
+"""
+``SatelliteImage`` rows from STAC items.
+
+A STAC item carries everything needed to place a scene without opening
+it: ``bbox`` is the extent of the tile (stored as ``footprint``) and
+``geometry`` the outline of the pixels holding data (``valid_data``; for
+Sentinel-2 tiles at the edge of a swath it can be a small part of the tile).
+Both are stored with a spatial index, so "which scenes cover this zone /
+point" is one indexed query (see ``api.filters.SceneFilter``).
+"""
+import json
+
+from django.contrib.gis.db.models.functions import Area, Intersection
+from django.contrib.gis.geos import GEOSGeometry, MultiPolygon, Polygon
+from django.utils.dateparse import parse_datetime
+
+from .models import Region, SatelliteImage
+
+
+def _multipolygon(geometry):
+    if isinstance(geometry, Polygon):
+        geometry = MultiPolygon(geometry, srid=geometry.srid)
+    return geometry
+
+
+def item_geometries(item):
+    """
+    ``(footprint, valid_data)`` of a STAC item (pystac Item or dict), as
+    WGS84 MultiPolygons; either may be None.
+    """
+    item = item.to_dict() if hasattr(item, 'to_dict') else item
+    footprint = valid_data = None
+    bbox = item.get('bbox')
+    if bbox:
+        # 3D bboxes are (west, south, min z, east, north, max z).
+        west, south, east, north = (bbox[0], bbox[1], bbox[3], bbox[4]) if len(bbox) == 6 else bbox
+        footprint = _multipolygon(Polygon.from_bbox((west, south, east, north)))
+        footprint.srid = 4326
+    if item.get('geometry'):
+        valid_data = GEOSGeometry(json.dumps(item['geometry']), srid=4326)
+        if valid_data.geom_type not in ('Polygon', 'MultiPolygon'):
+            valid_data = None
+        else:
+            valid_data = _multipolygon(valid_data)
+    if footprint is None and valid_data is not None:
+        footprint = _multipolygon(valid_data.envelope)
+        footprint.srid = 4326
+    return footprint, valid_data
+
+
+def ingest_item(item, satellite, region=None):
+    """
+    Create or update the ``SatelliteImage`` of a STAC item. Without a
+    ``region``, the scene is attached to the region its data overlaps most.
+    Returns the image, or None when no region overlaps it.
+    """
+    item = item.to_dict() if hasattr(item, 'to_dict') else item
+    properties = item.get('properties', {})
+    footprint, valid_data = item_geometries(item)
+    if region is None:
+        coverage = valid_data if valid_data is not None else footprint
+        region = (
+            Region.objects.filter(geometry__intersects=coverage)
+            .annotate(overlap=Area(Intersection('geometry', coverage)))
+            .order_by('-overlap')
+            .first()
+        ) if coverage is not None else None
+        if region is None:
+            return None
+    acquired = parse_datetime(properties.get('datetime') or properties.get('start_datetime') or '')
+    image, _ = SatelliteImage.objects.update_or_create(
+        satellite=satellite, image_id=item['id'],
+        defaults={
+            'region': region,
+            'acquisition_date': acquired.date() if acquired else None,
+            'date_captured': acquired.date() if acquired else None,
+            'cloud_cover': properties.get('eo:cloud_cover'),
+            'footprint': footprint,
+            'valid_data': valid_data,
+        },
+    )
+    return image
+
+
+def ingest_items(items, satellite, region=None):
+    """
+    ``ingest_item`` for each item; returns the images created or updated.
+    """
+    images = (ingest_item(item, satellite, region) for item in items)
+    return [image for image in images if image is not None]
@@ -1,10 +1,17 @@
 from celery import shared_task
 import logging
 
+from django.core.cache import cache
+from django.utils import timezone
+
+from .ingest_buffer import CacheBuffer, get_write_behind_buffer
+from .progress import publish_progress
+from .realtime import due_sources, mark_scheduled, refresh_region
+
 logger = logging.getLogger(__name__)
 
-@shared_task(name='geoapp.tasks.fetch_satellite_images')
-def fetch_satellite_images(region_id=None, days=7, cloud_cover_max=30):
+@shared_task(bind=True, name='geoapp.tasks.fetch_satellite_images')
+def fetch_satellite_images(self, region_id=None, days=7, cloud_cover_max=30):
     """
     Task to fetch satellite images from external sources and process them.
 
@@ -15,13 +22,21 @@ def fetch_satellite_images(region_id=None, days=7, cloud_cover_max=30):
 
     Returns:
     - dict: A dictionary containing task status and results
+
+    Progress is published at each stage (see ``geoapp.progress``) and can be
+    followed through ``/api/satellite-tasks/<task_id>/progress/`` or its SSE
+    counterpart ``.../stream/``.
     """
     logger.info(f"Simplified fetch_satellite_images called with region_id={region_id}, days={days}, cloud_cover_max={cloud_cover_max}")
+    publish_progress(self, 'started', 0, region_id=region_id)
     # Minimal logic for testing
     try:
+        publish_progress(self, 'searching', 25)
         # Simulate some work
         result_message = "Task executed with minimal logic."
+        publish_progress(self, 'processing', 75)
         logger.info(result_message)
+        publish_progress(self, 'finalizing', 95)
         return {"status": "success", "message": result_message, "region_id": region_id}
     except Exception as e:
         error_message = f"Error in simplified fetch_satellite_images: {e}"
@@ -29,3 +44,167 @@ def fetch_satellite_images(region_id=None, days=7, cloud_cover_max=30):
         # It's important for Celery tasks to be able to serialize their return values.
         # Returning a simple dictionary is generally safe.
         return {"status": "error", "message": error_message, "details": str(e)}
+
+
+@shared_task(name='geoapp.tasks.schedule_realtime_refresh')
+def schedule_realtime_refresh():
+    """
+    Periodic task: queue a refresh for every region whose RealTime sources are
+    due according to their own ``update_interval``.
+    """
+    now = timezone.now()
+    sources = due_sources(now)
+    if not sources:
+        return {"status": "success", "regions": []}
+    mark_scheduled(sources, now)
+    region_ids = sorted({s.region_id for s in sources if s.region_id})
+    for region_id in region_ids:
+        refresh_realtime_region.delay(region_id)
+    # The global payload aggregates every region, so it follows any refresh.
+    refresh_realtime_region.delay(None)
+    return {"status": "success", "regions": region_ids}
+
+
+@shared_task(name='geoapp.tasks.refresh_realtime_region')
+def refresh_realtime_region(region_id=None):
+    """
+    Recompute the cached real-time index payload of a region (or the global one).
+    """
+    entry = refresh_region(region_id)
+    return {"status": "success" if entry else "error", "region_id": region_id}
+
+
+@shared_task(name='geoapp.tasks.flush_iot_buffer')
+def flush_iot_buffer():
+    """
+    Periodic task: drain the shared write-behind IoT buffer into the database.
+
+    Only the cache backend is drained here; the memory backend is flushed by a
+    thread of the process that owns it.
+    """
+    buffer = get_write_behind_buffer()
+    if not isinstance(buffer, CacheBuffer):
+        return {"status": "skipped", "written": 0}
+    # A single flusher at a time, so slots are never inserted twice. The
+    # flush stops after FLUSH_SECONDS; the lock outlives it by one batch.
+    if not cache.add('iot_write_behind_flushing', True, buffer.flush_seconds + 300):
+        return {"status": "busy", "written": 0}
+    try:
+        written = buffer.flush()
+    finally:
+        cache.delete('iot_write_behind_flushing')
+    return {"status": "success", "written": written, "pending": buffer.pending}
+
+
+@shared_task(name='geoapp.tasks.rebuild_iot_rollups')
+def rebuild_iot_rollups(start=None, end=None):
+    """
+    Recompute IoT rollups from raw readings, for whole days between ISO dates
+    ``start`` and ``end`` (everything when omitted).
+    """
+    from django.utils.dateparse import parse_datetime
+    from .rollups import rebuild
+
+    created = rebuild(parse_datetime(start) if start else None, parse_datetime(end) if end else None)
+    return {"status": "success", "rollups": created}
+
+
+@shared_task(name='geoapp.tasks.flush_iot_pending')
+def flush_iot_pending():
+    """
+    Store readings held back by swinging-door compression for quiet stations.
+    No-op unless IOT_COMPRESSION uses that mode.
+    """
+    from .compression import flush_pending
+
+    return flush_pending()
+
+
+@shared_task(name='geoapp.tasks.maintain_iot_storage')
+def maintain_iot_storage():
+    """
+    Daily task: create upcoming IoT partitions (when partitioned), move old
+    readings to the archive tier (when IOT_ARCHIVE is enabled) and apply
+    IOT_RETENTION_DAYS to both tiers.
+    """
+    from . import archive, partitions
+
+    created = partitions.ensure_partitions() if partitions.is_partitioned() else []
+    archived = archive.archive_expired()
+    expired = partitions.drop_expired()
+    archive_expired = archive.drop_expired()
+    return {"status": "success", "partitions": created, "archived": archived, "expired": expired, "archive_expired": archive_expired}
+
+
+@shared_task(name='geoapp.tasks.refresh_region_statistics')
+def refresh_region_statistics(region_id=None):
+    """
+    Recompute the materialized statistics of a region, or of every region
+    when ``region_id`` is None (nightly).
+    """
+    from . import region_stats
+
+    if region_id is None:
+        return {"status": "success", "regions": region_stats.refresh_all()}
+    region_stats.refresh(region_id)
+    return {"status": "success", "region_id": region_id}
+
+
+@shared_task(bind=True, name='geoapp.tasks.append_eo_datacube', max_retries=20, default_retry_delay=30)
+def append_eo_datacube(self, eo_data_id):
+    """
+    Append an EOData raster to its region/index pixel time-series cube.
+    Appends to one cube run one at a time.
+    """
+    from . import datacube
+    from .models import EOData
+
+    eo_data = EOData.objects.select_related('region').filter(pk=eo_data_id).first()
+    if eo_data is None or not eo_data.index_type:
+        return {"status": "skipped", "eo_data": eo_data_id}
+    lock = datacube.lock_key(eo_data.region_id, eo_data.index_type)
+    if not cache.add(lock, True, 600):
+        raise self.retry()
+    try:
+        appended = datacube.append(eo_data)
+    finally:
+        cache.delete(lock)
+    return {"status": "success" if appended else "skipped", "eo_data": eo_data_id}
+
+
+@shared_task(bind=True, name='geoapp.tasks.remove_eo_datacube_step', max_retries=20, default_retry_delay=30)
+def remove_eo_datacube_step(self, eo_data_id, region_id, index_type):
+    """
+    Blank out an EOData step from the cube it was moved out of.
+    """
+    from . import datacube
+
+    lock = datacube.lock_key(region_id, index_type)
+    if not cache.add(lock, True, 600):
+        raise self.retry()
+    try:
+        removed = datacube.remove(region_id, index_type, eo_data_id)
+    finally:
+        cache.delete(lock)
+    return {"status": "success" if removed else "skipped", "eo_data": eo_data_id}
+
+
+@shared_task(name='geoapp.tasks.compute_index_analyses')
+def compute_index_analyses(eo_data_id, zone_ids=None):
+    """
+    Compute the IndexAnalysis rows of one raster, for the given zones or for
+    every zone overlapping it.
+    """
+    from . import analysis
+    from .models import EOData, IndexAnalysis
+
+    eo_data = EOData.objects.filter(pk=eo_data_id).first()
+    if eo_data is None:
+        return {"status": "skipped", "eo_data": eo_data_id}
+    zones = analysis.zones_for(eo_data)
+    if zone_ids is not None:
+        zones = zones.filter(pk__in=zone_ids)
+    else:
+        # The footprint may have moved: drop the zones it no longer reaches.
+        IndexAnalysis.objects.filter(eo_data=eo_data).exclude(user_zone__in=zones).delete()
+    return {"status": "success", "eo_data": eo_data_id, "analyses": analysis.compute(eo_data, zones)}
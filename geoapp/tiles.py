@@ -0,0 +1,169 @@
+"""
+Mapbox Vector Tiles for the map layers, built in PostGIS.
+
+``/api/mvt/<layer>/<z>/<x>/<y>.pbf`` selects the rows intersecting the tile,
+simplifies them to the tile's pixel size, clips them with ``ST_AsMVTGeom``
+and encodes the result with ``ST_AsMVT``. Regions and user zones start from
+their precomputed simplified geometry (``geoapp.simplify``) at low zooms.
+
+Tiles are cached per layer *version*: a counter bumped by the save/delete
+signals of the layer's model, so a changed row invalidates every cached tile
+of its layer at once without scanning ``updated_at``. Bulk ``update()`` calls
+bypass signals and should call ``bump_version`` themselves.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.http import Http404, HttpResponse
+from django.views.decorators.http import require_GET
+
+from .models import Cartographical, Point, Region, UserZone
+from .simplify import level_for
+
+EXTENT = 4096
+BUFFER = 64
+MAX_ZOOM = 22
+WEB_MERCATOR_WIDTH = 40075016.68557849  # metres
+CONTENT_TYPE = 'application/vnd.mapbox-vector-tile'
+
+LAYERS = {
+    'regions': {
+        'model': Region,
+        'geometry': 'geometry',
+        'simplified': True,
+        'attributes': ('id', 'name', 'code', 'population', 'area'),
+    },
+    'points': {
+        'model': Point,
+        'geometry': 'location',
+        'attributes': ('id', 'name', 'category', 'region_id'),
+    },
+    'user-zones': {
+        'model': UserZone,
+        'geometry': 'geometry',
+        'simplified': True,
+        'attributes': ('id', 'name', 'user_id'),
+    },
+    'cartographicals': {
+        'model': Cartographical,
+        # Generated from the GeoJSON ``geometry`` (NULL when malformed).
+        'geometry': 'shape',
+        'attributes': ('id', 'name', 'acquisition_date', 'region_id'),
+        # No MVT value type for uuid.
+        'text_attributes': ('id',),
+    },
+}
+LAYER_MODELS = {options['model']: layer for layer, options in LAYERS.items()}
+
+
+def _version_key(layer):
+    return f"mvt_version_{layer}"
+
+
+def layer_version(layer):
+    version = cache.get(_version_key(layer))
+    if version is None:
+        cache.add(_version_key(layer), 1, None)
+        version = cache.get(_version_key(layer), 1)
+    return version
+
+
+def bump_version(layer):
+    """
+    Invalidate every cached tile of ``layer``.
+    """
+    try:
+        cache.incr(_version_key(layer))
+    except ValueError:
+        cache.add(_version_key(layer), 1, None)
+
+
+def _geometry_sql(options, z):
+    qn = connection.ops.quote_name
+    column = f"t.{qn(options['geometry'])}"
+    level = level_for(zoom=z) if options.get('simplified') else None
+    if level:
+        return f"COALESCE(t.{qn('geometry_' + level)}, {column})"
+    return column
+
+
+def tile_sql(layer, z):
+    """
+    SQL producing the MVT of ``layer`` at zoom ``z``; parameters are
+    ``(z, x, y, layer)``.
+    """
+    options = LAYERS[layer]
+    qn = connection.ops.quote_name
+    table = qn(options['model']._meta.db_table)
+    geometry = _geometry_sql(options, z)
+    # Filter on the stored column so its spatial index is used.
+    indexed = f"t.{qn(options['geometry'])}"
+    text_attributes = options.get('text_attributes', ())
+    attributes = ', '.join(
+        f"t.{qn(name)}::text AS {qn(name)}" if name in text_attributes else f"t.{qn(name)}"
+        for name in options['attributes']
+    )
+    # Simplify to a quarter of a tile pixel before clipping; points are left alone.
+    pixel = WEB_MERCATOR_WIDTH / (2 ** z) / EXTENT
+    return f"""
+        WITH bounds AS (
+            SELECT ST_TileEnvelope(%s, %s, %s) AS mercator
+        ),
+        features AS (
+            SELECT {attributes}, ST_Transform({geometry}, 3857) AS geom
+            FROM {table} t, bounds
+            WHERE {indexed} && ST_Transform(bounds.mercator, 4326)
+        ),
+        clipped AS (
+            SELECT features.*, ST_AsMVTGeom(
+                CASE WHEN GeometryType(geom) LIKE '%%POINT' THEN geom
+                     ELSE ST_SimplifyPreserveTopology(geom, {pixel / 4}) END,
+                bounds.mercator, {EXTENT}, {BUFFER}, true
+            ) AS mvt_geom
+            FROM features, bounds
+        )
+        SELECT ST_AsMVT(tile, %s, {EXTENT}, 'mvt_geom')
+        FROM (SELECT {', '.join(qn(name) for name in options['attributes'])}, mvt_geom
+              FROM clipped WHERE mvt_geom IS NOT NULL) AS tile
+    """
+
+
+def render_tile(layer, z, x, y):
+    with connection.cursor() as cursor:
+        cursor.execute(tile_sql(layer, z), [z, x, y, layer])
+        row = cursor.fetchone()
+    return bytes(row[0]) if row and row[0] is not None else b''
+
+
+def get_tile(layer, z, x, y, version=None):
+    """
+    Tile bytes for the current (or given) layer version, from the cache when
+    possible.
+    """
+    version = version or layer_version(layer)
+    key = f"mvt_{layer}_{version}_{z}_{x}_{y}"
+    data = cache.get(key)
+    if data is None:
+        data = render_tile(layer, z, x, y)
+        cache.set(key, data, getattr(settings, 'MVT_CACHE_TIMEOUT', 24 * 3600))
+    return data
+
+
+@require_GET
+def vector_tile(request, layer, z, x, y):
+    """
+    One vector tile of ``layer`` (regions, points, user-zones, cartographicals).
+    Empty tiles answer 204; unchanged tiles answer 304 to ``If-None-Match``.
+    """
+    if layer not in LAYERS or z > MAX_ZOOM or x >= 2 ** z or y >= 2 ** z:
+        raise Http404("No such tile")
+    version = layer_version(layer)
+    etag = f'"{layer}-{version}-{z}-{x}-{y}"'
+    if request.headers.get('If-None-Match') == etag:
+        response = HttpResponse(status=304)
+    else:
+        data = get_tile(layer, z, x, y, version)
+        response = HttpResponse(data, content_type=CONTENT_TYPE) if data else HttpResponse(status=204)
+    response['ETag'] = etag
+    response['Cache-Control'] = 'public, max-age=60'
+    return response
@@ -1,12 +1,19 @@
+import math
 from django.shortcuts import get_object_or_404, redirect
-from django.http import JsonResponse, HttpResponse
+from django.http import Http404, JsonResponse, HttpResponse
 from django.contrib.auth.decorators import login_required
-from rest_framework import viewsets, permissions
+from rest_framework import viewsets, permissions, status
+from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated, IsAuthenticatedOrReadOnly, IsAdminUser, AllowAny
 from rest_framework.response import Response
-from .models import Region, Point, DataLayer, Satellite, SatelliteImage, EOData, IoTData, RealTime, UserZone, IndexAnalysis, Cartographical
-from api.serializers import RegionSerializer, PointSerializer, DataLayerSerializer, SatelliteSerializer, SatelliteImageSerializer, EODataSerializer, IoTDataSerializer, RealTimeSerializer, RegionSerializer, IndexAnalysisSerializer, CartographicalSerializer
+from .models import Region, Point, DataLayer, Satellite, SatelliteImage, EOData, IoTData, IoTAlert, RealTime, UserZone, IndexAnalysis, Cartographical
+from api.serializers import RegionSerializer, PointSerializer, DataLayerSerializer, SatelliteSerializer, SatelliteImageSerializer, EODataSerializer, IoTDataSerializer, RealTimeSerializer, UserZoneSerializer, IndexAnalysisSerializer, CartographicalSerializer, IoTAlertSerializer, UserZoneWithAnalysisSerializer
 from api.permissions import IsOwnerOrReadOnly, IsAdminOrReadOnly
+from api.filters import SceneFilter, SpatialFilter
+from api.pagination import OptionalCursorPaginationMixin
+from api.renderers import GeoJSONRenderer
+from api.caching import ConditionalGetMixin
+from .geojson import geometry_expression, stream_feature_collection
 from django.core.serializers import serialize
 from rest_framework import filters
 from django_filters.rest_framework import DjangoFilterBackend
@@ -14,6 +21,18 @@ from django.contrib.auth import get_user_model
 from django.utils.encoding import force_str
 from django.utils.http import urlsafe_base64_decode
 from .tokens import account_activation_token
+from .ingest import IOT_FIELDS
+from . import archive, compression, datacube, region_stats, rollups
+from .simplify import SIMPLIFIED_FIELDS, level_for
+from django.db.models import Avg, Count, DateField, Max, Min, Prefetch
+from django.db.models.functions import Trunc
+from rest_framework.exceptions import ValidationError
+from django.utils.dateparse import parse_date, parse_datetime
+from django.utils import timezone
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+from itertools import islice
+
+EO_BUCKETS = ('day', 'week', 'month', 'year')
 
 # Ce fichier ne contient que les fonctions utilitaires nécessaires
 # Toutes les vues basées sur des templates ont été migrées vers l'API
@@ -28,37 +47,199 @@ def export_region_geojson(request, pk):
 
 @login_required
 def get_region_statistics(request, pk):
-    region = get_object_or_404(Region, pk=pk)
-    points = Point.objects.filter(region=region)
-    categories = {}
-    for point in points:
-        if point.category in categories:
-            categories[point.category] += 1
-        else:
-            categories[point.category] = 1
+    # Materialized by geoapp.region_stats: one primary-key read.
+    statistics = region_stats.get_statistics(pk)
+    if statistics is None:
+        raise Http404("No Region matches the given query.")
+    region = statistics.region
     return JsonResponse({
         'region': region.name,
-        'total_points': points.count(),
-        'categories': categories,
+        'total_points': statistics.total_points,
+        'categories': statistics.points_by_category,
         'population': region.population,
-        'area': region.area
+        'area': region.area,
+        'index_means': statistics.index_means,
+        'deforested_area': statistics.deforested_area,
+        'updated_at': statistics.updated_at,
     })
 
+def parse_instant(name, value):
+    """
+    Aware datetime from an ISO 8601 query parameter (None when empty); naive
+    values and plain dates are taken as UTC. Raises ValueError when malformed.
+    """
+    if not value:
+        return None
+    parsed = parse_datetime(value)
+    if parsed is None and parse_date(value) is not None:
+        parsed = datetime.combine(parse_date(value), time.min)
+    if parsed is None:
+        raise ValueError(f"Invalid '{name}' date: {value}")
+    if timezone.is_naive(parsed):
+        parsed = parsed.replace(tzinfo=dt_timezone.utc)
+    return parsed
+
+def parse_time_range(params, default_span):
+    """
+    Read aware ``from``/``to`` datetimes (ISO 8601) from query parameters.
+    ``to`` defaults to now and ``from`` to ``to - default_span``; naive values
+    and plain dates are taken as UTC. Raises ValueError on malformed dates.
+    """
+    start = parse_instant('from', params.get('from'))
+    end = parse_instant('to', params.get('to')) or timezone.now()
+    start = start or end - default_span
+    return start, end
+
+class SimplifiedGeometryViewSetMixin:
+    """
+    ``?zoom=`` (web-map zoom level) or ``?tolerance=`` (degrees) on reads
+    serve a precomputed simplified geometry instead of the full one, and only
+    the column actually served is loaded.
+    """
+
+    def get_geometry_level(self):
+        if self.request.method not in permissions.SAFE_METHODS:
+            return None
+        params = self.request.query_params
+        try:
+            return level_for(params.get('zoom'), params.get('tolerance'))
+        except ValueError:
+            raise ValidationError({'zoom': 'zoom and tolerance must be numbers'})
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.request.method not in permissions.SAFE_METHODS:
+            return queryset
+        level = self.get_geometry_level()
+        if level is None:
+            return queryset.defer(*SIMPLIFIED_FIELDS)
+        return queryset.defer('geometry', *(f for f in SIMPLIFIED_FIELDS if f != f'geometry_{level}'))
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['geometry_level'] = self.get_geometry_level()
+        return context
+
+class GeoJSONListMixin:
+    """
+    Fast path for ``?format=geojson`` or ``Accept: application/geo+json`` on
+    list: a FeatureCollection of every matching row (filters apply, pagination
+    does not), streamed from ``values_list`` with the geometry rendered as
+    GeoJSON by PostGIS, instead of going through the serializer.
+    """
+    geometry_field = 'geometry'
+    geojson_properties = ()
+    geojson_from_json = False  # geometry_field is a JSONField holding GeoJSON
+
+    def get_renderers(self):
+        return [*super().get_renderers(), GeoJSONRenderer()]
+
+    def list(self, request, *args, **kwargs):
+        if request.accepted_renderer.format != 'geojson':
+            return super().list(request, *args, **kwargs)
+        queryset = self.filter_queryset(self.get_queryset())
+        if self.geojson_from_json:
+            return stream_feature_collection(queryset, self.geojson_properties, json_geometry=self.geometry_field)
+        level = self.get_geometry_level() if hasattr(self, 'get_geometry_level') else None
+        return stream_feature_collection(
+            queryset, self.geojson_properties, geometry=geometry_expression(self.geometry_field, level),
+        )
+
 # Vues API CRUD sécurisées pour les modèles principaux
-class RegionViewSet(viewsets.ModelViewSet):
+class RegionViewSet(ConditionalGetMixin, GeoJSONListMixin, OptionalCursorPaginationMixin, SimplifiedGeometryViewSetMixin, viewsets.ModelViewSet):
     queryset = Region.objects.all()
     serializer_class = RegionSerializer
     permission_classes = [AllowAny]
+    filter_backends = [DjangoFilterBackend, SpatialFilter]
+    filterset_fields = ['name', 'code']
+    geojson_properties = ('name', 'code', 'population', 'area', 'created_at', 'updated_at')
+    # Boundaries change rarely; caches may serve them for a few minutes.
+    cache_control = {'public': True, 'max_age': 300}
+
+    @action(detail=True, methods=['get'])
+    def timeseries(self, request, pk=None):
+        """
+        Mean/min/max of one spectral ``index`` (default NDVI) over the region,
+        per acquisition date or per ``bucket`` (week, month, year), between
+        ``from`` and ``to`` (ISO dates, both optional). One grouped query on
+        the (region, index_type, acquisition_date) index, unpaginated.
+        """
+        if not pk.isdigit():
+            raise Http404("No Region matches the given query.")
+        params = request.query_params
+        index = params.get('index', 'NDVI')
+        bucket = params.get('bucket') or 'day'
+        if bucket not in EO_BUCKETS:
+            return Response({'error': f"Unknown bucket '{bucket}'"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            start = parse_instant('from', params.get('from'))
+            end = parse_instant('to', params.get('to'))
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        rows = EOData.objects.filter(region_id=pk, index_type=index, acquisition_date__isnull=False)
+        if start:
+            rows = rows.filter(acquisition_date__gte=start.date())
+        if end:
+            rows = rows.filter(acquisition_date__lte=end.date())
+        series = list(
+            rows.annotate(date=Trunc('acquisition_date', bucket, output_field=DateField()))
+            .values('date')
+            .annotate(mean=Avg('mean_value'), min=Min('min_value'), max=Max('max_value'), count=Count('id'))
+            .order_by('date')
+        )
+        if not series and not Region.objects.filter(pk=pk).exists():
+            raise Http404("No Region matches the given query.")
+        return Response({
+            'region': int(pk), 'index': index, 'bucket': bucket,
+            'from': start.date() if start else None, 'to': end.date() if end else None,
+            'series': series,
+        })
+
+    @action(detail=True, methods=['get'], url_path='pixel-timeseries', url_name='pixel-timeseries')
+    def pixel_timeseries(self, request, pk=None):
+        """
+        Values of one spectral ``index`` (default NDVI) at the pixel containing
+        ``lon``/``lat``, one per scene, read from the region's data cube
+        (see ``geoapp.datacube``).
+        """
+        params = request.query_params
+        index = params.get('index', 'NDVI')
+        if not pk.isdigit():
+            raise Http404("No Region matches the given query.")
+        if not index.isalnum():
+            return Response({'error': f"Unknown index '{index}'"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            lon, lat = float(params['lon']), float(params['lat'])
+        except (KeyError, ValueError):
+            lon = lat = math.nan
+        if not (math.isfinite(lon) and math.isfinite(lat)):
+            return Response({'error': 'lon and lat are required numbers'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            series = datacube.pixel_series(pk, index, lon, lat)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        if series is None:
+            raise Http404(f"No {index} data cube for this region.")
+        return Response({
+            'region': int(pk), 'index': index, 'lon': lon, 'lat': lat,
+            'series': [{'date': date, 'value': value} for date, value in series],
+        })
 
-class PointViewSet(viewsets.ModelViewSet):
+class PointViewSet(ConditionalGetMixin, GeoJSONListMixin, OptionalCursorPaginationMixin, viewsets.ModelViewSet):
     queryset = Point.objects.all()
     serializer_class = PointSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    filter_backends = [DjangoFilterBackend, SpatialFilter]
+    filterset_fields = ['name', 'category', 'region']
+    geometry_field = 'location'
+    geojson_properties = ('name', 'category', 'region')
+    cache_control = {'public': True, 'max_age': 60}
 
-class DataLayerViewSet(viewsets.ModelViewSet):
+class DataLayerViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = DataLayer.objects.all()
     serializer_class = DataLayerSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    cache_control = {'public': True, 'max_age': 300}
 
 class SatelliteViewSet(viewsets.ModelViewSet):
     queryset = Satellite.objects.all()
@@ -66,17 +247,27 @@ class SatelliteViewSet(viewsets.ModelViewSet):
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
 
 class SatelliteImageViewSet(viewsets.ModelViewSet):
-    queryset = SatelliteImage.objects.all()
+    # Newest first; SatelliteImage.__str__ names the satellite.
+    queryset = SatelliteImage.objects.select_related('satellite').order_by('-acquisition_date', '-id')
     serializer_class = SatelliteImageSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    filter_backends = [DjangoFilterBackend, SceneFilter]
+    filterset_fields = ['satellite', 'region', 'processed']
+    geometry_field = 'valid_data'
 
 
 class EODataViewSet(viewsets.ModelViewSet):
-    queryset = EOData.objects.all()
+    # The related image and satellite are named by EOData.__str__.
+    queryset = EOData.objects.select_related('satellite_image__satellite')
     serializer_class = EODataSerializer
     permission_classes = [AllowAny]
-    filter_backends = [filters.SearchFilter]
+    filter_backends = [filters.SearchFilter, DjangoFilterBackend]
     search_fields = ['satellite_image__image_id', 'index_type']
+    filterset_fields = {
+        'region': ['exact'],
+        'index_type': ['exact'],
+        'acquisition_date': ['gte', 'lte'],
+    }
 
 class IoTDataViewSet(viewsets.ModelViewSet):
     queryset = IoTData.objects.all()
@@ -84,7 +275,123 @@ class IoTDataViewSet(viewsets.ModelViewSet):
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
     filter_backends = [filters.SearchFilter, DjangoFilterBackend]
     search_fields = [ 'amg_avg_temp','bme_temp','bme_humidity']
-    filterset_fields = [ 'amg_avg_temp','bme_temp','bme_humidity']
+    filterset_fields = [ 'device_id','region','amg_avg_temp','bme_temp','bme_humidity']
+
+    def _readings(self, rows):
+        # Device endpoints return bare readings, without the per-row history.
+        context = {**self.get_serializer_context(), 'timeseries': False}
+        return IoTDataSerializer(rows, many=True, context=context).data
+
+    @action(detail=False, methods=['get'])
+    def devices(self, request):
+        """
+        One entry per device with its latest reading (DISTINCT ON over the
+        (device_id, timestamp) index). Accepts the usual filters, e.g. ``region``.
+        """
+        latest = (
+            self.filter_queryset(self.get_queryset())
+            .order_by('device_id', '-timestamp')
+            .distinct('device_id')
+        )
+        return Response(self._readings(latest))
+
+    @action(detail=False, methods=['get'], url_path=r'devices/(?P<device_id>[^/]+)/latest', url_name='device-latest')
+    def device_latest(self, request, device_id=None):
+        reading = IoTData.objects.filter(device_id=device_id).order_by('-timestamp').first()
+        if reading is None:
+            return Response({'error': f"No readings for device '{device_id}'"}, status=status.HTTP_404_NOT_FOUND)
+        return Response(self._readings([reading])[0])
+
+    @action(detail=False, methods=['get'], url_path=r'devices/(?P<device_id>[^/]+)/range', url_name='device-range')
+    def device_range(self, request, device_id=None):
+        """
+        Readings of one device between ``from`` and ``to`` (ISO 8601, default:
+        the last 24 hours), oldest first, at most ``limit`` (default 1000).
+        Archived readings are included.
+        """
+        try:
+            start, end = parse_time_range(request.query_params, timedelta(days=1))
+            limit = max(1, min(int(request.query_params.get('limit', 1000)), 10000))
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        rows = IoTData.objects.filter(device_id=device_id, timestamp__gte=start, timestamp__lt=end).order_by('timestamp', 'id')[:limit]
+        archived = archive.read_readings(start, end, device_id, limit)
+        if archived:
+            rows = list(islice(archive.merge(rows, archived, archive.reading_key), limit))
+        readings = self._readings(rows)
+        return Response({'device_id': device_id, 'from': start, 'to': end, 'count': len(readings), 'readings': readings})
+
+    @action(detail=False, methods=['get'])
+    def timeseries(self, request):
+        """
+        Latest ``limit`` values of one metric, returned once for the whole
+        response instead of once per reading.
+
+        With ``fill=step`` or ``fill=linear`` the stored (possibly compressed,
+        see ``geoapp.compression``) readings are resampled every ``interval``
+        seconds (default 60) between the first and last of them; that needs
+        a ``device_id``.
+        """
+        metric = request.query_params.get('metric', 'bme_temp')
+        fill = request.query_params.get('fill')
+        if metric not in IOT_FIELDS:
+            return Response({'error': f"Unknown metric '{metric}'"}, status=status.HTTP_400_BAD_REQUEST)
+        if fill and fill not in compression.RECONSTRUCTIONS:
+            return Response({'error': f"Unknown fill '{fill}'"}, status=status.HTTP_400_BAD_REQUEST)
+        if fill and not request.query_params.get('device_id'):
+            # Interleaved readings of several devices are not one signal.
+            return Response({'error': 'fill needs a device_id'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = max(1, min(int(request.query_params.get('limit', 100)), 10000))
+            interval = max(1, int(request.query_params.get('interval', 60)))
+        except ValueError:
+            return Response({'error': 'limit and interval must be integers'}, status=status.HTTP_400_BAD_REQUEST)
+        rows = self.filter_queryset(self.get_queryset()).order_by('-timestamp').values_list('timestamp', metric)[:limit]
+        points = list(reversed(rows))
+        if not fill:
+            return Response({
+                'metric': metric,
+                'timeseries': [{'timestamp': timestamp, 'value': value} for timestamp, value in points],
+            })
+        series = []
+        if points:
+            start, end = points[0][0], points[-1][0]
+            # Keep the resampled series within the same size cap as raw reads.
+            interval = max(interval, int((end - start).total_seconds() // 10000) + 1)
+            series = compression.reconstruct(points, start, end, interval, fill)
+        return Response({'metric': metric, 'fill': fill, 'interval': interval, 'timeseries': series})
+
+    @action(detail=False, methods=['get'])
+    def rollup(self, request):
+        """
+        Downsampled series of one metric read from the rollup tables.
+
+        ``from``/``to`` (ISO 8601, default: the last 24 hours) and ``points``
+        (default 1000) pick the granularity; ``granularity`` forces one.
+        ``device_id`` restricts it to one device, otherwise devices are merged.
+        """
+        metric = request.query_params.get('metric', 'bme_temp')
+        granularity = request.query_params.get('granularity')
+        device_id = request.query_params.get('device_id')
+        if granularity and granularity not in dict(rollups.GRANULARITIES):
+            return Response({'error': f"Unknown granularity '{granularity}'"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            start, end = parse_time_range(request.query_params, timedelta(days=1))
+            points = max(1, int(request.query_params.get('points', rollups.DEFAULT_MAX_POINTS)))
+            granularity, buckets = rollups.query(metric, start, end, points, granularity, device_id)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'metric': metric, 'device_id': device_id, 'granularity': granularity, 'from': start, 'to': end, 'buckets': buckets})
+
+class IoTAlertViewSet(viewsets.ModelViewSet):
+    # Alerts are created by the ingest-time detector; clients only read and
+    # acknowledge them.
+    queryset = IoTAlert.objects.all().order_by('-reading_timestamp')
+    serializer_class = IoTAlertSerializer
+    permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    http_method_names = ['get', 'patch', 'head', 'options']
+    filter_backends = [DjangoFilterBackend]
+    filterset_fields = ['kind', 'device_id', 'acknowledged']
 
 class RealTimeViewSet(viewsets.ModelViewSet):
     queryset = RealTime.objects.all()
@@ -93,22 +400,57 @@ class RealTimeViewSet(viewsets.ModelViewSet):
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['source', 'region', 'timestamp']
 
-class UserZoneViewSet(viewsets.ModelViewSet):
+class UserZoneViewSet(ConditionalGetMixin, GeoJSONListMixin, OptionalCursorPaginationMixin, SimplifiedGeometryViewSetMixin, viewsets.ModelViewSet):
     queryset = UserZone.objects.all()
-    serializer_class = RegionSerializer
-    permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    serializer_class = UserZoneSerializer
+    permission_classes = [permissions.IsAuthenticatedOrReadOnly, IsOwnerOrReadOnly]
+    filter_backends = [DjangoFilterBackend, SpatialFilter]
+    filterset_fields = ['name', 'user']
+    geojson_properties = ('name', 'user')
+    # Edited interactively: always revalidate, never in shared caches.
+    cache_control = {'private': True, 'no_cache': True}
+
+    def include_analyses(self):
+        return self.request.query_params.get('include') == 'analyses'
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.include_analyses():
+            # One query for the analyses of the whole page.
+            queryset = queryset.prefetch_related(
+                Prefetch('index_analyses', queryset=IndexAnalysis.objects.order_by('-created_at'))
+            )
+        return queryset
+
+    def get_serializer_class(self):
+        if self.include_analyses():
+            return UserZoneWithAnalysisSerializer
+        return super().get_serializer_class()
+
+    # The zones' updated_at does not cover their analyses: no validators then.
+    def list_validators(self):
+        return (None, None) if self.include_analyses() else super().list_validators()
+
+    def detail_validators(self):
+        return (None, None) if self.include_analyses() else super().detail_validators()
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
-class IndexAnalysisViewSet(viewsets.ModelViewSet):
-    queryset = IndexAnalysis.objects.all()
+class IndexAnalysisViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
+    # IndexAnalysis.__str__ names the zone; its geometries are not needed.
+    queryset = IndexAnalysis.objects.select_related('user_zone').defer(
+        *(f'user_zone__{field}' for field in ('geometry', *SIMPLIFIED_FIELDS))
+    )
     serializer_class = IndexAnalysisSerializer
-    permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    permission_classes = [permissions.IsAuthenticatedOrReadOnly, IsOwnerOrReadOnly]
+    cache_control = {'private': True, 'no_cache': True}
 
-class CartographicalViewSet(viewsets.ModelViewSet):
+class CartographicalViewSet(GeoJSONListMixin, viewsets.ModelViewSet):
     queryset = Cartographical.objects.all()
     serializer_class = CartographicalSerializer
+    geojson_properties = ('name', 'description', 'acquisition_date', 'region')
+    geojson_from_json = True
 
 def activate_account(request, uidb64, token):
     User = get_user_model()
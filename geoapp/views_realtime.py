@@ -1,13 +1,21 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status, permissions
-from django.core.cache import cache
+from django.http import StreamingHttpResponse
+from django.urls import reverse
 from geoapp.tasks import fetch_satellite_images
 from geoapp.models import Satellite
+from geoapp.realtime import get_region_data
+from geoapp.progress import TERMINAL_STATES, get_progress, mark_queued
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework import serializers
 from django.utils.decorators import method_decorator
 from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET
+from asgiref.sync import sync_to_async
+import asyncio
+import json
+import time
 
 class SatelliteSerializer(serializers.ModelSerializer):
     class Meta:
@@ -31,7 +39,13 @@ class TriggerFetchSatelliteImagesView(APIView):
         days = request.data.get('days', 7)
         cloud_cover_max = request.data.get('cloud_cover_max', 30)
         task = fetch_satellite_images.delay(region_id=region_id, days=days, cloud_cover_max=cloud_cover_max)
-        return Response({'task_id': task.id, 'status': 'started'})
+        mark_queued(task.id)
+        return Response({
+            'task_id': task.id,
+            'status': 'started',
+            'progress_url': reverse('task-progress', args=[task.id]),
+            'stream_url': reverse('task-progress-stream', args=[task.id]),
+        })
 
 @method_decorator(csrf_exempt, name='dispatch')
 class TriggerProcessSatelliteImagesView(APIView):
@@ -40,13 +54,79 @@ class TriggerProcessSatelliteImagesView(APIView):
     def post(self, request):
         return Response({'detail': 'Processing satellite images not implemented yet.'}, status=status.HTTP_501_NOT_IMPLEMENTED)
 
+class TaskProgressView(APIView):
+    """
+    Polling fallback for clients that cannot consume the SSE stream.
+    """
+    permission_classes = [permissions.AllowAny]
+    poll_interval = 2  # seconds suggested to polling clients
+
+    def get(self, request, task_id):
+        progress = get_progress(task_id)
+        response = Response(progress)
+        response['Cache-Control'] = 'no-cache'
+        if progress['state'] not in TERMINAL_STATES:
+            response['Retry-After'] = str(self.poll_interval)
+        return response
+
+
+STREAM_POLL_INTERVAL = 0.5  # seconds between cache reads
+STREAM_BACKEND_CHECK_EVERY = 10  # cache reads between result backend checks
+STREAM_HEARTBEAT = 15  # seconds between keep-alive comments
+STREAM_MAX_DURATION = 30 * 60  # seconds before the server closes the stream
+
+
+def _sse_event(payload):
+    return f"id: {payload['seq']}\nevent: progress\ndata: {json.dumps(payload, default=str)}\n\n"
+
+
+async def _progress_events(task_id, last_seq):
+    started = last_beat = time.monotonic()
+    ticks = 0
+    while time.monotonic() - started < STREAM_MAX_DURATION:
+        # The result backend is only checked now and then, to notice workers
+        # that died without publishing a final state.
+        check_backend = ticks % STREAM_BACKEND_CHECK_EVERY == 0
+        progress = await sync_to_async(get_progress)(task_id, check_backend)
+        ticks += 1
+        if progress is not None and progress['seq'] > last_seq:
+            last_seq = progress['seq']
+            last_beat = time.monotonic()
+            yield _sse_event(progress)
+        if progress is not None and progress['state'] in TERMINAL_STATES:
+            return
+        if time.monotonic() - last_beat >= STREAM_HEARTBEAT:
+            last_beat = time.monotonic()
+            yield ": keep-alive\n\n"
+        await asyncio.sleep(STREAM_POLL_INTERVAL)
+
+
+@require_GET
+async def task_progress_stream(request, task_id):
+    """
+    Server-Sent Events stream of a task's progress.
+
+    Only new events are pushed; reconnecting clients resume after the
+    ``Last-Event-ID`` they received. Served asynchronously under ASGI; under
+    WSGI the stream is buffered, so use ``TaskProgressView`` instead.
+    """
+    try:
+        last_seq = int(request.headers.get('Last-Event-ID', 0))
+    except ValueError:
+        last_seq = 0
+    response = StreamingHttpResponse(_progress_events(task_id, last_seq), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
 class RealTimeIndexDataView(APIView):
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
 
     def get(self, request):
         region_id = request.query_params.get('region_id')
-        cache_key = f"realtime_data_{region_id}" if region_id else "realtime_data_global"
-        data = cache.get(cache_key)
+        if region_id and not region_id.isdigit():
+            return Response({'detail': 'region_id must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+        data = get_region_data(region_id)
         if data is None:
             return Response({'detail': 'No real-time data available'}, status=status.HTTP_404_NOT_FOUND)
         return Response({'data': data})
@@ -13,4 +13,17 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'geospatial_project.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Imported once Django is set up.
+from geoapp.live import websocket_application  # noqa: E402
+
+
+async def application(scope, receive, send):
+    # WebSocket connections (live IoT readings) bypass Django, which only
+    # speaks HTTP; everything else goes to the Django app.
+    if scope['type'] == 'websocket':
+        await websocket_application(scope, receive, send)
+    else:
+        await django_application(scope, receive, send)
+
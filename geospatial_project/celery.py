@@ -14,6 +14,20 @@ app.config_from_object('django.conf:settings', namespace='CELERY')
 app.autodiscover_tasks()
 
 
+@app.on_after_configure.connect
+def setup_periodic_tasks(sender, **kwargs):
+    # Each RealTime source is refreshed on its own update_interval; this only
+    # sets how often due sources are looked for.
+    sender.add_periodic_task(30.0, sender.signature('geoapp.tasks.schedule_realtime_refresh'), name='schedule realtime refresh')
+    # No-op unless IOT_WRITE_BEHIND uses the cache backend.
+    sender.add_periodic_task(2.0, sender.signature('geoapp.tasks.flush_iot_buffer'), name='flush iot write-behind buffer')
+    # No-op unless IOT_COMPRESSION uses the swinging_door mode.
+    sender.add_periodic_task(30.0, sender.signature('geoapp.tasks.flush_iot_pending'), name='flush held-back iot readings')
+    sender.add_periodic_task(24 * 60 * 60.0, sender.signature('geoapp.tasks.maintain_iot_storage'), name='maintain iot storage')
+    # Signals keep region statistics current; this catches bulk updates.
+    sender.add_periodic_task(24 * 60 * 60.0, sender.signature('geoapp.tasks.refresh_region_statistics'), name='refresh region statistics')
+
+
 @app.task(bind=True, ignore_result=True)
 def debug_task(self):
     print(f'Request: {self.request!r}')
\ No newline at end of file
@@ -2,11 +2,13 @@ import geopandas as gpd
 import pandas as pd
 import numpy as np
 from django.contrib.gis.geos import GEOSGeometry
-from geoapp.models import Region, Point, DataLayer
+from geoapp.models import Region, DataLayer
+from geoapp.region_stats import category_counts as category_counts_for
+from geoapp.geojson import collection_chunks, encode_features, geometry_expression
+from django.contrib.gis.db.models import GeometryField
 import os
 import tempfile
 import zipfile
-import json
 
 
 def import_shapefile(data_layer):
@@ -146,21 +148,14 @@ def calculate_statistics(region_id):
     """
     try:
         region = Region.objects.get(id=region_id)
-        points = Point.objects.filter(region=region)
         
-        # Compter les points par catégorie
-        category_counts = {}
-        for point in points:
-            category = point.category or 'Non catégorisé'
-            if category in category_counts:
-                category_counts[category] += 1
-            else:
-                category_counts[category] = 1
+        # Compter les points par catégorie (un seul GROUP BY en base)
+        category_counts = category_counts_for(region.id)
         
         # Calculer d'autres statistiques si nécessaire
         stats = {
             'region_name': region.name,
-            'total_points': points.count(),
+            'total_points': sum(category_counts.values()),
             'points_by_category': category_counts,
             'population': region.population,
             'area': region.area,
@@ -186,46 +181,19 @@ def export_to_geojson(queryset, output_path):
         bool: True si l'exportation a réussi, False sinon
     """
     try:
-        # Créer une liste de features GeoJSON
-        features = []
-        
-        for obj in queryset:
-            # Déterminer le champ géométrique en fonction du type d'objet
-            if hasattr(obj, 'geometry'):
-                geom = obj.geometry
-                geom_field = 'geometry'
-            elif hasattr(obj, 'location'):
-                geom = obj.location
-                geom_field = 'location'
-            else:
-                continue
-            
-            # Créer un dictionnaire de propriétés
-            properties = {}
-            for field in obj._meta.fields:
-                if field.name != geom_field and not field.name.endswith('_ptr'):
-                    value = getattr(obj, field.name)
-                    if value is not None and not callable(value):
-                        properties[field.name] = str(value)
-            
-            # Créer la feature GeoJSON
-            feature = {
-                'type': 'Feature',
-                'geometry': json.loads(geom.json),
-                'properties': properties
-            }
-            
-            features.append(feature)
-        
-        # Créer la collection de features
-        geojson = {
-            'type': 'FeatureCollection',
-            'features': features
-        }
+        # Déterminer le champ géométrique du modèle (Region: geometry, Point: location)
+        fields = queryset.model._meta.concrete_fields
+        geom_field = next((f.name for f in fields if f.name in ('geometry', 'location')), None)
+        if geom_field is None:
+            return False
+        properties = [f.name for f in fields if not isinstance(f, GeometryField)]
         
-        # Écrire dans le fichier
-        with open(output_path, 'w') as f:
-            json.dump(geojson, f)
+        # Écrire la collection au fil de l'eau: géométries encodées par PostGIS,
+        # lignes lues par paquets, sans liste de features en mémoire
+        features = encode_features(queryset, properties, geometry=geometry_expression(geom_field))
+        with open(output_path, 'wb') as f:
+            for chunk in collection_chunks(features):
+                f.write(chunk)
         
         return True
     except Exception as e: